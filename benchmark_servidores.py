@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+"""
+Benchmark WSGI vs ASGI para MuseoQR
+
+Levanta el proyecto con los dos perfiles de despliegue (gunicorn con workers
+síncronos y gunicorn con workers uvicorn) y los somete a la misma carga:
+N clientes concurrentes pidiendo una ruta, y opcionalmente algunos clientes
+"lentos" que envían su petición byte a byte, como un móvil con mala señal.
+
+Uso:
+    python benchmark_servidores.py --ruta / --concurrencia 50 --peticiones 2000 --lentos 8
+"""
+
+import argparse
+import http.client
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+PERFILES = {
+    'WSGI (gunicorn sync)': ['parkscanner.wsgi:application'],
+    'ASGI (gunicorn + uvicorn)': ['parkscanner.asgi:application', '-k', 'uvicorn_worker.UvicornWorker'],
+}
+
+
+def iniciar_servidor(argumentos, puerto, workers):
+    """Lanzar gunicorn con el perfil indicado y esperar a que acepte conexiones"""
+    comando = [
+        sys.executable, '-m', 'gunicorn', *argumentos,
+        '--bind', f'127.0.0.1:{puerto}',
+        '--workers', str(workers),
+        '--log-level', 'warning',
+    ]
+    proceso = subprocess.Popen(comando, env={**os.environ, 'DEBUG': 'False'})
+    limite = time.monotonic() + 20
+    while time.monotonic() < limite:
+        try:
+            conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=1)
+            conexion.request('GET', '/')
+            conexion.getresponse().read()
+            return proceso
+        except OSError:
+            time.sleep(0.2)
+    proceso.terminate()
+    raise RuntimeError(f'El servidor en el puerto {puerto} no arrancó')
+
+
+def cliente_lento(puerto, ruta, detener):
+    """Enviar la petición un byte cada 0.2 s mientras dure la medición"""
+    peticion = f'GET {ruta} HTTP/1.1\r\nHost: 127.0.0.1\r\n'.encode()
+    while not detener.is_set():
+        try:
+            conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=30)
+            conexion.connect()
+            for byte in peticion:
+                if detener.is_set():
+                    break
+                conexion.sock.send(bytes([byte]))
+                time.sleep(0.2)
+            conexion.close()
+        except OSError:
+            time.sleep(0.2)
+
+
+def medir(puerto, ruta, concurrencia, peticiones):
+    """Lanzar las peticiones y devolver (duración total, latencias, errores)"""
+    local = threading.local()
+
+    def una_peticion(_):
+        if not hasattr(local, 'conexion'):
+            local.conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=30)
+        inicio = time.perf_counter()
+        try:
+            local.conexion.request('GET', ruta)
+            respuesta = local.conexion.getresponse()
+            respuesta.read()
+            ok = respuesta.status < 500
+        except OSError:
+            local.conexion.close()
+            del local.conexion
+            ok = False
+        return time.perf_counter() - inicio, ok
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrencia) as ejecutor:
+        resultados = list(ejecutor.map(una_peticion, range(peticiones)))
+    duracion = time.perf_counter() - inicio
+    latencias = sorted(latencia for latencia, ok in resultados if ok)
+    errores = sum(1 for _, ok in resultados if not ok)
+    return duracion, latencias, errores
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    return valores[min(len(valores) - 1, int(len(valores) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Comparar throughput WSGI vs ASGI')
+    parser.add_argument('--ruta', default='/', help='Ruta a medir (por defecto /)')
+    parser.add_argument('--concurrencia', type=int, default=50)
+    parser.add_argument('--peticiones', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=2, help='Workers de gunicorn por perfil')
+    parser.add_argument('--lentos', type=int, default=0, help='Clientes lentos simultáneos')
+    parser.add_argument('--puerto', type=int, default=8101)
+    args = parser.parse_args()
+
+    print("\n" + "="*60)
+    print(f"🏁 Benchmark {args.ruta} · {args.peticiones} peticiones · concurrencia {args.concurrencia}"
+          f" · {args.workers} workers · {args.lentos} clientes lentos")
+    print("="*60)
+
+    for i, (nombre, argumentos) in enumerate(PERFILES.items()):
+        puerto = args.puerto + i
+        proceso = iniciar_servidor(argumentos, puerto, args.workers)
+        detener = threading.Event()
+        lentos = [
+            threading.Thread(target=cliente_lento, args=(puerto, args.ruta, detener), daemon=True)
+            for _ in range(args.lentos)
+        ]
+        try:
+            for hilo in lentos:
+                hilo.start()
+            time.sleep(0.5 if lentos else 0)
+            duracion, latencias, errores = medir(puerto, args.ruta, args.concurrencia, args.peticiones)
+        finally:
+            detener.set()
+            proceso.terminate()
+            proceso.wait()
+
+        print(f"\n📊 {nombre}")
+        print(f"   • Throughput: {len(latencias) / duracion:.1f} req/s")
+        print(f"   • p50: {percentil(latencias, 50) * 1000:.1f} ms")
+        print(f"   • p95: {percentil(latencias, 95) * 1000:.1f} ms")
+        print(f"   • p99: {percentil(latencias, 99) * 1000:.1f} ms")
+        print(f"   • Errores: {errores}")
+    print()
+
+
+if __name__ == '__main__':
+    main()
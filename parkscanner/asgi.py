@@ -3,6 +3,9 @@ ASGI config for parkscanner project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Es el perfil de producción (ver render.yaml): además de las vistas async,
+sirve el stream de eventos en vivo /api/eventos/, que bajo WSGI responde 501.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
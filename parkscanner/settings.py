@@ -83,6 +83,23 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Base de pruebas en archivo (no en memoria) para poder abrir varias
+        # conexiones en las pruebas de concurrencia
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+    }
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# En disco (CACHE_DIR) y no en memoria: la comparten todos los workers de
+# gunicorn, así las versiones de la configuración, del resolver de QR y del
+# contenido que se invalidan en un proceso llegan a los demás.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('CACHE_DIR', BASE_DIR / 'cache_django'),
     }
 }
 
@@ -132,6 +149,21 @@ if not DEBUG:
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Media con nombre por contenido (sin duplicados, cacheable para siempre); ver qrmuseum/almacenamiento.py
+STORAGES = {
+    'default': {'BACKEND': 'qrmuseum.almacenamiento.AlmacenamientoDireccionado'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+# Con un proxy delante (nginx), ruta interna que sirve MEDIA_ROOT; la vista
+# servir_medio responde X-Accel-Redirect y el proxy envía el archivo
+MEDIA_ACCEL_REDIRECT = os.getenv('MEDIA_ACCEL_REDIRECT', '')
+
+# Imágenes de QR renderizadas a pedido (vista imagen_qr): caché en disco con
+# tope de tamaño, se borran las menos usadas al superarlo
+QR_CACHE_DIR = os.getenv('QR_CACHE_DIR', BASE_DIR / 'cache_qr')
+QR_CACHE_MAX_BYTES = int(os.getenv('QR_CACHE_MAX_BYTES', 100 * 1024 * 1024))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -14,16 +14,16 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
-from django.conf.urls.static import static
+from qrmuseum.views import servir_medio
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('qrmuseum.urls')),
+    # Archivos multimedia, también en producción (rangos, 304 y X-Accel-Redirect; ver qrmuseum/medios.py)
+    re_path(r'^%s(?P<ruta>.+)$' % re.escape(settings.MEDIA_URL.lstrip('/')), servir_medio, name='servir_medio'),
 ]
-
-# Servir archivos multimedia en desarrollo
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+"""
+Prueba de carga de MuseoQR: simula visitas completas al museo
+
+Cada visitante virtual recorre el mismo camino que un alumno en una salida
+escolar: entra al inicio, se registra, inicia sesión, escanea los QR en orden
+de numero_secuencial (abriendo cada contenido y, a veces, comentando) y al
+final revisa su progreso. Las peticiones se agrupan por el nombre de la ruta
+en qrmuseum/urls.py y se informa throughput y latencias p50/p95/p99 de cada una.
+Un recorrido cuenta como fallido si no pudo registrarse o iniciar sesión, o si
+alguna de sus peticiones falló.
+
+No importa Django: las rutas del recorrido están escritas abajo (RUTAS) y hay
+que actualizarlas si cambian en qrmuseum/urls.py.
+
+Funciona contra cualquier servidor (runserver, gunicorn WSGI o ASGI):
+    python manage.py runserver
+    python prueba_carga.py --url http://127.0.0.1:8000 --visitantes 40 --rampa 10
+
+Los usuarios creados se llaman carga_<corrida>_<n>; se pueden borrar desde el
+panel de usuarios al terminar.
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode, urlsplit
+from urllib.request import HTTPCookieProcessor, HTTPRedirectHandler, Request, build_opener
+
+PASSWORD = 'carga123'
+COMENTARIOS = [
+    '¡Muy interesante!',
+    'No sabía esto, gracias.',
+    'Lo mejor del recorrido hasta ahora.',
+    'Me gustaría ver más fotos.',
+]
+RE_CSRF = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+RE_COMENTARIO = re.compile(r'action="(/qr/\d+/comentario/)"')
+COOKIE_SESION = 'sessionid'
+
+# Rutas que pide el recorrido, con el mismo nombre que en qrmuseum/urls.py
+UUID = r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}'
+RUTAS = [(re.compile(patron), nombre) for patron, nombre in [
+    (r'^/$', 'inicio'),
+    (r'^/registro/$', 'registro'),
+    (r'^/login/$', 'login'),
+    (r'^/logout/$', 'logout'),
+    (r'^/escanear/$', 'escanear_qr'),
+    (rf'^/qr/{UUID}/$', 'contenido_qr'),
+    (r'^/qr/\d+/comentario/$', 'agregar_comentario'),
+    (rf'^/api/qr/{UUID}/escanear/$', 'api_escanear_qr'),
+    (r'^/api/manifiesto/$', 'api_manifiesto'),
+    (r'^/mi-progreso/$', 'mi_progreso'),
+]]
+
+
+class SinRedirecciones(HTTPRedirectHandler):
+    """Cada redirección se mide como una petición aparte del recorrido"""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Metricas:
+    """Latencias y errores agrupados por nombre de ruta"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencias = defaultdict(list)
+        self.errores = defaultdict(int)
+        self.recorridos = {True: 0, False: 0}
+
+    def registrar(self, nombre, latencia, ok):
+        with self._lock:
+            if ok:
+                self.latencias[nombre].append(latencia)
+            else:
+                self.errores[nombre] += 1
+
+    def terminar_recorrido(self, ok):
+        with self._lock:
+            self.recorridos[ok] += 1
+
+
+def nombre_ruta(url):
+    """Nombre de la ruta de qrmuseum/urls.py que atiende la URL"""
+    ruta = urlsplit(url).path
+    return next((nombre for patron, nombre in RUTAS if patron.match(ruta)), '?')
+
+
+class Visitante:
+    """Cliente HTTP con sesión propia (cookies) que mide cada petición"""
+
+    def __init__(self, base, metricas, pausa):
+        self.base = base.rstrip('/')
+        self.metricas = metricas
+        self.pausa = pausa
+        self.cookies = CookieJar()
+        self.opener = build_opener(HTTPCookieProcessor(self.cookies), SinRedirecciones())
+        self.estado = None
+        self.fallos = 0
+
+    def cookie(self, nombre):
+        for cookie in self.cookies:
+            if cookie.name == nombre:
+                return cookie.value
+        return ''
+
+    def csrf(self):
+        return self.cookie('csrftoken')
+
+    def sesion_iniciada(self):
+        return bool(self.cookie(COOKIE_SESION))
+
+    def pedir(self, ruta, datos=None, api=False):
+        """GET (o POST si hay datos) a la ruta; devuelve el cuerpo o None si falló.
+
+        El código HTTP queda en self.estado.
+        """
+        url = self.base + ruta
+        cabeceras = {'Referer': url}
+        cuerpo = None
+        if datos is not None or api:
+            cuerpo = urlencode(datos or {}).encode()
+            cabeceras['X-CSRFToken'] = self.csrf()
+        if api:
+            cabeceras['Accept'] = 'application/json'
+        inicio = time.perf_counter()
+        try:
+            with self.opener.open(Request(url, data=cuerpo, headers=cabeceras), timeout=30) as respuesta:
+                contenido = respuesta.read().decode('utf-8', 'replace')
+                self.estado = respuesta.status
+            ok = True
+        except HTTPError as error:
+            # Las redirecciones no seguidas llegan como HTTPError 3xx
+            contenido = error.read().decode('utf-8', 'replace')
+            self.estado = error.code
+            ok = error.code < 400
+        except (URLError, OSError):
+            contenido, ok, self.estado = None, False, None
+        self.metricas.registrar(nombre_ruta(url), time.perf_counter() - inicio, ok)
+        if not ok:
+            self.fallos += 1
+        if self.pausa:
+            time.sleep(random.uniform(0, self.pausa))
+        return contenido if ok else None
+
+    def formulario(self, ruta, datos):
+        """Cargar la página del formulario y enviarlo con su token CSRF"""
+        pagina = self.pedir(ruta) or ''
+        token = RE_CSRF.search(pagina)
+        datos = {**datos, 'csrfmiddlewaretoken': token.group(1) if token else self.csrf()}
+        return self.pedir(ruta, datos)
+
+
+def recorrido(base, metricas, corrida, numero, max_qrs, prob_comentario, pausa):
+    """Una visita completa al museo; devuelve True si terminó sin errores"""
+    visitante = Visitante(base, metricas, pausa)
+    username = f'carga_{corrida}_{numero}'
+
+    visitante.pedir('/')
+    # Un registro válido redirige al login; con errores vuelve a mostrar el formulario con 200
+    visitante.formulario('/registro/', {
+        'username': username,
+        'first_name': f'Visitante {numero}',
+        'email': f'{username}@carga.local',
+        'password': PASSWORD,
+        'confirmar_password': PASSWORD,
+    })
+    if visitante.estado != 302:
+        return False
+    visitante.formulario('/login/', {'username': username, 'password': PASSWORD})
+    if visitante.estado != 302 or not visitante.sesion_iniciada():
+        return False
+    visitante.pedir('/')
+
+    # El manifiesto ya viene ordenado por numero_secuencial
+    manifiesto = visitante.pedir('/api/manifiesto/')
+    entradas = []
+    if manifiesto:
+        entradas = json.loads(manifiesto).get('entradas', [])
+    if max_qrs:
+        entradas = entradas[:max_qrs]
+
+    for entrada in entradas:
+        visitante.pedir('/escanear/')
+        visitante.pedir(f"/api/qr/{entrada['uuid']}/escanear/", api=True)
+        pagina = visitante.pedir(f"/qr/{entrada['uuid']}/")
+        accion = RE_COMENTARIO.search(pagina or '')
+        if accion and random.random() < prob_comentario:
+            visitante.pedir(accion.group(1), {
+                'csrfmiddlewaretoken': visitante.csrf(),
+                'calificacion': random.randint(3, 5),
+                'texto': random.choice(COMENTARIOS),
+            })
+
+    visitante.pedir('/mi-progreso/')
+    visitante.pedir('/logout/')
+    return visitante.fallos == 0
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    return valores[min(len(valores) - 1, int(len(valores) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simular visitas completas al museo')
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help='URL base del servidor')
+    parser.add_argument('--visitantes', type=int, default=20, help='Visitas simultáneas')
+    parser.add_argument('--total', type=int, default=0, help='Visitas en total (por defecto = visitantes)')
+    parser.add_argument('--rampa', type=float, default=5, help='Segundos para repartir la llegada de visitantes')
+    parser.add_argument('--qrs', type=int, default=0, help='Máximo de QR por visita (0 = todos)')
+    parser.add_argument('--comentar', type=float, default=0.2, help='Probabilidad de comentar cada QR')
+    parser.add_argument('--pausa', type=float, default=0, help='Pausa máxima entre pasos (segundos)')
+    args = parser.parse_args()
+
+    total = args.total or args.visitantes
+    corrida = uuid.uuid4().hex[:6]
+    metricas = Metricas()
+
+    def visita(numero):
+        time.sleep(args.rampa * numero / total)
+        metricas.terminar_recorrido(
+            recorrido(args.url, metricas, corrida, numero, args.qrs, args.comentar, args.pausa)
+        )
+
+    print("\n" + "="*78)
+    print(f"🚶 Prueba de carga {args.url} · {total} visitas · {args.visitantes} simultáneas · corrida {corrida}")
+    print("="*78)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.visitantes) as ejecutor:
+        list(ejecutor.map(visita, range(total)))
+    duracion = time.perf_counter() - inicio
+
+    print(f"\n{'Ruta':<24}{'Peticiones':>11}{'Errores':>9}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    print("-"*80)
+    nombres = sorted(set(metricas.latencias) | set(metricas.errores))
+    for nombre in nombres:
+        latencias = sorted(metricas.latencias[nombre])
+        print(f"{nombre:<24}{len(latencias):>11}{metricas.errores[nombre]:>9}"
+              f"{len(latencias) / duracion:>9.1f}"
+              f"{percentil(latencias, 50) * 1000:>9.1f}"
+              f"{percentil(latencias, 95) * 1000:>9.1f}"
+              f"{percentil(latencias, 99) * 1000:>9.1f}")
+    todas = sorted(l for lista in metricas.latencias.values() for l in lista)
+    print("-"*80)
+    print(f"{'TOTAL':<24}{len(todas):>11}{sum(metricas.errores.values()):>9}"
+          f"{len(todas) / duracion:>9.1f}"
+          f"{percentil(todas, 50) * 1000:>9.1f}"
+          f"{percentil(todas, 95) * 1000:>9.1f}"
+          f"{percentil(todas, 99) * 1000:>9.1f}")
+    print(f"\n🎫 Recorridos: {metricas.recorridos[True]} completos, {metricas.recorridos[False]} fallidos")
+    print(f"⏱  Duración: {duracion:.1f} s\n")
+
+
+if __name__ == '__main__':
+    main()
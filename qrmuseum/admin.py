@@ -38,7 +38,8 @@ class QRCodeAdmin(admin.ModelAdmin):
 
 @admin.register(ContenidoQR)
 class ContenidoQRAdmin(admin.ModelAdmin):
-    list_display = ['qr', 'tipo_contenido', 'activo', 'fecha_creacion']
+    list_display = ['qr', 'tipo_contenido', 'activo', 'total_aprobados', 'total_pendientes', 'promedio_calificacion',
+                    'fecha_creacion']
     list_filter = ['tipo_contenido', 'activo', 'fecha_creacion']
     search_fields = ['titulo', 'descripcion_detallada']
     
@@ -0,0 +1,67 @@
+"""
+Almacenamiento de media direccionado por contenido
+
+Cada archivo subido se guarda con el nombre de su huella (sha256 truncado a
+LARGO_HUELLA caracteres) dentro del directorio de su upload_to:
+
+    backgrounds/3f2a…9c.jpeg
+
+Subir dos veces la misma imagen deja un solo archivo en disco, y como el
+nombre cambia cuando cambia el contenido, servir_medio puede mandarlos con
+Cache-Control inmutable. Un mismo archivo puede estar referenciado por varias
+filas, así que nunca se borra al reemplazarlo: de eso se encarga
+`manage.py limpiar_media`. `manage.py consolidar_media` pasa los archivos
+subidos antes a este esquema.
+"""
+import hashlib
+import os
+import posixpath
+import re
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.db import models
+
+LARGO_HUELLA = 32
+CACHE_CONTROL_INMUTABLE = 'public, max-age=31536000, immutable'
+
+RE_DIRECCIONADO = re.compile(r'^[0-9a-f]{%d}(\.[0-9a-z]+)?$' % LARGO_HUELLA)
+
+
+def huella(archivo):
+    """Huella hexadecimal del contenido de un File (lo lee por trozos)"""
+    sha = hashlib.sha256()
+    for trozo in archivo.chunks():
+        sha.update(trozo)
+    return sha.hexdigest()[:LARGO_HUELLA]
+
+
+def nombre_direccionado(nombre, digest):
+    """Nombre por contenido de `nombre`: mismo directorio y extensión, la huella como base"""
+    directorio, base = posixpath.split(nombre)
+    return posixpath.join(directorio, digest + os.path.splitext(base)[1].lower())
+
+
+def es_direccionado(nombre):
+    return bool(RE_DIRECCIONADO.match(posixpath.basename(nombre)))
+
+
+def campos_archivo():
+    """(modelo, nombre del campo) de cada FileField/ImageField de qrmuseum"""
+    for modelo in apps.get_app_config('qrmuseum').get_models():
+        for campo in modelo._meta.concrete_fields:
+            if isinstance(campo, models.FileField):
+                yield modelo, campo.name
+
+
+class AlmacenamientoDireccionado(FileSystemStorage):
+    """FileSystemStorage que nombra los archivos por su contenido y no duplica los iguales"""
+
+    def _save(self, name, content):
+        final = nombre_direccionado(name, huella(content))
+        if self.exists(final):
+            # Reusado recién: limpiar_media --antiguedad no debe verlo como viejo
+            # antes de que se confirme la fila que lo apunta
+            os.utime(self.path(final), None)
+            return final
+        return super()._save(final, content)
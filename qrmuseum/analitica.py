@@ -0,0 +1,102 @@
+"""
+Analítica de escaneos sobre tablas resumen
+
+Cada escaneo nuevo suma 1 a su fila de EscaneosPorHora y de EscaneosPorDia
+(hora y día locales, por QR) desde la señal post_save de ProgresoUsuario. Las
+curvas de la vista admin_analitica leen solo estas tablas, cuyo tamaño depende
+de las horas con actividad y no de la cantidad de visitas. Borrar progresos no
+descuenta: el resumen es un registro histórico. `manage.py reconstruir_resumenes`
+lo rehace desde ProgresoUsuario (backfill).
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay, TruncDate, TruncHour
+from django.utils import timezone
+
+from qrmuseum.models import EscaneosPorDia, EscaneosPorHora, ProgresoUsuario
+
+DIAS_SEMANA = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+
+
+def _incrementar(modelo, **clave):
+    """Sumar 1 a la fila `clave` del resumen, creándola si no existe"""
+    if not modelo.objects.filter(**clave).update(escaneos=F('escaneos') + 1):
+        fila, creada = modelo.objects.get_or_create(**clave, defaults={'escaneos': 1})
+        if not creada:
+            modelo.objects.filter(pk=fila.pk).update(escaneos=F('escaneos') + 1)
+
+
+def registrar_en_resumenes(qr_id, momento):
+    """Contar un escaneo del QR hecho en `momento`"""
+    local = timezone.localtime(momento)
+    _incrementar(EscaneosPorHora, hora=local.replace(minute=0, second=0, microsecond=0), qr_id=qr_id)
+    _incrementar(EscaneosPorDia, dia=local.date(), qr_id=qr_id)
+
+
+@transaction.atomic
+def reconstruir_resumenes(desde=None):
+    """Rehacer los resúmenes desde el día `desde` (date) o completos; devuelve (horas, días)"""
+    progresos = ProgresoUsuario.objects.order_by()
+    horas = EscaneosPorHora.objects.all()
+    dias = EscaneosPorDia.objects.all()
+    if desde is not None:
+        inicio = timezone.make_aware(datetime.combine(desde, time.min))
+        progresos = progresos.filter(fecha_visita__gte=inicio)
+        horas = horas.filter(hora__gte=inicio)
+        dias = dias.filter(dia__gte=desde)
+    horas.delete()
+    dias.delete()
+
+    creadas_horas = EscaneosPorHora.objects.bulk_create([
+        EscaneosPorHora(hora=fila['bucket'], qr_id=fila['qr_visitado'], escaneos=fila['total'])
+        for fila in progresos.annotate(bucket=TruncHour('fecha_visita'))
+        .values('bucket', 'qr_visitado').annotate(total=Count('id'))
+    ])
+    creadas_dias = EscaneosPorDia.objects.bulk_create([
+        EscaneosPorDia(dia=fila['bucket'], qr_id=fila['qr_visitado'], escaneos=fila['total'])
+        for fila in progresos.annotate(bucket=TruncDate('fecha_visita'))
+        .values('bucket', 'qr_visitado').annotate(total=Count('id'))
+    ])
+    return len(creadas_horas), len(creadas_dias)
+
+
+def _con_barras(filas):
+    """Agregar el porcentaje respecto del máximo para dibujar barras"""
+    maximo = max((fila['total'] for fila in filas), default=0) or 1
+    for fila in filas:
+        fila['porcentaje'] = round(fila['total'] * 100 / maximo)
+    return filas
+
+
+def series_escaneos(dias=30):
+    """Curvas de los últimos `dias` días: por hora del día, día de la semana, QR y fecha"""
+    desde_dia = timezone.localdate() - timedelta(days=dias - 1)
+    desde = timezone.make_aware(datetime.combine(desde_dia, time.min))
+    horas = EscaneosPorHora.objects.filter(hora__gte=desde).order_by()
+    por_dia = EscaneosPorDia.objects.filter(dia__gte=desde_dia).order_by()
+
+    totales_hora = dict(
+        horas.annotate(h=ExtractHour('hora')).values('h').annotate(total=Sum('escaneos')).values_list('h', 'total')
+    )
+    totales_semana = dict(
+        por_dia.annotate(d=ExtractIsoWeekDay('dia')).values('d').annotate(total=Sum('escaneos')).values_list('d', 'total')
+    )
+    return {
+        'por_hora': _con_barras([
+            {'etiqueta': f'{h:02d}:00', 'total': totales_hora.get(h, 0)} for h in range(24)
+        ]),
+        'por_dia_semana': _con_barras([
+            {'etiqueta': nombre, 'total': totales_semana.get(i, 0)} for i, nombre in enumerate(DIAS_SEMANA, 1)
+        ]),
+        'por_qr': _con_barras([
+            {'etiqueta': f"{fila['qr__numero_secuencial']}. {fila['qr__titulo']}", 'total': fila['total']}
+            for fila in por_dia.values('qr__numero_secuencial', 'qr__titulo')
+            .annotate(total=Sum('escaneos')).order_by('-total', 'qr__numero_secuencial')
+        ]),
+        'por_fecha': _con_barras([
+            {'etiqueta': f"{fila['dia']:%d/%m}", 'total': fila['total']}
+            for fila in por_dia.values('dia').annotate(total=Sum('escaneos')).order_by('dia')
+        ]),
+    }
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class QrmuseumConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'qrmuseum'
+
+    def ready(self):
+        from qrmuseum import signals  # noqa: F401
@@ -0,0 +1,43 @@
+"""
+Caché del contenido renderizado de cada QR
+
+La parte de contenido_qr.html que no depende del usuario (tarjeta de
+contenido, total y lista de comentarios aprobados) se guarda con la etiqueta
+{% cache %} usando una versión por QR. Guardar el contenido, el QR o moderar
+un comentario cambia la versión y los fragmentos viejos dejan de usarse.
+"""
+import uuid
+
+from django.core.cache import cache
+
+# Tope de vida de los fragmentos por si algo cambia fuera de las vistas de la app (admin de Django)
+TTL_CONTENIDO_QR = 60 * 60
+
+
+def _clave_version(qr_id):
+    return f'qrmuseum:contenido_qr:{qr_id}:version'
+
+
+def version_contenido_qr(qr_id):
+    """Versión vigente de los fragmentos de un QR"""
+    clave = _clave_version(qr_id)
+    version = cache.get(clave)
+    if version is None:
+        cache.add(clave, uuid.uuid4().hex, timeout=None)
+        version = cache.get(clave)
+    return version
+
+
+async def aversion_contenido_qr(qr_id):
+    """Versión async de version_contenido_qr"""
+    clave = _clave_version(qr_id)
+    version = await cache.aget(clave)
+    if version is None:
+        await cache.aadd(clave, uuid.uuid4().hex, timeout=None)
+        version = await cache.aget(clave)
+    return version
+
+
+def invalidar_contenido_qr(qr_id):
+    """Descartar los fragmentos cacheados de un QR"""
+    cache.set(_clave_version(qr_id), uuid.uuid4().hex, timeout=None)
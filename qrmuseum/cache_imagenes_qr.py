@@ -0,0 +1,119 @@
+"""
+Caché en disco de las imágenes de QR renderizadas a pedido
+
+La vista imagen_qr pide cada variante (id_unico, tamaño, formato) una sola vez
+al generador y la guarda en QR_CACHE_DIR. Como la imagen depende solo del
+UUID, nunca hay que invalidarla: basta con borrar las del QR eliminado. El
+mtime de cada archivo marca su último uso y, cuando el directorio supera
+QR_CACHE_MAX_BYTES, se borran las menos usadas (LRU).
+"""
+import io
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from django.conf import settings
+
+from qrmuseum.imagenes_qr import generar_imagen_qr
+
+# Al recortar se deja el directorio en esta fracción del tope
+FRACCION_RECORTE = 0.8
+
+
+class CacheImagenesQR:
+    """Archivos de imagen por variante con tope de tamaño"""
+
+    def __init__(self, franjas=64):
+        # Un lock por franja de nombres: dos pedidos de la misma variante no la renderizan dos veces
+        self._locks = [threading.Lock() for _ in range(franjas)]
+        self._lock_tamano = threading.Lock()
+        self._ocupado = {}
+
+    @property
+    def directorio(self):
+        return Path(settings.QR_CACHE_DIR)
+
+    def ruta(self, id_unico, tamano, formato):
+        return self.directorio / f'{id_unico}-{tamano}.{formato}'
+
+    def abrir(self, id_unico, tamano, formato):
+        """Archivo abierto (binario) de la variante, renderizándola si no está en disco.
+
+        Si hubo que renderizarla se devuelven los bytes en memoria (BytesIO): el
+        recorte de otro hilo puede borrar el archivo recién guardado antes de
+        volver a abrirlo.
+        """
+        ruta = self.ruta(id_unico, tamano, formato)
+        try:
+            archivo = open(ruta, 'rb')
+        except FileNotFoundError:
+            with self._locks[hash(ruta.name) % len(self._locks)]:
+                try:
+                    return open(ruta, 'rb')  # la renderizó otro pedido mientras se esperaba el lock
+                except FileNotFoundError:
+                    contenido = generar_imagen_qr(id_unico, formato, tamano)
+                    self.guardar(id_unico, tamano, formato, contenido)
+                    return io.BytesIO(contenido)
+        try:
+            os.utime(ruta)  # marcar el uso para el LRU
+        except OSError:
+            pass
+        return archivo
+
+    def guardar(self, id_unico, tamano, formato, contenido):
+        """Escribir una variante ya renderizada (escritura atómica) y recortar si hace falta"""
+        ruta = self.ruta(id_unico, tamano, formato)
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        descriptor, temporal = tempfile.mkstemp(dir=ruta.parent, suffix='.tmp')
+        with os.fdopen(descriptor, 'wb') as archivo:
+            archivo.write(contenido)
+        os.replace(temporal, ruta)
+
+        with self._lock_tamano:
+            directorio = str(ruta.parent)
+            if directorio not in self._ocupado:
+                self._ocupado[directorio] = self._medir(ruta.parent)
+            else:
+                self._ocupado[directorio] += len(contenido)
+            if self._ocupado[directorio] > settings.QR_CACHE_MAX_BYTES:
+                self._ocupado[directorio] = self._recortar(ruta.parent, conservar=ruta)
+
+    @staticmethod
+    def _archivos(directorio):
+        for entrada in os.scandir(directorio):
+            if entrada.is_file() and not entrada.name.endswith('.tmp'):
+                yield entrada
+
+    def _medir(self, directorio):
+        return sum(entrada.stat().st_size for entrada in self._archivos(directorio))
+
+    def _recortar(self, directorio, conservar):
+        """Borrar las variantes usadas hace más tiempo; devuelve los bytes que quedan"""
+        entradas = sorted(self._archivos(directorio), key=lambda entrada: entrada.stat().st_mtime)
+        ocupado = sum(entrada.stat().st_size for entrada in entradas)
+        objetivo = settings.QR_CACHE_MAX_BYTES * FRACCION_RECORTE
+        for entrada in entradas:
+            if ocupado <= objetivo:
+                break
+            if entrada.path == str(conservar):
+                continue
+            try:
+                tamano = entrada.stat().st_size
+                os.remove(entrada.path)
+            except FileNotFoundError:
+                continue
+            ocupado -= tamano
+        return ocupado
+
+    def eliminar(self, id_unico):
+        """Borrar todas las variantes de un QR"""
+        if not self.directorio.is_dir():
+            return
+        for ruta in self.directorio.glob(f'{id_unico}-*'):
+            ruta.unlink(missing_ok=True)
+        with self._lock_tamano:
+            self._ocupado.pop(str(self.directorio), None)
+
+
+cache_imagenes_qr = CacheImagenesQR()
@@ -0,0 +1,91 @@
+"""
+Contadores de comentarios y calificaciones por contenido
+
+Cada ContenidoQR guarda total_comentarios, total_aprobados, total_pendientes,
+la suma de calificaciones y el histograma calificaciones_1..5 (estos dos solo
+de los comentarios aprobados), así las páginas muestran cantidades y
+promedios sin consultar Comentario. Las señales de Comentario restan el
+aporte del estado anterior y suman el del nuevo con F(), dentro de la misma
+transacción que el cambio (Comentario.save() abre una; los borrados ya corren
+en la del Collector). reconciliar_contadores_comentarios corrige lo que se
+haya escrito sin señales (QuerySet.update, SQL directo).
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from qrmuseum.models import Comentario, ContenidoQR
+
+CAMPOS_HISTOGRAMA = {calificacion: f'calificaciones_{calificacion}' for calificacion in range(1, 6)}
+CAMPOS_CONTADORES = (
+    'total_comentarios', 'total_aprobados', 'total_pendientes', 'suma_calificaciones', *CAMPOS_HISTOGRAMA.values(),
+)
+
+
+def estado_comentario(comentario):
+    """Lo que aporta un comentario a los contadores: (contenido_qr_id, moderado, calificacion)"""
+    return comentario.contenido_qr_id, comentario.moderado, comentario.calificacion
+
+
+def estado_guardado(comentario_id):
+    """Estado en la base de datos, bloqueando la fila hasta el fin de la transacción"""
+    return Comentario.objects.select_for_update().filter(pk=comentario_id) \
+        .values_list('contenido_qr_id', 'moderado', 'calificacion').first()
+
+
+def _aporte(estado, signo, cambios):
+    contenido_id, moderado, calificacion = estado
+    cambio = cambios.setdefault(contenido_id, Counter())
+    cambio['total_comentarios'] += signo
+    if not moderado:
+        cambio['total_pendientes'] += signo
+        return
+    cambio['total_aprobados'] += signo
+    cambio['suma_calificaciones'] += signo * calificacion
+    if calificacion in CAMPOS_HISTOGRAMA:
+        cambio[CAMPOS_HISTOGRAMA[calificacion]] += signo
+
+
+def mover_comentario(anterior, nuevo):
+    """Pasar el aporte de un comentario del estado `anterior` al `nuevo` (cualquiera puede ser None)"""
+    cambios = {}
+    if anterior:
+        _aporte(anterior, -1, cambios)
+    if nuevo:
+        _aporte(nuevo, 1, cambios)
+    for contenido_id, cambio in cambios.items():
+        valores = {campo: F(campo) + delta for campo, delta in cambio.items() if delta}
+        if valores:
+            ContenidoQR.objects.filter(pk=contenido_id).update(**valores)
+
+
+def contadores_esperados():
+    """{contenido_id: {campo: valor}} calculados desde Comentario"""
+    aprobado = Q(moderado=True)
+    filas = Comentario.objects.order_by().values('contenido_qr').annotate(
+        total_comentarios=Count('id'),
+        total_aprobados=Count('id', filter=aprobado),
+        total_pendientes=Count('id', filter=~aprobado),
+        suma_calificaciones=Sum('calificacion', filter=aprobado, default=0),
+        **{campo: Count('id', filter=aprobado & Q(calificacion=valor)) for valor, campo in CAMPOS_HISTOGRAMA.items()},
+    )
+    return {fila.pop('contenido_qr'): fila for fila in filas}
+
+
+@transaction.atomic
+def reconciliar_contadores_comentarios():
+    """Corregir los contadores que no coinciden con Comentario; devuelve (corregidos, revisados)"""
+    esperados = contadores_esperados()
+    vacios = dict.fromkeys(CAMPOS_CONTADORES, 0)
+    corregidos = []
+    revisados = 0
+    for contenido in ContenidoQR.objects.select_for_update().only('qr_id', *CAMPOS_CONTADORES):
+        revisados += 1
+        valores = esperados.get(contenido.pk, vacios)
+        if any(getattr(contenido, campo) != valor for campo, valor in valores.items()):
+            for campo, valor in valores.items():
+                setattr(contenido, campo, valor)
+            corregidos.append(contenido)
+    ContenidoQR.objects.bulk_update(corregidos, CAMPOS_CONTADORES, batch_size=500)
+    return corregidos, revisados
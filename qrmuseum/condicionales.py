@@ -0,0 +1,91 @@
+"""
+Respuestas condicionales (ETag / Last-Modified) para inicio y procesar_qr
+
+Los validadores salen de las fechas de actualización de MuseoConfig, QRCode,
+ContenidoQR y del último comentario aprobado, leídas con una sola consulta
+sin cargar los objetos completos, y de las versiones en caché del contenido
+del QR y de la configuración: lo que se cambia con update() sin tocar las
+fechas (videos procesados, derivadas, consolidar_media) igual invalida
+llamando a invalidar_contenido_qr. Como la página también depende de quién la
+ve (menú, formulario con token CSRF), el ETag incluye al usuario y el secreto
+CSRF; es un ETag débil porque el HTML no es idéntico byte a byte.
+"""
+import hashlib
+
+from django.contrib import messages
+from django.db.models import Count, F, Func, Max, Q, Subquery
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from qrmuseum.cache_contenido import aversion_contenido_qr
+from qrmuseum.configuracion import configuracion_museo
+from qrmuseum.models import MuseoConfig, QRCode, ProgresoUsuario, UsuarioMuseo
+
+
+def _contar(queryset):
+    """Subconsulta escalar con el COUNT de un queryset"""
+    return Subquery(queryset.order_by().annotate(total=Func(F('pk'), function='COUNT')).values('total'))
+
+
+async def amarcas_contenido_qr(qr_pk):
+    """Fechas, contadores y versiones en caché de los que depende la página de un QR"""
+    try:
+        marcas = await QRCode.objects.filter(pk=qr_pk).order_by().values(
+            'fecha_actualizacion', 'contenido__fecha_actualizacion'
+        ).annotate(
+            config=Subquery(MuseoConfig.objects.order_by('pk').values('fecha_actualizacion')[:1]),
+            ultimo_comentario=Max(
+                'contenido__comentarios__fecha_actualizacion',
+                filter=Q(contenido__comentarios__moderado=True),
+            ),
+            comentarios=Count('contenido__comentarios'),
+        ).aget()
+    except QRCode.DoesNotExist:
+        return None
+    marcas['version_contenido'] = await aversion_contenido_qr(qr_pk)
+    marcas['version_config'] = await configuracion_museo.aversion()
+    return marcas
+
+
+async def amarcas_inicio(usuario):
+    """Fechas, contadores y versión de la configuración de los que depende la página de inicio"""
+    marcas = await MuseoConfig.objects.order_by('pk').values('fecha_actualizacion').annotate(
+        qrs_activos=_contar(QRCode.objects.filter(activo=True)),
+        ultimo_qr=Subquery(QRCode.objects.order_by('-fecha_actualizacion').values('fecha_actualizacion')[:1]),
+        perfil=Subquery(UsuarioMuseo.objects.filter(usuario_id=usuario.pk).values('fecha_ultimo_acceso')[:1]),
+        progreso=_contar(ProgresoUsuario.objects.filter(usuario_id=usuario.pk)),
+    ).afirst()
+    if marcas is not None:
+        marcas['version_config'] = await configuracion_museo.aversion()
+    return marcas
+
+
+def validadores(request, usuario, marcas):
+    """(etag, last_modified) a partir de las marcas y de quién pide la página"""
+    fechas = [valor for valor in marcas.values() if hasattr(valor, 'timestamp')]
+    partes = [
+        usuario.pk, usuario.get_username(), getattr(usuario, 'first_name', ''), usuario.is_staff,
+        request.META.get('CSRF_COOKIE', ''),
+        *(f'{clave}={valor}' for clave, valor in sorted(marcas.items())),
+    ]
+    etag = 'W/"%s"' % hashlib.md5('|'.join(map(str, partes)).encode()).hexdigest()
+    return etag, int(max(fechas).timestamp()) if fechas else None
+
+
+def respuesta_no_modificada(request, etag, ultima_modificacion):
+    """304 si el navegador ya tiene esta versión; None si hay que renderizar.
+
+    Con mensajes pendientes se renderiza siempre para no dejarlos sin mostrar.
+    """
+    if len(messages.get_messages(request)):
+        return None
+    return get_conditional_response(request, etag=etag, last_modified=ultima_modificacion)
+
+
+def aplicar_validadores(respuesta, etag, ultima_modificacion):
+    """Agregar ETag/Last-Modified y pedir al navegador que revalide siempre"""
+    respuesta['ETag'] = etag
+    if ultima_modificacion is not None:
+        respuesta['Last-Modified'] = http_date(ultima_modificacion)
+    patch_cache_control(respuesta, private=True, no_cache=True)
+    return respuesta
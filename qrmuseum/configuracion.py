@@ -0,0 +1,65 @@
+"""
+Configuración del museo cacheada por proceso
+
+MuseoConfig es una sola fila que se lee en cada página (context processor e
+inicio). Cada proceso guarda el objeto y lo vuelve a leer solo cuando cambia
+la versión guardada en la caché, que se renueva al guardar o eliminar la
+configuración (ver signals.py). El objeto es compartido: es de solo lectura;
+para editarlo hay que pedir una instancia nueva a la base de datos.
+"""
+import threading
+import uuid
+
+from django.core.cache import cache
+
+from qrmuseum.models import MuseoConfig
+
+CLAVE_VERSION = 'qrmuseum:museo_config:version'
+
+
+class ConfiguracionMuseo:
+    """MuseoConfig(id=1) cacheada en memoria y refrescada por versión"""
+
+    def __init__(self):
+        self._vigente = (None, None)  # (versión, objeto)
+        self._lock = threading.Lock()
+
+    def obtener(self):
+        """Configuración del museo (se crea con valores por defecto si no existe)"""
+        version = cache.get(CLAVE_VERSION)
+        if version is None:
+            cache.add(CLAVE_VERSION, uuid.uuid4().hex, timeout=None)
+            version = cache.get(CLAVE_VERSION)
+        if version != self._vigente[0]:
+            with self._lock:
+                if version != self._vigente[0]:
+                    config, creada = MuseoConfig.objects.get_or_create(id=1)
+                    if creada:  # post_save ya renovó la versión
+                        version = cache.get(CLAVE_VERSION)
+                    self._vigente = (version, config)
+        return self._vigente[1]
+
+    async def aversion(self):
+        """Versión vigente de la configuración (cambia con cada invalidación)"""
+        version = await cache.aget(CLAVE_VERSION)
+        if version is None:
+            await cache.aadd(CLAVE_VERSION, uuid.uuid4().hex, timeout=None)
+            version = await cache.aget(CLAVE_VERSION)
+        return version
+
+    async def aobtener(self):
+        """Versión async de obtener"""
+        version = await self.aversion()
+        if version != self._vigente[0]:
+            config, creada = await MuseoConfig.objects.aget_or_create(id=1)
+            if creada:
+                version = await cache.aget(CLAVE_VERSION)
+            self._vigente = (version, config)
+        return self._vigente[1]
+
+    def invalidar(self):
+        """Forzar la relectura en todos los procesos"""
+        cache.set(CLAVE_VERSION, uuid.uuid4().hex, timeout=None)
+
+
+configuracion_museo = ConfiguracionMuseo()
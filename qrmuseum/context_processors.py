@@ -1,15 +1,10 @@
 """
 Context processors para pasar datos globales a todos los templates
 """
-from qrmuseum.models import MuseoConfig
+from qrmuseum.configuracion import configuracion_museo
 
 def museo_global(request):
     """Agrega la configuración del museo a todos los templates"""
-    try:
-        museo = MuseoConfig.objects.first()
-    except:
-        museo = None
-    
     return {
-        'museo': museo
+        'museo': configuracion_museo.obtener()
     }
@@ -0,0 +1,164 @@
+"""
+Versiones redimensionadas (derivadas) de las imágenes subidas
+
+Para ContenidoQR.imagen, UsuarioMuseo.avatar y MuseoConfig.imagen_fondo se
+generan, una vez por archivo subido, copias de ANCHOS píxeles de ancho en WebP
+y en el formato de respaldo (JPEG, o PNG si la imagen tiene transparencia):
+
+    media/derivadas/<ruta del original>/<ancho>w.<formato>
+
+más un indice.json con los anchos generados, que se escribe al final y marca
+que el juego está completo. La etiqueta {% imagen_responsiva %} arma el
+<picture> con srcset a partir del índice y, si todavía no existe, usa el
+original. Las señales post_save encolan las derivadas de cada subida nueva
+en un hilo del proceso al confirmarse la transacción (la petición que sube la
+imagen no espera el redimensionado) y `manage.py procesar_imagenes` genera las
+del media/ existente.
+
+generar_derivadas trabaja solo con rutas del disco para poder ejecutarse en
+otros procesos; el resto usa el almacenamiento de media y la caché de Django.
+"""
+import json
+import logging
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from qrmuseum.cache_contenido import invalidar_contenido_qr
+from qrmuseum.imagenes_qr import PERMISOS_ARCHIVO
+
+logger = logging.getLogger(__name__)
+
+ANCHOS = (160, 320, 640, 1280, 1920)
+CALIDAD_JPEG = 82
+CALIDAD_WEBP = 80
+DIRECTORIO_DERIVADAS = 'derivadas'
+NOMBRE_INDICE = 'indice.json'
+TTL_INDICE = 60 * 60
+
+# Campos de imagen que tienen derivadas: modelo -> campos
+CAMPOS_CON_DERIVADAS = {
+    'ContenidoQR': ['imagen'],
+    'UsuarioMuseo': ['avatar'],
+    'MuseoConfig': ['imagen_fondo'],
+}
+
+# Un solo hilo, como los videos: las subidas se redimensionan de a una sin competir con las vistas
+_ejecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='derivadas')
+
+
+def _escribir(directorio, nombre, guardar):
+    """Escritura atómica: guardar(archivo) escribe en un temporal que luego se renombra"""
+    descriptor, temporal = tempfile.mkstemp(dir=directorio, suffix='.tmp')
+    with os.fdopen(descriptor, 'wb') as archivo:
+        guardar(archivo)
+    os.chmod(temporal, PERMISOS_ARCHIVO)
+    os.replace(temporal, os.path.join(directorio, nombre))
+
+
+def generar_derivadas(origen, destino):
+    """Generar en `destino` las derivadas de la imagen `origen`; devuelve el índice"""
+    with Image.open(origen) as imagen:
+        imagen = ImageOps.exif_transpose(imagen)
+        transparente = imagen.mode in ('RGBA', 'LA', 'PA') or 'transparency' in imagen.info
+        imagen = imagen.convert('RGBA' if transparente else 'RGB')
+    formato = 'png' if transparente else 'jpg'
+    ancho, alto = imagen.size
+
+    os.makedirs(destino, exist_ok=True)
+    anchos = sorted({min(maximo, ancho) for maximo in ANCHOS})
+    total = 0
+    for ancho_derivada in anchos:
+        copia = imagen.resize((ancho_derivada, max(1, round(alto * ancho_derivada / ancho))), Image.LANCZOS)
+        _escribir(destino, f'{ancho_derivada}w.webp', lambda archivo: copia.save(
+            archivo, format='WEBP', quality=CALIDAD_WEBP, method=6
+        ))
+        if formato == 'png':
+            _escribir(destino, f'{ancho_derivada}w.png', lambda archivo: copia.save(archivo, format='PNG', optimize=True))
+        else:
+            _escribir(destino, f'{ancho_derivada}w.jpg', lambda archivo: copia.save(
+                archivo, format='JPEG', quality=CALIDAD_JPEG, optimize=True, progressive=True
+            ))
+        total += sum(os.path.getsize(os.path.join(destino, f'{ancho_derivada}w.{ext}')) for ext in ('webp', formato))
+
+    indice = {'anchos': anchos, 'formato': formato, 'ancho': ancho, 'alto': alto,
+              'bytes_original': os.path.getsize(origen), 'bytes_derivadas': total}
+    _escribir(destino, NOMBRE_INDICE, lambda archivo: archivo.write(json.dumps(indice).encode()))
+    return indice
+
+
+def directorio_derivadas(nombre):
+    """Directorio (absoluto) de las derivadas del archivo de media `nombre`"""
+    return default_storage.path(f'{DIRECTORIO_DERIVADAS}/{nombre}')
+
+
+def _clave_indice(nombre):
+    return f'qrmuseum:derivadas:{nombre}'
+
+
+def procesar_imagen(nombre, forzar=False):
+    """Generar las derivadas del archivo de media `nombre` si faltan; devuelve el índice o None"""
+    destino = directorio_derivadas(nombre)
+    if not forzar and os.path.exists(os.path.join(destino, NOMBRE_INDICE)):
+        return None
+    try:
+        indice = generar_derivadas(default_storage.path(nombre), destino)
+    except (OSError, Image.DecompressionBombError):
+        # Archivo ausente o que no es una imagen válida: se sigue sirviendo el original
+        return None
+    cache.delete(_clave_indice(nombre))
+    return indice
+
+
+def _en_segundo_plano(nombre, qr_id):
+    try:
+        if procesar_imagen(nombre) and qr_id is not None:
+            # Los fragmentos cacheados del contenido se armaron con el original
+            invalidar_contenido_qr(qr_id)
+    except Exception:
+        logger.exception('Error generando las derivadas de %s', nombre)
+
+
+def encolar_derivadas(nombre, qr_id=None):
+    """Generar las derivadas en el hilo de imágenes cuando se confirme la transacción actual"""
+    transaction.on_commit(lambda: _ejecutor.submit(_en_segundo_plano, nombre, qr_id))
+
+
+def olvidar_indice(nombre):
+    """Descartar el índice cacheado tras generar o borrar derivadas"""
+    cache.delete(_clave_indice(nombre))
+
+
+def indice_derivadas(nombre):
+    """Índice de las derivadas de `nombre` ({} si aún no existen), cacheado"""
+    def leer():
+        try:
+            with open(os.path.join(directorio_derivadas(nombre), NOMBRE_INDICE), 'rb') as archivo:
+                return json.load(archivo)
+        except (OSError, ValueError):
+            return {}
+    return cache.get_or_set(_clave_indice(nombre), leer, TTL_INDICE)
+
+
+def url_derivada(nombre, ancho, formato):
+    return default_storage.url(f'{DIRECTORIO_DERIVADAS}/{nombre}/{ancho}w.{formato}')
+
+
+def url_miniatura(nombre):
+    """URL de la derivada más chica de `nombre` en su formato de respaldo, o None si no tiene"""
+    indice = indice_derivadas(nombre)
+    if not indice:
+        return None
+    return url_derivada(nombre, min(indice['anchos']), indice['formato'])
+
+
+def eliminar_derivadas(nombre):
+    """Borrar las derivadas de un archivo que ya no se usa"""
+    shutil.rmtree(directorio_derivadas(nombre), ignore_errors=True)
+    cache.delete(_clave_indice(nombre))
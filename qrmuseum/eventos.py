@@ -0,0 +1,88 @@
+"""
+Eventos en vivo (Server-Sent Events) para la pantalla del museo
+
+Un solo publicador por proceso reparte los escaneos a todas las pantallas
+conectadas a /api/eventos/. Cada evento se serializa una vez y se entrega a
+la cola de cada cliente en su propio event loop; las colas son acotadas y un
+cliente que se queda atrás se descarta (su EventSource se reconecta solo), de
+modo que un navegador lento nunca frena a los demás ni acumula memoria.
+
+El publicador vive en memoria del proceso: con varios workers cada pantalla ve
+los escaneos atendidos por su worker.
+"""
+import asyncio
+import json
+import threading
+
+TAMANO_BUFFER = 100
+INTERVALO_LATIDO = 15  # segundos entre comentarios keep-alive
+
+
+class Suscripcion:
+    """Cola acotada de un cliente SSE"""
+
+    def __init__(self, loop, tamano):
+        self.loop = loop
+        self.cola = asyncio.Queue(maxsize=tamano)
+        self.descartada = False
+
+    def _entregar(self, evento):
+        # Corre en el loop del cliente
+        if self.descartada:
+            return
+        try:
+            self.cola.put_nowait(evento)
+        except asyncio.QueueFull:
+            # Cliente lento: se vacía la cola y se deja solo la marca de cierre
+            self.descartada = True
+            while not self.cola.empty():
+                self.cola.get_nowait()
+            self.cola.put_nowait(None)
+
+    async def siguiente(self, espera=INTERVALO_LATIDO):
+        """Próximo evento (tipo, json), None si fue descartada; TimeoutError si no hubo nada"""
+        return await asyncio.wait_for(self.cola.get(), espera)
+
+
+class PublicadorEventos:
+    """Reparte eventos a todas las suscripciones del proceso"""
+
+    def __init__(self, tamano_buffer=TAMANO_BUFFER):
+        self.tamano_buffer = tamano_buffer
+        self._suscripciones = set()
+        self._lock = threading.Lock()
+
+    def suscribir(self):
+        """Nueva suscripción en el event loop actual"""
+        suscripcion = Suscripcion(asyncio.get_running_loop(), self.tamano_buffer)
+        with self._lock:
+            self._suscripciones.add(suscripcion)
+        return suscripcion
+
+    def desuscribir(self, suscripcion):
+        with self._lock:
+            self._suscripciones.discard(suscripcion)
+
+    @property
+    def conectados(self):
+        return len(self._suscripciones)
+
+    def publicar(self, tipo, datos):
+        """Enviar un evento a todos; se puede llamar desde cualquier hilo y no bloquea"""
+        evento = (tipo, json.dumps(datos))
+        with self._lock:
+            suscripciones = list(self._suscripciones)
+        for suscripcion in suscripciones:
+            try:
+                suscripcion.loop.call_soon_threadsafe(suscripcion._entregar, evento)
+            except RuntimeError:
+                # El loop del cliente ya se cerró
+                self.desuscribir(suscripcion)
+
+
+def formato_sse(tipo, datos_json):
+    """Mensaje SSE con nombre de evento"""
+    return f'event: {tipo}\ndata: {datos_json}\n\n'
+
+
+publicador_eventos = PublicadorEventos()
@@ -0,0 +1,84 @@
+"""
+Exportación imprimible de los códigos QR
+
+zip_qrs arma un ZIP con la imagen de impresión de cada QR activo y una hoja
+HTML paginada (número, título y ubicación de cada punto) lista para imprimir.
+El ZIP se escribe sobre un búfer que se vacía después de cada archivo, así que
+la respuesta sale por partes y la memoria no crece con la cantidad de QR (solo
+el índice central del ZIP, unas decenas de bytes por archivo).
+"""
+import io
+import zipfile
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.template.loader import render_to_string
+from django.utils.text import slugify
+
+from qrmuseum.cache_imagenes_qr import cache_imagenes_qr
+from qrmuseum.models import QRCode
+
+TAMANO_EXPORTACION = 'impresion'
+ETIQUETAS_POR_PAGINA = 6
+NOMBRE_HOJA = 'hoja_impresion.html'
+
+
+class _Bufer(io.RawIOBase):
+    """Destino del ZIP que solo acumula lo escrito hasta el próximo vaciar()"""
+
+    def __init__(self):
+        super().__init__()
+        self._partes = []
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def vaciar(self):
+        datos = b''.join(self._partes)
+        self._partes.clear()
+        return datos
+
+
+def nombre_archivo_qr(qr):
+    """Ruta de la imagen de un QR dentro del ZIP"""
+    return f'qr/{qr.numero_secuencial:03d}_{slugify(qr.titulo)[:40] or "qr"}_{qr.id_unico.hex[:8]}.png'
+
+
+def _qrs_activos():
+    return (
+        QRCode.objects.filter(activo=True).order_by('numero_secuencial', 'id')
+        .only('id_unico', 'titulo', 'ubicacion', 'numero_secuencial')
+        .iterator(chunk_size=100)
+    )
+
+
+def zip_qrs(museo):
+    """Genera el ZIP por partes (bytes), una por imagen y una por página de la hoja"""
+    bufer = _Bufer()
+    with zipfile.ZipFile(bufer, 'w', compression=zipfile.ZIP_DEFLATED) as archivo:
+        for qr in _qrs_activos():
+            with cache_imagenes_qr.abrir(qr.id_unico, TAMANO_EXPORTACION, 'png') as imagen:
+                # El PNG ya viene comprimido
+                archivo.writestr(nombre_archivo_qr(qr), imagen.read(), compress_type=zipfile.ZIP_STORED)
+            yield bufer.vaciar()
+
+        with archivo.open(NOMBRE_HOJA, 'w') as hoja:
+            hoja.write(render_to_string('admin/hoja_qrs_encabezado.html', {'museo': museo}).encode())
+            qrs = _qrs_activos()
+            while pagina := list(islice(qrs, ETIQUETAS_POR_PAGINA)):
+                etiquetas = [(qr, nombre_archivo_qr(qr)) for qr in pagina]
+                hoja.write(render_to_string('admin/hoja_qrs_pagina.html', {'etiquetas': etiquetas}).encode())
+                yield bufer.vaciar()
+            hoja.write(b'</body>\n</html>\n')
+    yield bufer.vaciar()
+
+
+async def flujo_asincrono(partes):
+    """Recorrer un generador síncrono desde ASGI sin juntarlo entero en memoria"""
+    siguiente = sync_to_async(next)
+    while (parte := await siguiente(partes, None)) is not None:
+        yield parte
@@ -0,0 +1,97 @@
+"""
+Generación de las imágenes de los códigos QR
+
+No importa nada de Django para que las funciones se puedan ejecutar en otros
+procesos (ProcessPoolExecutor) sin configurar la aplicación.
+
+Los PNG son de 1 bit (blanco y negro) y se guardan con optimize=True, que
+prueba los filtros y el nivel de zlib más compactos: pesan entre un 10 y un
+25 % menos que con la compresión por defecto.
+"""
+import os
+import tempfile
+from io import BytesIO
+
+import qrcode
+from PIL import Image
+from qrcode.image.svg import SvgPathImage
+
+FORMATOS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+# Nombre del tamaño -> box_size (píxeles por módulo en PNG; en SVG, décimas de mm)
+TAMANOS = {
+    'mini': 2,
+    'normal': 10,
+    'grande': 20,
+    'impresion': 40,
+}
+
+
+def generar_imagen_qr(id_unico, formato='png', tamano='normal'):
+    """Imagen (bytes) del código QR que apunta a `id_unico`"""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=TAMANOS[tamano],
+        border=4,
+    )
+    # URL del sitio donde será escaneado
+    qr.add_data(f"{id_unico}/")
+    qr.make(fit=True)
+
+    buffer = BytesIO()
+    if formato == 'svg':
+        qr.make_image(image_factory=SvgPathImage).save(buffer)
+    else:
+        guardar_png_compacto(qr.make_image(fill_color="black", back_color="white").get_image(), buffer)
+    return buffer.getvalue()
+
+
+BLANCO_Y_NEGRO = {(0, 0, 0), (255, 255, 255)}
+# Los de media los puede servir otro usuario (nginx): mismos permisos que FILE_UPLOAD_PERMISSIONS
+PERMISOS_ARCHIVO = 0o644
+
+
+def guardar_png_compacto(imagen, destino):
+    """Guardar una imagen en blanco y negro como PNG de 1 bit con la mejor compresión"""
+    if imagen.mode != '1':
+        imagen = imagen.convert('1')
+    imagen.save(destino, format='PNG', optimize=True)
+
+
+def png_recomprimido(ruta):
+    """(bytes antes, PNG de 1 bit optimizado) de un PNG de QR, sin tocar el archivo.
+
+    El PNG nuevo es None si la imagen no es puramente blanco y negro o si no pesa menos.
+    """
+    antes = os.path.getsize(ruta)
+    with Image.open(ruta) as imagen:
+        imagen.load()
+    colores = imagen.convert('RGB').getcolors(2)
+    if colores is None or any(color not in BLANCO_Y_NEGRO for _, color in colores):
+        return antes, None
+    buffer = BytesIO()
+    guardar_png_compacto(imagen, buffer)
+    if buffer.tell() >= antes:
+        return antes, None
+    return antes, buffer.getvalue()
+
+
+def recomprimir_png(ruta):
+    """Reescribir en el lugar un PNG de QR en 1 bit optimizado; devuelve (bytes antes, bytes después).
+
+    Solo para archivos cuyo nombre no es la huella de su contenido (la caché
+    de imágenes de QR): los de media se guardan como archivos nuevos.
+    """
+    antes, datos = png_recomprimido(ruta)
+    if datos is None:
+        return antes, antes
+    descriptor, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix='.tmp')
+    with os.fdopen(descriptor, 'wb') as archivo:
+        archivo.write(datos)
+    os.chmod(temporal, PERMISOS_ARCHIVO)  # mkstemp crea con 0600
+    os.replace(temporal, ruta)
+    return antes, len(datos)
@@ -0,0 +1,127 @@
+"""
+Pasar los archivos de media subidos antes al almacenamiento direccionado
+
+Cada archivo referenciado por un FileField/ImageField de qrmuseum cuyo nombre
+todavía no es su huella se enlaza con el nombre nuevo, se actualizan las
+filas que lo usan y se borra el nombre viejo; si ya existe un archivo con la
+misma huella (un duplicado) solo se borra. Las derivadas se mueven con su
+imagen. De los archivos que no referencia nadie se borran las copias de uno
+referenciado (mismo directorio y contenido); el resto queda para
+limpiar_media. Con --simular solo informa.
+"""
+import os
+import shutil
+from collections import defaultdict
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from qrmuseum.almacenamiento import campos_archivo, es_direccionado, huella, nombre_direccionado
+from qrmuseum.cache_contenido import invalidar_contenido_qr
+from qrmuseum.configuracion import configuracion_museo
+from qrmuseum.derivadas import DIRECTORIO_DERIVADAS, directorio_derivadas, olvidar_indice
+from qrmuseum.models import ContenidoQR
+
+
+class Command(BaseCommand):
+    help = 'Renombra la media existente por su contenido y elimina los archivos duplicados'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--simular', action='store_true', help='Mostrar los cambios sin aplicarlos')
+
+    def handle(self, *args, **options):
+        simular = options['simular']
+        referencias = defaultdict(list)
+        for modelo, campo in campos_archivo():
+            for nombre in modelo.objects.exclude(**{f'{campo}__isnull': True}).exclude(**{campo: ''}) \
+                    .values_list(campo, flat=True).distinct():
+                referencias[nombre].append((modelo, campo))
+
+        movidos = duplicados = liberados = 0
+        destinos = {nombre for nombre in referencias if es_direccionado(nombre)}
+        for nombre in sorted(nombre for nombre in referencias if not es_direccionado(nombre)):
+            ruta = default_storage.path(nombre)
+            if not os.path.isfile(ruta):
+                self.stdout.write(self.style.WARNING(f'  Falta el archivo {nombre}'))
+                continue
+            with open(ruta, 'rb') as archivo:
+                nuevo = nombre_direccionado(nombre, huella(File(archivo)))
+            duplicado = nuevo in destinos or default_storage.exists(nuevo)
+            destinos.add(nuevo)
+            self.stdout.write(f'  {nombre} -> {nuevo}{" (duplicado)" if duplicado else ""}')
+            if duplicado:
+                duplicados += 1
+                liberados += os.path.getsize(ruta)
+            else:
+                movidos += 1
+            if not simular:
+                self.consolidar(nombre, nuevo, ruta, duplicado, referencias[nombre])
+
+        # Copias sueltas de un archivo referenciado (p. ej. la misma imagen subida dos veces)
+        for nombre, ruta in self.archivos_media():
+            if nombre in referencias or nombre in destinos:
+                continue
+            with open(ruta, 'rb') as archivo:
+                if nombre_direccionado(nombre, huella(File(archivo))) not in destinos:
+                    continue
+            self.stdout.write(f'  {nombre} (copia sin referencias)')
+            duplicados += 1
+            liberados += os.path.getsize(ruta)
+            if not simular:
+                os.remove(ruta)
+
+        if not simular and (movidos or duplicados):
+            configuracion_museo.invalidar()
+            for qr_id in ContenidoQR.objects.values_list('qr_id', flat=True):
+                invalidar_contenido_qr(qr_id)
+        accion = 'se consolidarían' if simular else 'consolidados'
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {movidos + duplicados} archivos {accion} ({duplicados} duplicados, '
+            f'{liberados / 1024:.0f} KB liberados)'
+        ))
+
+    @staticmethod
+    def archivos_media():
+        """(nombre, ruta) de los archivos subidos, sin las derivadas"""
+        raiz = default_storage.path('')
+        for directorio, subdirectorios, archivos in os.walk(raiz):
+            if directorio == raiz and DIRECTORIO_DERIVADAS in subdirectorios:
+                subdirectorios.remove(DIRECTORIO_DERIVADAS)
+            for archivo in archivos:
+                ruta = os.path.join(directorio, archivo)
+                yield os.path.relpath(ruta, raiz).replace(os.sep, '/'), ruta
+
+    @staticmethod
+    def consolidar(nombre, nuevo, ruta, duplicado, usos):
+        """Enlazar el nombre nuevo, apuntar las filas a él y borrar el viejo"""
+        if not duplicado:
+            destino = default_storage.path(nuevo)
+            try:
+                os.link(ruta, destino)
+            except OSError:
+                shutil.copy2(ruta, destino)
+        # update() no aplica auto_now: sin la fecha nueva los navegadores seguirían
+        # revalidando con 304 el HTML que apunta al nombre viejo (condicionales.py)
+        ahora = timezone.now()
+        with transaction.atomic():
+            for modelo, campo in usos:
+                cambios = {campo: nuevo}
+                if any(f.name == 'fecha_actualizacion' for f in modelo._meta.concrete_fields):
+                    cambios['fecha_actualizacion'] = ahora
+                modelo.objects.filter(**{campo: nombre}).update(**cambios)
+            # El video ya optimizado sigue siéndolo con el nombre nuevo
+            ContenidoQR.objects.filter(video_procesado=nombre).update(video_procesado=nuevo, fecha_actualizacion=ahora)
+        os.remove(ruta)
+
+        viejas, nuevas = directorio_derivadas(nombre), directorio_derivadas(nuevo)
+        if os.path.isdir(viejas):
+            if os.path.isdir(nuevas):
+                shutil.rmtree(viejas, ignore_errors=True)
+            else:
+                os.makedirs(os.path.dirname(nuevas), exist_ok=True)
+                os.replace(viejas, nuevas)
+        olvidar_indice(nombre)
+        olvidar_indice(nuevo)
@@ -0,0 +1,118 @@
+"""
+Recolección de archivos de media huérfanos
+
+Borrar un QR, cambiar un avatar o volver a subir un contenido deja el archivo
+anterior en media/ (con el almacenamiento direccionado un archivo puede estar
+en varias filas, así que nunca se borra al reemplazarlo). Este comando junta
+los nombres referenciados por todos los FileField/ImageField de qrmuseum y
+recorre el árbol una sola vez con os.scandir, sin cargarlo en memoria:
+
+- un archivo que ninguna fila referencia es huérfano;
+- un directorio de derivadas cuyo original ya no se referencia también.
+
+Solo se borran los que tienen más de --antiguedad minutos, para no tocar una
+subida cuya fila todavía no se confirmó. La caché de imágenes de QR se
+administra sola y no se recorre. Con --simular solo informa.
+"""
+import os
+import shutil
+import time
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from qrmuseum.almacenamiento import campos_archivo
+from qrmuseum.derivadas import DIRECTORIO_DERIVADAS, olvidar_indice
+
+
+def _recorrer(directorio, omitir):
+    """DirEntry de todos los archivos bajo `directorio`, salteando las rutas de `omitir`"""
+    with os.scandir(directorio) as entradas:
+        for entrada in entradas:
+            if entrada.path in omitir:
+                continue
+            if entrada.is_dir(follow_symlinks=False):
+                yield from _recorrer(entrada.path, omitir)
+            elif entrada.is_file(follow_symlinks=False):
+                yield entrada
+
+
+class Command(BaseCommand):
+    help = 'Informa y borra los archivos de media que no referencia ninguna fila'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--simular', action='store_true', help='Solo informar, sin borrar')
+        parser.add_argument(
+            '--antiguedad', type=int, default=60,
+            help='Minutos que debe tener un archivo para considerarlo huérfano (por defecto 60)'
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        simular, detallar = options['simular'], options['verbosity'] > 1
+        limite = time.time() - options['antiguedad'] * 60
+
+        referenciados = set()
+        for modelo, campo in campos_archivo():
+            referenciados.update(
+                modelo.objects.exclude(**{f'{campo}__isnull': True}).exclude(**{campo: ''})
+                .values_list(campo, flat=True).iterator()
+            )
+
+        raiz = default_storage.path('')
+        derivadas = os.path.join(raiz, DIRECTORIO_DERIVADAS)
+        omitir = {derivadas, os.path.abspath(settings.QR_CACHE_DIR)}
+        encontrados = set()
+        revisados = huerfanos = recientes = liberados = 0
+
+        if os.path.isdir(raiz):
+            for entrada in _recorrer(raiz, omitir):
+                revisados += 1
+                nombre = os.path.relpath(entrada.path, raiz).replace(os.sep, '/')
+                if nombre in referenciados:
+                    encontrados.add(nombre)
+                    continue
+                estado = entrada.stat(follow_symlinks=False)
+                if estado.st_mtime > limite:
+                    recientes += 1
+                    continue
+                huerfanos += 1
+                liberados += estado.st_size
+                if detallar:
+                    self.stdout.write(f'  {nombre} ({estado.st_size / 1024:.0f} KB)')
+                if not simular:
+                    os.remove(entrada.path)
+
+        # Derivadas: un directorio por original (derivadas/<nombre>/)
+        if os.path.isdir(derivadas):
+            for directorio, subdirectorios, archivos in os.walk(derivadas):
+                nombre = os.path.relpath(directorio, derivadas).replace(os.sep, '/')
+                if nombre in referenciados:
+                    subdirectorios.clear()
+                    continue
+                if not archivos:
+                    continue
+                rutas = [os.path.join(directorio, archivo) for archivo in archivos]
+                if max(os.path.getmtime(ruta) for ruta in rutas) > limite:
+                    recientes += 1
+                    continue
+                subdirectorios.clear()
+                huerfanos += 1
+                tamano = sum(os.path.getsize(ruta) for ruta in rutas)
+                liberados += tamano
+                if detallar:
+                    self.stdout.write(f'  {DIRECTORIO_DERIVADAS}/{nombre}/ ({tamano / 1024:.0f} KB)')
+                if not simular:
+                    shutil.rmtree(directorio, ignore_errors=True)
+                    olvidar_indice(nombre)
+
+        faltantes = referenciados - encontrados
+        for nombre in sorted(faltantes):
+            self.stdout.write(self.style.WARNING(f'  Falta el archivo {nombre}'))
+        accion = 'se borrarían' if simular else 'borrados'
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {huerfanos} huérfanos {accion} ({liberados / 1024 / 1024:.1f} MB) de {revisados} archivos '
+            f'revisados en {time.perf_counter() - inicio:.2f} s; {recientes} recientes conservados, '
+            f'{len(faltantes)} referencias a archivos que faltan'
+        ))
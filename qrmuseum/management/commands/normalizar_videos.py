@@ -0,0 +1,35 @@
+"""
+Recalcular los datos de video externo de los contenidos existentes
+
+Hace falta después de agregar o cambiar un proveedor en proveedores_video.py
+(o para filas escritas sin pasar por ContenidoQR.save()).
+"""
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from qrmuseum.cache_contenido import invalidar_contenido_qr
+from qrmuseum.models import ContenidoQR
+from qrmuseum.proveedores_video import CAMPOS_VIDEO_EXTERNO, normalizar_url_video
+
+
+class Command(BaseCommand):
+    help = 'Vuelve a calcular proveedor, id, embed y miniatura de los videos externos'
+
+    def handle(self, *args, **options):
+        contenidos = ContenidoQR.objects.only('qr_id', 'video_url_externa', *CAMPOS_VIDEO_EXTERNO)
+        cambiados = []
+        total = 0
+        ahora = timezone.now()
+        for contenido in contenidos.iterator():
+            total += 1
+            datos = normalizar_url_video(contenido.video_url_externa)
+            if any(getattr(contenido, campo) != valor for campo, valor in datos.items()):
+                for campo, valor in datos.items():
+                    setattr(contenido, campo, valor)
+                contenido.fecha_actualizacion = ahora
+                cambiados.append(contenido)
+        # bulk_update no llama a save() ni envía señales ni aplica auto_now: la fecha va a mano
+        ContenidoQR.objects.bulk_update(cambiados, [*CAMPOS_VIDEO_EXTERNO, 'fecha_actualizacion'], batch_size=500)
+        for contenido in cambiados:
+            invalidar_contenido_qr(contenido.qr_id)
+        self.stdout.write(self.style.SUCCESS(f'✓ {len(cambiados)} de {total} contenidos actualizados'))
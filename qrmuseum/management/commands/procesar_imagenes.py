@@ -0,0 +1,82 @@
+"""
+Backfill de las derivadas (miniaturas, WebP) de las imágenes ya subidas
+
+Recorre las imágenes referenciadas por los campos de CAMPOS_CON_DERIVADAS,
+genera en paralelo las que no tienen derivadas (o todas con --forzar) y
+renueva los fragmentos cacheados del contenido de los QR afectados.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from qrmuseum.cache_contenido import invalidar_contenido_qr
+from qrmuseum.derivadas import (
+    CAMPOS_CON_DERIVADAS, NOMBRE_INDICE, directorio_derivadas, generar_derivadas, olvidar_indice
+)
+from qrmuseum.models import ContenidoQR
+
+
+class Command(BaseCommand):
+    help = 'Genera las versiones redimensionadas y WebP de las imágenes subidas que aún no las tienen'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--procesos', type=int, default=os.cpu_count() or 1,
+            help='Procesos para redimensionar (por defecto, uno por CPU; 1 = sin pool)'
+        )
+        parser.add_argument('--forzar', action='store_true', help='Regenerar también las que ya tienen derivadas')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        nombres = set()
+        for nombre_modelo, campos in CAMPOS_CON_DERIVADAS.items():
+            modelo = apps.get_model('qrmuseum', nombre_modelo)
+            for fila in modelo.objects.values_list(*campos):
+                nombres.update(nombre for nombre in fila if nombre)
+
+        pendientes = []
+        for nombre in sorted(nombres):
+            destino = directorio_derivadas(nombre)
+            if not options['forzar'] and os.path.exists(os.path.join(destino, NOMBRE_INDICE)):
+                continue
+            origen = default_storage.path(nombre)
+            if not os.path.exists(origen):
+                self.stdout.write(self.style.WARNING(f'  Falta el archivo {nombre}'))
+                continue
+            pendientes.append((nombre, origen, destino))
+        if not pendientes:
+            self.stdout.write(self.style.SUCCESS(f'✓ Las {len(nombres)} imágenes ya tienen derivadas'))
+            return
+
+        procesos = max(1, options['procesos'])
+        if procesos == 1:
+            resultados = [self.procesar(generar_derivadas, nombre, origen, destino) for nombre, origen, destino in pendientes]
+        else:
+            with ProcessPoolExecutor(max_workers=procesos) as pool:
+                futuros = [(nombre, pool.submit(generar_derivadas, origen, destino)) for nombre, origen, destino in pendientes]
+                resultados = [self.procesar(futuro.result, nombre) for nombre, futuro in futuros]
+
+        listos = {nombre: indice for nombre, indice in resultados if indice}
+        for nombre in listos:
+            olvidar_indice(nombre)
+        for qr_id in ContenidoQR.objects.filter(imagen__in=list(listos)).values_list('qr_id', flat=True):
+            invalidar_contenido_qr(qr_id)
+
+        originales = sum(indice['bytes_original'] for indice in listos.values())
+        derivadas = sum(indice['bytes_derivadas'] for indice in listos.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {len(listos)} de {len(pendientes)} imágenes procesadas en {time.perf_counter() - inicio:.2f} s '
+            f'con {procesos} proceso(s): originales {originales / 1024:.0f} KB, derivadas {derivadas / 1024:.0f} KB'
+        ))
+
+    def procesar(self, funcion, nombre, *argumentos):
+        """(nombre, índice) o (nombre, None) si la imagen no se pudo leer"""
+        try:
+            return nombre, funcion(*argumentos)
+        except Exception as error:
+            self.stdout.write(self.style.WARNING(f'  No se pudo procesar {nombre}: {error}'))
+            return nombre, None
@@ -0,0 +1,28 @@
+"""
+Backfill del faststart y los metadatos de los videos ya subidos
+
+Procesa (en este proceso, de a uno) los ContenidoQR cuyo video todavía no
+pasó por videos.procesar_video.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from qrmuseum.models import ContenidoQR
+from qrmuseum.videos import procesar_video
+
+
+class Command(BaseCommand):
+    help = 'Mueve el índice de los videos subidos al principio y guarda su duración y dimensiones'
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        pendientes = list(
+            ContenidoQR.objects.exclude(video='').exclude(video__isnull=True)
+            .exclude(video_procesado=F('video')).values_list('pk', flat=True)
+        )
+        procesados = sum(procesar_video(contenido_id) for contenido_id in pendientes)
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {procesados} de {len(pendientes)} videos procesados en {time.perf_counter() - inicio:.2f} s'
+        ))
@@ -0,0 +1,185 @@
+"""
+Alta masiva de códigos QR desde un archivo CSV o JSON
+
+Cada punto lleva titulo y numero_secuencial (obligatorios), descripcion,
+ubicacion, activo y, opcionalmente, su contenido:
+
+- JSON: lista de objetos; el contenido va en la clave "contenido" con los
+  campos de ContenidoQR (titulo, descripcion_detallada, tipo_contenido, ...).
+- CSV: una fila por punto; las columnas del contenido llevan el prefijo
+  "contenido_" (contenido_titulo, contenido_descripcion_detallada, ...).
+
+Los números secuenciales que ya existen se omiten, así que el comando se puede
+volver a correr con el mismo archivo. Las filas se insertan con bulk_create;
+como bulk_create no dispara señales, se invalidan a mano el índice de UUID y
+las métricas. Después se renderizan en un pool de procesos las variantes de
+imagen que usan las páginas (VARIANTES_PRECALENTADAS) y se dejan en la caché
+de imágenes, para que la primera visita no espere al generador.
+"""
+import csv
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from qrmuseum.cache_imagenes_qr import cache_imagenes_qr
+from qrmuseum.imagenes_qr import generar_imagen_qr
+from qrmuseum.metricas import invalidar_metricas
+from qrmuseum.models import ContenidoQR, QRCode
+from qrmuseum.proveedores_video import normalizar_url_video
+from qrmuseum.resolver import resolvedor_qr
+
+CAMPOS_CONTENIDO = [
+    'tipo_contenido', 'titulo', 'descripcion_detallada', 'video_url_externa',
+    'datos_historicos', 'datos_cientificos', 'curiosidades', 'activo',
+]
+TIPOS_CONTENIDO = {clave for clave, _ in ContenidoQR.TIPO_CONTENIDO}
+
+# (tamaño, formato) que muestran contenido_qr y la lista del admin
+VARIANTES_PRECALENTADAS = [('normal', 'png'), ('mini', 'png')]
+
+
+def _booleano(valor, defecto=True):
+    if valor is None or valor == '':
+        return defecto
+    if isinstance(valor, bool):
+        return valor
+    return str(valor).strip().lower() in ('1', 'true', 'si', 'sí', 'yes', 'x')
+
+
+def leer_archivo(ruta):
+    """Lista de diccionarios crudos del archivo; en CSV el contenido se agrupa desde las columnas contenido_*"""
+    ruta = Path(ruta)
+    if not ruta.exists():
+        raise CommandError(f'No existe el archivo {ruta}')
+    extension = ruta.suffix.lower()
+    if extension == '.json':
+        with ruta.open(encoding='utf-8') as archivo:
+            datos = json.load(archivo)
+        if not isinstance(datos, list):
+            raise CommandError('El JSON debe ser una lista de puntos')
+        return datos
+    if extension == '.csv':
+        filas = []
+        with ruta.open(encoding='utf-8-sig', newline='') as archivo:
+            for fila in csv.DictReader(archivo):
+                punto = {clave: valor for clave, valor in fila.items() if not clave.startswith('contenido_')}
+                contenido = {
+                    clave.removeprefix('contenido_'): valor
+                    for clave, valor in fila.items() if clave.startswith('contenido_') and valor
+                }
+                if contenido:
+                    punto['contenido'] = contenido
+                filas.append(punto)
+        return filas
+    raise CommandError('Formato no soportado: use un archivo .csv o .json')
+
+
+def normalizar(numero, punto):
+    """(campos de QRCode, campos de ContenidoQR o None) de un punto validado"""
+    titulo = (punto.get('titulo') or '').strip()
+    if not titulo:
+        raise CommandError(f'Punto {numero}: falta el título')
+    try:
+        numero_secuencial = int(punto.get('numero_secuencial'))
+    except (TypeError, ValueError):
+        raise CommandError(f'Punto {numero}: numero_secuencial inválido ({punto.get("numero_secuencial")!r})')
+
+    qr = {
+        'titulo': titulo,
+        'numero_secuencial': numero_secuencial,
+        'descripcion': (punto.get('descripcion') or '').strip(),
+        'ubicacion': (punto.get('ubicacion') or '').strip(),
+        'activo': _booleano(punto.get('activo')),
+    }
+    datos = punto.get('contenido')
+    if not datos:
+        return qr, None
+    contenido = {campo: datos[campo] for campo in CAMPOS_CONTENIDO if datos.get(campo) not in (None, '')}
+    contenido.setdefault('titulo', titulo)
+    contenido.setdefault('descripcion_detallada', '')
+    contenido['activo'] = _booleano(contenido.get('activo'))
+    # bulk_create no pasa por ContenidoQR.save()
+    contenido.update(normalizar_url_video(contenido.get('video_url_externa')))
+    if contenido.get('tipo_contenido', 'multiplo') not in TIPOS_CONTENIDO:
+        raise CommandError(f'Punto {numero}: tipo_contenido inválido ({contenido["tipo_contenido"]!r})')
+    return qr, contenido
+
+
+class Command(BaseCommand):
+    help = 'Crea en bloque códigos QR (y su contenido) desde un archivo CSV o JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Archivo .csv o .json con los puntos a crear')
+        parser.add_argument(
+            '--procesos', type=int, default=os.cpu_count() or 1,
+            help='Procesos para generar las imágenes (por defecto, uno por CPU; 1 = sin pool)'
+        )
+        parser.add_argument('--lote', type=int, default=500, help='Filas por INSERT en bulk_create')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        puntos = [normalizar(numero, punto) for numero, punto in enumerate(leer_archivo(options['archivo']), 1)]
+
+        # Omitir los que ya existen y los repetidos dentro del archivo
+        existentes = set(QRCode.objects.filter(
+            numero_secuencial__in=[qr['numero_secuencial'] for qr, _ in puntos]
+        ).values_list('numero_secuencial', flat=True))
+        nuevos = []
+        for qr, contenido in puntos:
+            if qr['numero_secuencial'] not in existentes:
+                existentes.add(qr['numero_secuencial'])
+                nuevos.append((uuid.uuid4(), qr, contenido))
+        omitidos = len(puntos) - len(nuevos)
+        if not nuevos:
+            self.stdout.write(self.style.WARNING(f'No hay QR nuevos ({omitidos} ya existían)'))
+            return
+
+        with transaction.atomic():
+            qrs = QRCode.objects.bulk_create([
+                QRCode(id_unico=id_unico, url=f'qr://{id_unico}', **datos) for id_unico, datos, _ in nuevos
+            ], batch_size=options['lote'])
+            contenidos = ContenidoQR.objects.bulk_create([
+                ContenidoQR(qr=qr, **contenido)
+                for qr, (_, _, contenido) in zip(qrs, nuevos) if contenido is not None
+            ], batch_size=options['lote'])
+
+        # bulk_create no envía post_save
+        resolvedor_qr.invalidar()
+        invalidar_metricas()
+        segundos_filas = time.perf_counter() - inicio
+
+        # Imágenes en paralelo: es la parte que consume CPU
+        inicio_imagenes = time.perf_counter()
+        trabajos = [(qr.id_unico, tamano, formato) for qr in qrs for tamano, formato in VARIANTES_PRECALENTADAS]
+        ids, tamanos, formatos = zip(*trabajos)
+        procesos = max(1, options['procesos'])
+        if procesos == 1:
+            imagenes = map(generar_imagen_qr, ids, formatos, tamanos)
+            self.guardar_imagenes(trabajos, imagenes)
+        else:
+            with ProcessPoolExecutor(max_workers=procesos) as pool:
+                imagenes = pool.map(
+                    generar_imagen_qr, ids, formatos, tamanos, chunksize=max(1, len(trabajos) // (procesos * 4))
+                )
+                self.guardar_imagenes(trabajos, imagenes)
+        segundos_imagenes = time.perf_counter() - inicio_imagenes
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {len(qrs)} QR creados ({len(contenidos)} con contenido), {omitidos} omitidos por existir'
+        ))
+        self.stdout.write(
+            f'  Filas: {segundos_filas:.2f} s ({len(qrs) / max(segundos_filas, 1e-6):.0f} QR/s); '
+            f'imágenes: {len(trabajos)} en {segundos_imagenes:.2f} s con {procesos} proceso(s) '
+            f'({len(trabajos) / max(segundos_imagenes, 1e-6):.0f} imágenes/s)'
+        )
+
+    @staticmethod
+    def guardar_imagenes(trabajos, imagenes):
+        for (id_unico, tamano, formato), contenido in zip(trabajos, imagenes):
+            cache_imagenes_qr.guardar(id_unico, tamano, formato, contenido)
@@ -0,0 +1,90 @@
+"""
+Recomprimir las imágenes de QR ya guardadas como PNG de 1 bit optimizados
+
+Recorre las imágenes antiguas de QRCode.qr_code_image (media/qrcodes/) y las
+variantes PNG de la caché de imágenes (QR_CACHE_DIR), las recomprime en
+paralelo y muestra cuántos bytes se ahorraron. Las de media se guardan como
+archivos nuevos con su propia huella (el nombre de un archivo direccionado no
+cambia nunca de bytes, ver almacenamiento.py) y las filas pasan a apuntarles;
+las originales quedan para `manage.py limpiar_media`. Las de la caché se
+reescriben en el lugar. Es idempotente: un archivo que ya está optimizado
+queda igual.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+
+from qrmuseum.imagenes_qr import png_recomprimido, recomprimir_png
+from qrmuseum.models import QRCode
+
+
+def _pngs_guardados(almacenamiento):
+    """{nombre: ruta} de las imágenes de qr_code_image que están en disco"""
+    nombres = set(
+        QRCode.objects.exclude(qr_code_image='').exclude(qr_code_image=None).values_list('qr_code_image', flat=True)
+    )
+    rutas = {}
+    for nombre in sorted(nombres):
+        try:
+            ruta = almacenamiento.path(nombre)
+        except NotImplementedError:
+            raise CommandError('El almacenamiento de media no es local: no se pueden leer las imágenes')
+        if os.path.exists(ruta):
+            rutas[nombre] = ruta
+    return rutas
+
+
+def _pngs_cache():
+    directorio = Path(settings.QR_CACHE_DIR)
+    return [str(ruta) for ruta in directorio.glob('*.png')] if directorio.is_dir() else []
+
+
+class Command(BaseCommand):
+    help = 'Reescribe las imágenes PNG de los QR como PNG de 1 bit optimizados y muestra el ahorro'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--procesos', type=int, default=os.cpu_count() or 1,
+            help='Procesos para recomprimir (por defecto, uno por CPU; 1 = sin pool)'
+        )
+
+    def handle(self, *args, **options):
+        almacenamiento = QRCode._meta.get_field('qr_code_image').storage
+        guardados = _pngs_guardados(almacenamiento)
+        cache = _pngs_cache()
+        rutas = [*guardados.values(), *cache]
+        if not rutas:
+            self.stdout.write(self.style.WARNING('No hay imágenes PNG de QR para recomprimir'))
+            return
+
+        procesos = max(1, options['procesos'])
+        if procesos == 1:
+            nuevos = list(map(png_recomprimido, guardados.values()))
+            resultados = list(map(recomprimir_png, cache))
+        else:
+            trozo = max(1, len(rutas) // (procesos * 4))
+            with ProcessPoolExecutor(max_workers=procesos) as pool:
+                nuevos = list(pool.map(png_recomprimido, guardados.values(), chunksize=trozo))
+                resultados = list(pool.map(recomprimir_png, cache, chunksize=trozo))
+
+        for nombre, (bytes_antes, datos) in zip(guardados, nuevos):
+            if datos is None:
+                resultados.append((bytes_antes, bytes_antes))
+                continue
+            nuevo = almacenamiento.save(nombre, ContentFile(datos))
+            # Todas las filas que compartían el archivo; update() no dispara señales
+            QRCode.objects.filter(qr_code_image=nombre).update(qr_code_image=nuevo)
+            resultados.append((bytes_antes, len(datos)))
+
+        antes = sum(bytes_antes for bytes_antes, _ in resultados)
+        despues = sum(bytes_despues for _, bytes_despues in resultados)
+        cambiados = sum(1 for bytes_antes, bytes_despues in resultados if bytes_despues < bytes_antes)
+        ahorro = antes - despues
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {cambiados} de {len(rutas)} imágenes recomprimidas: {antes / 1024:.1f} KB -> {despues / 1024:.1f} KB '
+            f'({ahorro / 1024:.1f} KB ahorrados, {ahorro * 100 / max(antes, 1):.0f} %)'
+        ))
@@ -0,0 +1,18 @@
+"""
+Recalcular los contadores de comentarios y calificaciones de cada contenido
+"""
+from django.core.management.base import BaseCommand
+
+from qrmuseum.cache_contenido import invalidar_contenido_qr
+from qrmuseum.comentarios import reconciliar_contadores_comentarios
+
+
+class Command(BaseCommand):
+    help = 'Compara los contadores de comentarios de cada contenido con Comentario y corrige los desfasados'
+
+    def handle(self, *args, **options):
+        corregidos, revisados = reconciliar_contadores_comentarios()
+        for contenido in corregidos:
+            invalidar_contenido_qr(contenido.qr_id)
+        estilo = self.style.WARNING if corregidos else self.style.SUCCESS
+        self.stdout.write(estilo(f'✓ {len(corregidos)} de {revisados} contenidos tenían contadores desfasados'))
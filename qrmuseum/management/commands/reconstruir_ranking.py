@@ -0,0 +1,14 @@
+"""
+Reconstruir el ranking materializado desde UsuarioMuseo y ProgresoUsuario
+"""
+from django.core.management.base import BaseCommand
+
+from qrmuseum.ranking import reconstruir_ranking
+
+
+class Command(BaseCommand):
+    help = 'Rehace el histograma de puntajes y los contadores de escaneos por QR'
+
+    def handle(self, *args, **options):
+        niveles, qrs = reconstruir_ranking()
+        self.stdout.write(self.style.SUCCESS(f'✓ Ranking reconstruido: {niveles} niveles, {qrs} QR'))
@@ -0,0 +1,22 @@
+"""
+Backfill de las tablas resumen de escaneos (por hora y por día)
+"""
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from qrmuseum.analitica import reconstruir_resumenes
+
+
+class Command(BaseCommand):
+    help = 'Rehace EscaneosPorHora y EscaneosPorDia desde ProgresoUsuario'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--desde', type=date.fromisoformat, default=None,
+            help='Reconstruir solo desde este día (AAAA-MM-DD); por defecto todo el historial'
+        )
+
+    def handle(self, *args, **options):
+        horas, dias = reconstruir_resumenes(options['desde'])
+        self.stdout.write(self.style.SUCCESS(f'✓ Resúmenes reconstruidos: {horas} filas por hora, {dias} por día'))
@@ -0,0 +1,150 @@
+"""
+Servir los archivos subidos (MEDIA_ROOT) también en producción
+
+django.conf.urls.static solo funciona con DEBUG y no entiende rangos, así que
+adelantar un audio o video obligaba a bajarlo desde el principio.
+respuesta_archivo (usada por la vista servir_medio) responde:
+
+- Range de una franja (bytes=a-b, bytes=a-, bytes=-n) con 206 y If-Range;
+  varias franjas se contestan con el archivo completo, como permite la RFC.
+- ETag y Last-Modified, con 304 para las peticiones condicionales.
+- HEAD sin cuerpo.
+
+El archivo se lee por bloques (bajo WSGI la respuesta completa usa
+wsgi.file_wrapper/sendfile; bajo ASGI un iterador async que lee en hilos). Si
+hay un proxy delante, MEDIA_ACCEL_REDIRECT (p. ej. '/media-interno/') hace que
+la vista solo valide la ruta y devuelva X-Accel-Redirect: nginx envía el
+archivo con sendfile y resuelve los rangos.
+"""
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+BLOQUE = 64 * 1024
+CACHE_CONTROL_MEDIOS = 'public, max-age=3600'
+
+RE_RANGO = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def rango_pedido(cabecera, tamano):
+    """(inicio, fin) inclusivos de la cabecera Range, o None si se debe enviar el archivo completo.
+
+    Lanza ValueError si la franja no se puede satisfacer (416).
+    """
+    coincidencia = RE_RANGO.match(cabecera.strip())
+    if not coincidencia:
+        return None  # varias franjas u otra unidad
+    desde, hasta = coincidencia.groups()
+    if not desde:
+        if not hasta:
+            return None
+        sufijo = int(hasta)
+        if sufijo == 0:
+            raise ValueError('Franja vacía')
+        return max(0, tamano - sufijo), tamano - 1
+    inicio = int(desde)
+    fin = min(int(hasta), tamano - 1) if hasta else tamano - 1
+    if inicio >= tamano or (hasta and int(hasta) < inicio):
+        raise ValueError('Franja fuera del archivo')
+    return inicio, fin
+
+
+def _if_range_vigente(request, etag, modificado):
+    """If-Range: el rango vale solo si el archivo no cambió desde la copia del cliente"""
+    condicion = request.META.get('HTTP_IF_RANGE')
+    if not condicion:
+        return True
+    if condicion.startswith('"'):
+        return condicion == etag
+    fecha = parse_http_date_safe(condicion)
+    return fecha is not None and int(modificado) <= fecha
+
+
+def _trozos(archivo, longitud):
+    with archivo:
+        while longitud > 0:
+            datos = archivo.read(min(BLOQUE, longitud))
+            if not datos:
+                return
+            longitud -= len(datos)
+            yield datos
+
+
+async def _atrozos(archivo, longitud):
+    # Lecturas en hilos libres: no deben esperar detrás de las vistas síncronas
+    leer = sync_to_async(archivo.read, thread_sensitive=False)
+    try:
+        while longitud > 0:
+            datos = await leer(min(BLOQUE, longitud))
+            if not datos:
+                return
+            longitud -= len(datos)
+            yield datos
+    finally:
+        archivo.close()
+
+
+def respuesta_archivo(request, completa, ruta_accel=None, cache_control=CACHE_CONTROL_MEDIOS):
+    """Respuesta para el archivo `completa` con Range y validadores; `ruta_accel` activa X-Accel-Redirect"""
+    try:
+        estado = os.stat(completa)
+    except OSError:
+        raise Http404('Archivo no encontrado')
+    if not stat.S_ISREG(estado.st_mode):
+        raise Http404('Archivo no encontrado')
+
+    tipo, codificacion = mimetypes.guess_type(completa)
+    if codificacion or not tipo:
+        tipo = 'application/octet-stream'
+    tamano = estado.st_size
+    etag = f'"{estado.st_mtime_ns:x}-{tamano:x}"'
+    cabeceras = {
+        'ETag': etag,
+        'Last-Modified': http_date(estado.st_mtime),
+        'Cache-Control': cache_control,
+        'Accept-Ranges': 'bytes',
+    }
+
+    respuesta = get_conditional_response(request, etag=etag, last_modified=int(estado.st_mtime))
+    if respuesta is None and ruta_accel:
+        respuesta = HttpResponse(content_type=tipo)
+        respuesta['X-Accel-Redirect'] = quote(ruta_accel)
+    if respuesta is not None:
+        for nombre, valor in cabeceras.items():
+            respuesta[nombre] = valor
+        return respuesta
+
+    rango = None
+    if 'HTTP_RANGE' in request.META and _if_range_vigente(request, etag, estado.st_mtime):
+        try:
+            rango = rango_pedido(request.META['HTTP_RANGE'], tamano)
+        except ValueError:
+            respuesta = HttpResponse(status=416)
+            respuesta['Content-Range'] = f'bytes */{tamano}'
+            return respuesta
+    inicio, fin = rango or (0, tamano - 1)
+    longitud = max(0, fin - inicio + 1)
+
+    if request.method == 'HEAD':
+        respuesta = HttpResponse(content_type=tipo, status=206 if rango else 200)
+    elif rango is None and not isinstance(request, ASGIRequest):
+        respuesta = FileResponse(open(completa, 'rb'), content_type=tipo)
+    else:
+        archivo = open(completa, 'rb')
+        archivo.seek(inicio)
+        partes = _atrozos(archivo, longitud) if isinstance(request, ASGIRequest) else _trozos(archivo, longitud)
+        respuesta = StreamingHttpResponse(partes, content_type=tipo, status=206 if rango else 200)
+    respuesta['Content-Length'] = longitud
+    if rango:
+        respuesta['Content-Range'] = f'bytes {inicio}-{fin}/{tamano}'
+    for nombre, valor in cabeceras.items():
+        respuesta[nombre] = valor
+    return respuesta
@@ -0,0 +1,42 @@
+"""
+Contadores del panel de administración
+
+admin_dashboard y admin_estadisticas muestran los mismos totales. Se calculan
+con agregación condicional (una consulta por tabla: QR, usuarios y
+comentarios; los escaneos salen del contador QRCode.total_escaneos) y se
+guardan en la caché por poco tiempo. Crear o borrar QR, usuarios o
+comentarios invalida la entrada (ver signals.py); los escaneos, que llegan
+a cada momento, se actualizan con el TTL.
+"""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+
+from qrmuseum.models import Comentario, QRCode
+
+CLAVE_METRICAS = 'qrmuseum:metricas_dashboard'
+TTL_METRICAS = 60
+
+
+def calcular_metricas():
+    """Totales del panel directamente desde la base de datos (3 consultas)"""
+    metricas = QRCode.objects.aggregate(
+        total_qrs=Count('id'),
+        qrs_activos=Count('id', filter=Q(activo=True)),
+        total_escaneos=Sum('total_escaneos', default=0),
+    )
+    metricas.update(Comentario.objects.aggregate(
+        total_comentarios=Count('id'),
+        comentarios_pendientes=Count('id', filter=Q(moderado=False)),
+    ))
+    metricas['total_usuarios'] = User.objects.count()
+    return metricas
+
+
+def metricas_dashboard():
+    """Totales del panel, cacheados hasta TTL_METRICAS segundos"""
+    return cache.get_or_set(CLAVE_METRICAS, calcular_metricas, TTL_METRICAS)
+
+
+def invalidar_metricas():
+    cache.delete(CLAVE_METRICAS)
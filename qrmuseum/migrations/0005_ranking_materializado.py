@@ -0,0 +1,51 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:14
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def poblar_ranking(apps, schema_editor):
+    NivelRanking = apps.get_model('qrmuseum', 'NivelRanking')
+    QRCode = apps.get_model('qrmuseum', 'QRCode')
+    UsuarioMuseo = apps.get_model('qrmuseum', 'UsuarioMuseo')
+    NivelRanking.objects.bulk_create([
+        NivelRanking(puntos=fila['puntos'], usuarios=fila['total'])
+        for fila in UsuarioMuseo.objects.filter(puntos__gt=0).order_by().values('puntos').annotate(total=Count('id'))
+    ])
+    for qr in QRCode.objects.annotate(total=Count('visitantes')):
+        QRCode.objects.filter(pk=qr.pk).update(total_escaneos=qr.total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qrmuseum', '0004_remove_progresousuario_tiempo_permanencia'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NivelRanking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('puntos', models.IntegerField(unique=True)),
+                ('usuarios', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Nivel del Ranking',
+                'verbose_name_plural': 'Niveles del Ranking',
+                'ordering': ['-puntos'],
+            },
+        ),
+        migrations.AddField(
+            model_name='qrcode',
+            name='total_escaneos',
+            field=models.IntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='usuariomuseo',
+            index=models.Index(fields=['-puntos', 'usuario'], name='usuariomuseo_ranking_idx'),
+        ),
+        migrations.RunPython(poblar_ranking, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate, TruncHour
+
+
+def poblar_resumenes(apps, schema_editor):
+    ProgresoUsuario = apps.get_model('qrmuseum', 'ProgresoUsuario')
+    for nombre, campo, truncar in [('EscaneosPorHora', 'hora', TruncHour), ('EscaneosPorDia', 'dia', TruncDate)]:
+        modelo = apps.get_model('qrmuseum', nombre)
+        modelo.objects.bulk_create([
+            modelo(**{campo: fila['bucket']}, qr_id=fila['qr_visitado'], escaneos=fila['total'])
+            for fila in ProgresoUsuario.objects.order_by().annotate(bucket=truncar('fecha_visita'))
+            .values('bucket', 'qr_visitado').annotate(total=Count('id'))
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qrmuseum', '0005_ranking_materializado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EscaneosPorDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('escaneos', models.IntegerField(default=0)),
+                ('qr', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='escaneos_por_dia', to='qrmuseum.qrcode')),
+            ],
+            options={
+                'verbose_name': 'Escaneos por Día',
+                'verbose_name_plural': 'Escaneos por Día',
+                'ordering': ['-dia'],
+                'unique_together': {('dia', 'qr')},
+            },
+        ),
+        migrations.CreateModel(
+            name='EscaneosPorHora',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hora', models.DateTimeField()),
+                ('escaneos', models.IntegerField(default=0)),
+                ('qr', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='escaneos_por_hora', to='qrmuseum.qrcode')),
+            ],
+            options={
+                'verbose_name': 'Escaneos por Hora',
+                'verbose_name_plural': 'Escaneos por Hora',
+                'ordering': ['-hora'],
+                'unique_together': {('hora', 'qr')},
+            },
+        ),
+        migrations.RunPython(poblar_resumenes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qrmuseum', '0006_resumenes_escaneos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contenidoqr',
+            name='video_alto',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='contenidoqr',
+            name='video_ancho',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='contenidoqr',
+            name='video_duracion',
+            field=models.FloatField(blank=True, editable=False, help_text='Segundos', null=True),
+        ),
+        migrations.AddField(
+            model_name='contenidoqr',
+            name='video_procesado',
+            field=models.CharField(blank=True, editable=False, help_text='Archivo de video ya optimizado (faststart)', max_length=255),
+        ),
+    ]
@@ -0,0 +1,101 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:54
+
+import re
+from urllib.parse import urlsplit
+
+from django.db import migrations, models
+
+# Copia congelada de qrmuseum/proveedores_video.py tal como estaba en esta
+# migración: los cambios posteriores a los proveedores no deben alterar lo que
+# hace al aplicarse. Para recalcular con los proveedores actuales está
+# `manage.py normalizar_videos`.
+PROVEEDORES = (
+    (
+        'youtube',
+        ('youtube.com', 'youtu.be', 'youtube-nocookie.com'),
+        (
+            re.compile(r'[?&]v=(?P<id>[\w-]{11})'),
+            re.compile(r'(?:youtu\.be/|/embed/|/shorts/|/live/)(?P<id>[\w-]{11})'),
+        ),
+        'https://www.youtube.com/embed/{}?modestbranding=1&rel=0',
+        'https://img.youtube.com/vi/{}/hqdefault.jpg',
+    ),
+    (
+        'vimeo',
+        ('vimeo.com',),
+        (re.compile(r'vimeo\.com/(?:.*/)?(?P<id>\d+)'),),
+        'https://player.vimeo.com/video/{}',
+        '',
+    ),
+    (
+        'drive',
+        ('drive.google.com', 'docs.google.com'),
+        (re.compile(r'/d/(?P<id>[\w-]{10,})'), re.compile(r'[?&]id=(?P<id>[\w-]{10,})')),
+        'https://drive.google.com/file/d/{}/preview',
+        'https://drive.google.com/thumbnail?id={}&sz=w640',
+    ),
+)
+
+
+def normalizar_url_video(url):
+    url = url.strip()
+    original = url if url.startswith('http') else f'https://{url}'
+    host = (urlsplit(original).hostname or '').lower()
+    for nombre, dominios, patrones, embed, miniatura in PROVEEDORES:
+        if not any(host == dominio or host.endswith('.' + dominio) for dominio in dominios):
+            continue
+        coincidencia = next((c for c in (patron.search(original) for patron in patrones) if c), None)
+        video_id = coincidencia.group('id') if coincidencia else ''
+        return {
+            'video_proveedor': nombre,
+            'video_id_externo': video_id,
+            'video_url_embed': embed.format(video_id) if video_id else url,
+            'video_url_miniatura': miniatura.format(video_id) if video_id and miniatura else '',
+            'video_url_original': original,
+        }
+    return {
+        'video_proveedor': '', 'video_id_externo': '', 'video_url_embed': url,
+        'video_url_miniatura': '', 'video_url_original': original,
+    }
+
+
+def normalizar_videos(apps, schema_editor):
+    ContenidoQR = apps.get_model('qrmuseum', 'ContenidoQR')
+    for contenido in ContenidoQR.objects.exclude(video_url_externa__isnull=True).exclude(video_url_externa=''):
+        ContenidoQR.objects.filter(pk=contenido.pk).update(**normalizar_url_video(contenido.video_url_externa))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qrmuseum', '0007_video_metadatos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contenidoqr',
+            name='video_id_externo',
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='contenidoqr',
+            name='video_proveedor',
+            field=models.CharField(blank=True, editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='contenidoqr',
+            name='video_url_embed',
+            field=models.URLField(blank=True, editable=False, max_length=300),
+        ),
+        migrations.AddField(
+            model_name='contenidoqr',
+            name='video_url_miniatura',
+            field=models.URLField(blank=True, editable=False, max_length=300),
+        ),
+        migrations.AddField(
+            model_name='contenidoqr',
+            name='video_url_original',
+            field=models.URLField(blank=True, editable=False, max_length=300),
+        ),
+        migrations.RunPython(normalizar_videos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:56
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def poblar_contadores(apps, schema_editor):
+    Comentario = apps.get_model('qrmuseum', 'Comentario')
+    ContenidoQR = apps.get_model('qrmuseum', 'ContenidoQR')
+    aprobado = Q(moderado=True)
+    filas = Comentario.objects.order_by().values('contenido_qr').annotate(
+        total_comentarios=Count('id'),
+        total_aprobados=Count('id', filter=aprobado),
+        total_pendientes=Count('id', filter=~aprobado),
+        suma_calificaciones=Sum('calificacion', filter=aprobado, default=0),
+        **{f'calificaciones_{i}': Count('id', filter=aprobado & Q(calificacion=i)) for i in range(1, 6)},
+    )
+    for fila in filas:
+        ContenidoQR.objects.filter(pk=fila.pop('contenido_qr')).update(**fila)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qrmuseum', '0008_video_externo_normalizado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contenidoqr',
+            name='calificaciones_1',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='contenidoqr',
+            name='calificaciones_2',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='contenidoqr',
+            name='calificaciones_3',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='contenidoqr',
+            name='calificaciones_4',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='contenidoqr',
+            name='calificaciones_5',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='contenidoqr',
+            name='suma_calificaciones',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='contenidoqr',
+            name='total_aprobados',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='contenidoqr',
+            name='total_comentarios',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='contenidoqr',
+            name='total_pendientes',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(poblar_contadores, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,11 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
+import os
 import uuid
-import qrcode
-from io import BytesIO
-from django.core.files import File
+from django.urls import reverse
+from django.utils.text import slugify
+
+from qrmuseum.proveedores_video import CAMPOS_VIDEO_EXTERNO, normalizar_url_video
 
 class MuseoConfig(models.Model):
     """Configuración del museo"""
@@ -31,12 +33,13 @@ class QRCode(models.Model):
     ubicacion = models.CharField(max_length=255, blank=True)
     numero_secuencial = models.IntegerField(help_text="Número de orden en la búsqueda del tesoro")
     
-    # QR
+    # QR (la imagen se genera a pedido en la vista imagen_qr; este campo queda para los QR antiguos)
     qr_code_image = models.ImageField(upload_to='qrcodes/', blank=True, null=True)
     url = models.URLField(max_length=500, unique=True, editable=False)
     
     # Control
     activo = models.BooleanField(default=True)
+    total_escaneos = models.IntegerField(default=0, db_index=True, editable=False)  # Ver ranking.py
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_actualizacion = models.DateTimeField(auto_now=True)
     
@@ -53,28 +56,11 @@ class QRCode(models.Model):
         if not self.url:
             self.url = f"qr://{self.id_unico}"
         
-        # Generar código QR automáticamente
-        if not self.qr_code_image:
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_L,
-                box_size=10,
-                border=4,
-            )
-            # URL del sitio donde será escaneado
-            qr_url = f"{self.id_unico}/"
-            qr.add_data(qr_url)
-            qr.make(fit=True)
-            
-            img = qr.make_image(fill_color="black", back_color="white")
-            
-            # Guardar en memoria
-            buffer = BytesIO()
-            img.save(buffer, format='PNG')
-            file_name = f'qr_{self.id_unico}.png'
-            self.qr_code_image.save(file_name, File(buffer), save=False)
-        
         super().save(*args, **kwargs)
+    
+    def get_imagen_url(self, tamano='normal', formato='png'):
+        """URL de la imagen del código QR (ver imagenes_qr.TAMANOS y FORMATOS)"""
+        return reverse('imagen_qr', args=[self.id_unico, tamano, formato])
 
 
 class ContenidoQR(models.Model):
@@ -96,8 +82,20 @@ class ContenidoQR(models.Model):
     imagen = models.ImageField(upload_to='contenido/imagenes/', blank=True, null=True)
     video = models.FileField(upload_to='contenido/videos/', blank=True, null=True, 
                             help_text="Formatos: MP4, WebM")
+    # Metadatos del video local, los completa videos.procesar_video en segundo plano
+    video_duracion = models.FloatField(null=True, blank=True, editable=False, help_text="Segundos")
+    video_ancho = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    video_alto = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    video_procesado = models.CharField(max_length=255, blank=True, editable=False,
+                                       help_text="Archivo de video ya optimizado (faststart)")
     video_url_externa = models.URLField(blank=True, null=True, 
                                         help_text="URL de video externo (YouTube, Google Drive, etc.)")
+    # Derivados de video_url_externa al guardar (ver proveedores_video.py)
+    video_proveedor = models.CharField(max_length=20, blank=True, editable=False)
+    video_id_externo = models.CharField(max_length=100, blank=True, editable=False)
+    video_url_embed = models.URLField(max_length=300, blank=True, editable=False)
+    video_url_miniatura = models.URLField(max_length=300, blank=True, editable=False)
+    video_url_original = models.URLField(max_length=300, blank=True, editable=False)
     audio = models.FileField(upload_to='contenido/audios/', blank=True, null=True,
                             help_text="Formatos: MP3, WAV, MP4")
     archivo_descarga = models.FileField(upload_to='contenido/archivos/', blank=True, null=True,
@@ -119,6 +117,17 @@ class ContenidoQR(models.Model):
     mostrar_curiosidades = models.BooleanField(default=True, help_text="Mostrar curiosidades")
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    # Contadores de comentarios (ver comentarios.py); la suma y el histograma son de los aprobados
+    total_comentarios = models.IntegerField(default=0, editable=False)
+    total_aprobados = models.IntegerField(default=0, editable=False)
+    total_pendientes = models.IntegerField(default=0, editable=False)
+    suma_calificaciones = models.IntegerField(default=0, editable=False)
+    calificaciones_1 = models.IntegerField(default=0, editable=False)
+    calificaciones_2 = models.IntegerField(default=0, editable=False)
+    calificaciones_3 = models.IntegerField(default=0, editable=False)
+    calificaciones_4 = models.IntegerField(default=0, editable=False)
+    calificaciones_5 = models.IntegerField(default=0, editable=False)
     
     class Meta:
         verbose_name = 'Contenido QR'
@@ -127,65 +136,34 @@ class ContenidoQR(models.Model):
     def __str__(self):
         return f"Contenido: {self.qr.titulo}"
     
-    def get_video_url_embed(self):
-        """Convierte URL de video a formato embed para plataformas conocidas"""
-        if not self.video_url_externa:
-            return None
-        
-        url = self.video_url_externa.strip()
-        
-        # YouTube - Extrae ID del video
-        if 'youtube.com' in url or 'youtu.be' in url:
-            video_id = None
-            
-            # Formato: youtube.com/watch?v=VIDEO_ID
-            if 'watch?v=' in url:
-                video_id = url.split('watch?v=')[1].split('&')[0]
-            # Formato: youtu.be/VIDEO_ID
-            elif 'youtu.be/' in url:
-                video_id = url.split('youtu.be/')[1].split('?')[0].split('&')[0]
-            # Formato: youtube.com/embed/VIDEO_ID (ya está en embed)
-            elif 'embed/' in url:
-                video_id = url.split('embed/')[1].split('?')[0].split('&')[0]
-            
-            if video_id:
-                # Retorna URL con parámetros que funcionan mejor
-                return f'https://www.youtube.com/embed/{video_id}?modestbranding=1&rel=0'
-            return url
-        
-        # Vimeo
-        elif 'vimeo.com' in url:
-            video_id = None
-            if 'vimeo.com/' in url:
-                video_id = url.split('vimeo.com/')[1].split('?')[0].split('#')[0]
-            if video_id:
-                return f'https://player.vimeo.com/video/{video_id}'
-            return url
-        
-        # Google Drive
-        elif 'drive.google.com' in url or 'docs.google.com' in url:
-            file_id = None
-            if '/d/' in url:
-                file_id = url.split('/d/')[1].split('/')[0]
-            if file_id:
-                return f'https://drive.google.com/file/d/{file_id}/preview'
-            return url
-        
-        # Si no es una URL conocida, devolverla tal cual
-        return url
-    
-    def get_video_url_original(self):
-        """Obtiene la URL original del video para abrir en nueva pestaña"""
-        if not self.video_url_externa:
+    def save(self, *args, **kwargs):
+        # El video externo se interpreta una vez aquí y no en cada render
+        for campo, valor in normalizar_url_video(self.video_url_externa).items():
+            setattr(self, campo, valor)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'video_url_externa' in update_fields:
+            kwargs['update_fields'] = {*update_fields, *CAMPOS_VIDEO_EXTERNO}
+        super().save(*args, **kwargs)
+
+    @property
+    def promedio_calificacion(self):
+        """Calificación promedio de los comentarios aprobados (None si no hay)"""
+        if not self.total_aprobados:
             return None
-        
-        url = self.video_url_externa.strip()
-        
-        # Asegura que sea una URL completa
-        if not url.startswith('http'):
-            return f'https://{url}'
-        
-        return url
+        return round(self.suma_calificaciones / self.total_aprobados, 1)
+
+    def get_nombre_descarga(self):
+        """Nombre legible para descargar archivo_descarga (en disco se guarda con su huella)"""
+        extension = os.path.splitext(self.archivo_descarga.name)[1]
+        return f"{slugify(self.titulo) or 'archivo'}{extension}"
+
+    def get_duracion_video(self):
+        """Duración del video local como m:ss (o h:mm:ss)"""
+        if self.video_duracion is None:
+            return ''
+        minutos, segundos = divmod(round(self.video_duracion), 60)
+        horas, minutos = divmod(minutos, 60)
+        return f'{horas}:{minutos:02d}:{segundos:02d}' if horas else f'{minutos}:{segundos:02d}'
 
 
 class ProgresoUsuario(models.Model):
@@ -205,6 +183,38 @@ class ProgresoUsuario(models.Model):
         return f"{self.usuario.username} - {self.qr_visitado.titulo}"
 
 
+class EscaneosPorHora(models.Model):
+    """Escaneos agregados por hora (local) y QR, ver analitica.py"""
+    hora = models.DateTimeField()
+    qr = models.ForeignKey(QRCode, on_delete=models.CASCADE, related_name='escaneos_por_hora')
+    escaneos = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Escaneos por Hora'
+        verbose_name_plural = 'Escaneos por Hora'
+        unique_together = ['hora', 'qr']
+        ordering = ['-hora']
+
+    def __str__(self):
+        return f"{self.hora:%Y-%m-%d %H:00} - QR {self.qr_id}: {self.escaneos}"
+
+
+class EscaneosPorDia(models.Model):
+    """Escaneos agregados por día (local) y QR, ver analitica.py"""
+    dia = models.DateField()
+    qr = models.ForeignKey(QRCode, on_delete=models.CASCADE, related_name='escaneos_por_dia')
+    escaneos = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Escaneos por Día'
+        verbose_name_plural = 'Escaneos por Día'
+        unique_together = ['dia', 'qr']
+        ordering = ['-dia']
+
+    def __str__(self):
+        return f"{self.dia} - QR {self.qr_id}: {self.escaneos}"
+
+
 class Comentario(models.Model):
     """Comentarios de usuarios sobre el contenido del QR"""
     usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='comentarios_museo')
@@ -223,13 +233,18 @@ class Comentario(models.Model):
     def __str__(self):
         return f"{self.usuario.username} - {self.contenido_qr.qr.titulo}"
 
+    def save(self, *args, **kwargs):
+        # Las señales pre_save/post_save ajustan los contadores de ContenidoQR en la misma transacción
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+
 
 class UsuarioMuseo(models.Model):
     """Perfil extendido de usuario para el museo"""
     usuario = models.OneToOneField(User, on_delete=models.CASCADE, related_name='perfil_museo')
     apodo_juego = models.CharField(max_length=100, blank=True)
     avatar = models.ImageField(upload_to='avatares/', blank=True, null=True)
-    puntos = models.IntegerField(default=0)  #  AQUI SE GUARDA EL PUNTAJE - Se actualiza en views.py procesar_qr()
+    puntos = models.IntegerField(default=0)  #  AQUI SE GUARDA EL PUNTAJE - Se actualiza en puntuacion.registrar_escaneo()
     nivel = models.IntegerField(default=1)
     
     # Estadísticas
@@ -242,6 +257,23 @@ class UsuarioMuseo(models.Model):
     class Meta:
         verbose_name = 'Usuario Museo'
         verbose_name_plural = 'Usuarios Museo'
+        indexes = [
+            models.Index(fields=['-puntos', 'usuario'], name='usuariomuseo_ranking_idx'),
+        ]
 
     def __str__(self):
         return f"{self.usuario.username} (Nivel {self.nivel})"
+
+
+class NivelRanking(models.Model):
+    """Cuántos usuarios tienen cada puntaje (histograma del ranking, ver ranking.py)"""
+    puntos = models.IntegerField(unique=True)
+    usuarios = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Nivel del Ranking'
+        verbose_name_plural = 'Niveles del Ranking'
+        ordering = ['-puntos']
+
+    def __str__(self):
+        return f"{self.puntos} pts: {self.usuarios} usuarios"
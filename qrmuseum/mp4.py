@@ -0,0 +1,195 @@
+"""
+Faststart y metadatos de videos MP4 sin programas externos
+
+Un MP4 (ISO BMFF) es una secuencia de cajas: tamaño (4 bytes, o 1 + 8 bytes
+para las grandes), tipo (4 bytes) y contenido. Muchas cámaras y editores dejan
+el índice (moov) después de los datos (mdat) y el navegador tiene que bajar
+casi todo el archivo antes de empezar a reproducir. faststart escribe una
+copia con moov delante de mdat (el original no se toca: su nombre es la huella
+de su contenido, ver almacenamiento.py); como los datos se corren len(moov) bytes,
+se suman a los offsets de las tablas stco/co64 (una stco que ya no entra en
+32 bits pasa a co64, lo que cambia el tamaño de moov: se itera hasta que el
+tamaño se estabiliza). Los MP4 fragmentados (moof) no se tocan.
+
+No importa Django, como imagenes_qr.
+"""
+import copy
+import os
+import struct
+
+# Cajas que solo contienen otras cajas y hay que recorrer para llegar a stco/co64
+CONTENEDORES = {b'moov', b'trak', b'mdia', b'minf', b'stbl', b'edts', b'dinf', b'mvex'}
+BLOQUE = 1024 * 1024
+MAXIMO_32 = 0xFFFFFFFF
+
+
+class MP4Invalido(ValueError):
+    """El archivo no es un MP4 que se pueda procesar"""
+
+
+def _cajas_superiores(archivo):
+    """[(tipo, inicio, tamaño)] de las cajas del primer nivel del archivo"""
+    total = os.fstat(archivo.fileno()).st_size
+    cajas = []
+    posicion = 0
+    while posicion < total:
+        archivo.seek(posicion)
+        cabecera = archivo.read(8)
+        if len(cabecera) < 8:
+            raise MP4Invalido('Caja truncada')
+        tamano, tipo = struct.unpack('>I4s', cabecera)
+        largo_cabecera = 8
+        if tamano == 1:
+            tamano = struct.unpack('>Q', archivo.read(8))[0]
+            largo_cabecera = 16
+        elif tamano == 0:
+            tamano = total - posicion
+        if tamano < largo_cabecera or posicion + tamano > total:
+            raise MP4Invalido(f'Tamaño inválido en la caja {tipo!r}')
+        cajas.append((tipo, posicion, tamano))
+        posicion += tamano
+    return cajas
+
+
+def _parsear(datos):
+    """Árbol [[tipo, bytes | hijos]] de las cajas de `datos`"""
+    cajas = []
+    posicion = 0
+    while posicion < len(datos):
+        if len(datos) - posicion < 8:
+            raise MP4Invalido('Caja truncada')
+        tamano, tipo = struct.unpack_from('>I4s', datos, posicion)
+        largo_cabecera = 8
+        if tamano == 1:
+            tamano = struct.unpack_from('>Q', datos, posicion + 8)[0]
+            largo_cabecera = 16
+        elif tamano == 0:
+            tamano = len(datos) - posicion
+        if tamano < largo_cabecera or posicion + tamano > len(datos):
+            raise MP4Invalido(f'Tamaño inválido en la caja {tipo!r}')
+        cuerpo = datos[posicion + largo_cabecera:posicion + tamano]
+        cajas.append([tipo, _parsear(cuerpo) if tipo in CONTENEDORES else cuerpo])
+        posicion += tamano
+    return cajas
+
+
+def _serializar(cajas):
+    partes = []
+    for tipo, cuerpo in cajas:
+        if isinstance(cuerpo, list):
+            cuerpo = _serializar(cuerpo)
+        tamano = len(cuerpo) + 8
+        if tamano > MAXIMO_32:
+            partes.append(struct.pack('>I4sQ', 1, tipo, tamano + 8))
+        else:
+            partes.append(struct.pack('>I4s', tamano, tipo))
+        partes.append(cuerpo)
+    return b''.join(partes)
+
+
+def _buscar(cajas, tipos):
+    """Todas las cajas (en cualquier nivel) cuyo tipo está en `tipos`"""
+    for caja in cajas:
+        if caja[0] in tipos:
+            yield caja
+        if isinstance(caja[1], list):
+            yield from _buscar(caja[1], tipos)
+
+
+def _hijo(cajas, tipo):
+    return next((caja[1] for caja in cajas if caja[0] == tipo), None)
+
+
+def _desplazar_offsets(cajas, delta):
+    """Sumar `delta` a los offsets de los trozos (stco/co64)"""
+    for caja in _buscar(cajas, {b'stco', b'co64'}):
+        tipo, cuerpo = caja
+        version_flags, cantidad = cuerpo[:4], struct.unpack_from('>I', cuerpo, 4)[0]
+        formato = 'I' if tipo == b'stco' else 'Q'
+        offsets = [offset + delta for offset in struct.unpack_from(f'>{cantidad}{formato}', cuerpo, 8)]
+        if tipo == b'stco' and offsets and max(offsets) > MAXIMO_32:
+            caja[0], formato = b'co64', 'Q'
+        caja[1] = version_flags + struct.pack(f'>I{cantidad}{formato}', cantidad, *offsets)
+
+
+def _leer_moov(archivo, cajas):
+    for tipo, inicio, tamano in cajas:
+        if tipo == b'moov':
+            archivo.seek(inicio)
+            moov = _parsear(archivo.read(tamano))[0][1]
+            if _hijo(moov, b'cmov') is not None:
+                raise MP4Invalido('moov comprimido')
+            return moov
+    raise MP4Invalido('No hay caja moov')
+
+
+def faststart(ruta, destino):
+    """Escribir en `destino` (archivo binario abierto) el MP4 de `ruta` con moov delante de mdat.
+
+    Devuelve True si hubo que moverlo; si no (ya estaba delante o es fragmentado)
+    no escribe nada.
+    """
+    with open(ruta, 'rb') as archivo:
+        cajas = _cajas_superiores(archivo)
+        tipos = [tipo for tipo, _, _ in cajas]
+        if b'moof' in tipos:
+            return False
+        if b'moov' not in tipos or b'mdat' not in tipos:
+            raise MP4Invalido('Faltan las cajas moov o mdat')
+        if tipos.index(b'moov') < tipos.index(b'mdat'):
+            return False
+        moov = _leer_moov(archivo, cajas)
+
+        # Los datos se corren tanto como mida el moov nuevo, que puede crecer al pasar stco a co64
+        delta = next(tamano for tipo, _, tamano in cajas if tipo == b'moov')
+        for _ in range(4):
+            ajustado = copy.deepcopy(moov)
+            _desplazar_offsets(ajustado, delta)
+            nuevo = _serializar([[b'moov', ajustado]])
+            if len(nuevo) == delta:
+                break
+            delta = len(nuevo)
+        else:
+            raise MP4Invalido('El tamaño de moov no se estabiliza')
+
+        primer_mdat = tipos.index(b'mdat')
+        for indice, (tipo, inicio, tamano) in enumerate(cajas):
+            if indice == primer_mdat:
+                destino.write(nuevo)
+            if tipo == b'moov':
+                continue
+            archivo.seek(inicio)
+            pendiente = tamano
+            while pendiente:
+                datos = archivo.read(min(BLOQUE, pendiente))
+                if not datos:
+                    raise MP4Invalido('Archivo truncado')
+                destino.write(datos)
+                pendiente -= len(datos)
+    return True
+
+
+def metadatos(ruta):
+    """{'duracion': segundos, 'ancho': px, 'alto': px} (None si no hay pista de video)"""
+    with open(ruta, 'rb') as archivo:
+        moov = _leer_moov(archivo, _cajas_superiores(archivo))
+
+    duracion = None
+    mvhd = _hijo(moov, b'mvhd')
+    if mvhd:
+        if mvhd[0] == 1:
+            escala, duracion_unidades = struct.unpack_from('>IQ', mvhd, 20)
+        else:
+            escala, duracion_unidades = struct.unpack_from('>II', mvhd, 12)
+        duracion = round(duracion_unidades / escala, 3) if escala else None
+
+    ancho = alto = None
+    for trak in (caja[1] for caja in moov if caja[0] == b'trak'):
+        mdia = _hijo(trak, b'mdia') or []
+        hdlr = _hijo(mdia, b'hdlr')
+        tkhd = _hijo(trak, b'tkhd')
+        if hdlr and tkhd and hdlr[8:12] == b'vide':
+            # Ancho y alto en punto fijo 16.16 al final de tkhd
+            ancho, alto = (valor >> 16 for valor in struct.unpack_from('>II', tkhd, len(tkhd) - 8))
+            break
+    return {'duracion': duracion, 'ancho': ancho, 'alto': alto}
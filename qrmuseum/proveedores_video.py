@@ -0,0 +1,111 @@
+"""
+Proveedores de video externo (YouTube, Vimeo, Google Drive)
+
+ContenidoQR.save() normaliza video_url_externa una sola vez con
+normalizar_url_video y guarda proveedor, id, URL de embed, miniatura y URL
+original en columnas propias: las plantillas y la API solo leen campos. Un
+proveedor nuevo es una subclase de ProveedorVideo registrada con
+@registrar_proveedor; `manage.py normalizar_videos` recalcula las filas
+existentes después de agregarlo o cambiarlo.
+"""
+import re
+from urllib.parse import urlsplit
+
+PROVEEDORES = {}
+
+# Columnas de ContenidoQR que se derivan de video_url_externa
+CAMPOS_VIDEO_EXTERNO = (
+    'video_proveedor', 'video_id_externo', 'video_url_embed', 'video_url_miniatura', 'video_url_original',
+)
+
+
+class ProveedorVideo:
+    """Dominios que atiende, patrones que extraen el id y URLs que se arman con él"""
+    nombre = ''
+    dominios = ()
+    patrones = ()
+
+    def corresponde(self, host):
+        return any(host == dominio or host.endswith('.' + dominio) for dominio in self.dominios)
+
+    def extraer_id(self, url):
+        for patron in self.patrones:
+            coincidencia = patron.search(url)
+            if coincidencia:
+                return coincidencia.group('id')
+        return None
+
+    def url_embed(self, video_id):
+        raise NotImplementedError
+
+    def url_miniatura(self, video_id):
+        return ''
+
+
+def registrar_proveedor(clase):
+    PROVEEDORES[clase.nombre] = clase()
+    return clase
+
+
+@registrar_proveedor
+class YouTube(ProveedorVideo):
+    nombre = 'youtube'
+    dominios = ('youtube.com', 'youtu.be', 'youtube-nocookie.com')
+    patrones = (
+        re.compile(r'[?&]v=(?P<id>[\w-]{11})'),
+        re.compile(r'(?:youtu\.be/|/embed/|/shorts/|/live/)(?P<id>[\w-]{11})'),
+    )
+
+    def url_embed(self, video_id):
+        return f'https://www.youtube.com/embed/{video_id}?modestbranding=1&rel=0'
+
+    def url_miniatura(self, video_id):
+        # hqdefault existe para todos los videos (maxresdefault no)
+        return f'https://img.youtube.com/vi/{video_id}/hqdefault.jpg'
+
+
+@registrar_proveedor
+class Vimeo(ProveedorVideo):
+    nombre = 'vimeo'
+    dominios = ('vimeo.com',)
+    patrones = (re.compile(r'vimeo\.com/(?:.*/)?(?P<id>\d+)'),)
+
+    def url_embed(self, video_id):
+        return f'https://player.vimeo.com/video/{video_id}'
+
+
+@registrar_proveedor
+class GoogleDrive(ProveedorVideo):
+    nombre = 'drive'
+    dominios = ('drive.google.com', 'docs.google.com')
+    patrones = (re.compile(r'/d/(?P<id>[\w-]{10,})'), re.compile(r'[?&]id=(?P<id>[\w-]{10,})'))
+
+    def url_embed(self, video_id):
+        return f'https://drive.google.com/file/d/{video_id}/preview'
+
+    def url_miniatura(self, video_id):
+        return f'https://drive.google.com/thumbnail?id={video_id}&sz=w640'
+
+
+def normalizar_url_video(url):
+    """Valores de CAMPOS_VIDEO_EXTERNO para una URL de video externo"""
+    url = (url or '').strip()
+    if not url:
+        return dict.fromkeys(CAMPOS_VIDEO_EXTERNO, '')
+    original = url if url.startswith('http') else f'https://{url}'
+    host = (urlsplit(original).hostname or '').lower()
+    for proveedor in PROVEEDORES.values():
+        if proveedor.corresponde(host):
+            video_id = proveedor.extraer_id(original) or ''
+            return {
+                'video_proveedor': proveedor.nombre,
+                'video_id_externo': video_id,
+                'video_url_embed': proveedor.url_embed(video_id) if video_id else url,
+                'video_url_miniatura': proveedor.url_miniatura(video_id) if video_id else '',
+                'video_url_original': original,
+            }
+    # Plataforma desconocida: se intenta embeber la URL tal cual
+    return {
+        'video_proveedor': '', 'video_id_externo': '', 'video_url_embed': url,
+        'video_url_miniatura': '', 'video_url_original': original,
+    }
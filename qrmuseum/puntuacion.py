@@ -0,0 +1,55 @@
+"""
+Registro de escaneos y puntaje de la búsqueda del tesoro
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Now
+
+from qrmuseum.eventos import publicador_eventos
+from qrmuseum.models import ProgresoUsuario, UsuarioMuseo
+from qrmuseum.ranking import mover_en_ranking
+
+PUNTOS_POR_QR = 10
+
+
+def registrar_escaneo(usuario, qr):
+    """Registrar la visita de un usuario a un QR y sumar sus puntos.
+
+    El INSERT del progreso y el incremento de los contadores del perfil van en
+    una sola transacción, y los contadores se suman en la base de datos con
+    F(), sin leer ni guardar el perfil completo. Así dos escaneos simultáneos
+    nunca pierden incrementos y un QR solo puntúa la primera vez. En la misma
+    transacción el usuario sube de nivel en el ranking materializado. Al
+    confirmarse, el escaneo se publica a las pantallas en vivo (eventos.py).
+
+    `qr` puede ser un QRCode o la EntradaQR del resolver: solo se usan pk,
+    titulo y numero_secuencial.
+
+    Devuelve True si fue la primera visita del usuario a ese QR.
+    """
+    try:
+        with transaction.atomic():
+            ProgresoUsuario.objects.create(usuario=usuario, qr_visitado_id=qr.pk)
+            perfil = UsuarioMuseo.objects.filter(usuario=usuario)
+            # Fila bloqueada hasta el final de la transacción: el puntaje leído no cambia antes del UPDATE
+            puntos = perfil.select_for_update().values_list('puntos', flat=True).first()
+            if puntos is not None:
+                perfil.update(
+                    puntos=F('puntos') + PUNTOS_POR_QR,
+                    total_qrs_escaneados=F('total_qrs_escaneados') + 1,
+                    fecha_ultimo_acceso=Now(),
+                )
+                mover_en_ranking(puntos, puntos + PUNTOS_POR_QR)
+    except IntegrityError:
+        # Ya existía el progreso (unique_together usuario/qr): no suma puntos
+        return False
+    
+    evento = {
+        'usuario_id': usuario.pk,
+        'nombre': usuario.first_name or usuario.username,
+        'qr': qr.titulo,
+        'numero_secuencial': qr.numero_secuencial,
+        'puntos': None if puntos is None else puntos + PUNTOS_POR_QR,
+    }
+    transaction.on_commit(lambda: publicador_eventos.publicar('escaneo', evento))
+    return True
@@ -0,0 +1,94 @@
+"""
+Ranking materializado de la búsqueda del tesoro
+
+En lugar de agrupar ProgresoUsuario en cada vista se mantienen:
+
+- NivelRanking: cuántos usuarios hay con cada puntaje (> 0). La posición de
+  un puntaje es 1 + la cantidad de usuarios con más puntos; como los puntajes
+  son múltiplos de PUNTOS_POR_QR hay a lo sumo un nivel por QR.
+- El índice usuariomuseo_ranking_idx (-puntos, usuario) para el top N y los
+  vecinos de un usuario sin ordenar la tabla completa.
+- QRCode.total_escaneos para los QR más visitados.
+
+registrar_escaneo mueve al usuario de nivel y las señales ajustan los
+contadores al borrar perfiles o progresos. Los cambios de puntos hechos a mano
+(admin de Django) no se siguen: `manage.py reconstruir_ranking` rehace todo.
+"""
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from qrmuseum.models import NivelRanking, ProgresoUsuario, QRCode, UsuarioMuseo
+
+ORDEN_RANKING = ('-puntos', 'usuario_id')
+
+
+def mover_en_ranking(antes, despues):
+    """Pasar un usuario del nivel `antes` al nivel `despues` (None o 0 = fuera del ranking)"""
+    if antes == despues:
+        return
+    if antes:
+        NivelRanking.objects.filter(puntos=antes).update(usuarios=F('usuarios') - 1)
+    if despues:
+        if not NivelRanking.objects.filter(puntos=despues).update(usuarios=F('usuarios') + 1):
+            nivel, creado = NivelRanking.objects.get_or_create(puntos=despues, defaults={'usuarios': 1})
+            if not creado:
+                NivelRanking.objects.filter(pk=nivel.pk).update(usuarios=F('usuarios') + 1)
+
+
+def posicion(puntos):
+    """Posición en el ranking de un puntaje (los empates comparten posición)"""
+    mejores = NivelRanking.objects.filter(puntos__gt=puntos).aggregate(total=Sum('usuarios'))['total']
+    return 1 + (mejores or 0)
+
+
+def _posiciones():
+    """Función puntos -> posición a partir del histograma completo (una consulta)"""
+    niveles = list(NivelRanking.objects.filter(usuarios__gt=0).values_list('puntos', 'usuarios'))
+
+    def posicion_de(puntos):
+        return 1 + sum(usuarios for nivel, usuarios in niveles if nivel > puntos)
+    return posicion_de
+
+
+def top_usuarios(cantidad=10):
+    """[(posición, perfil)] de los mejores `cantidad` usuarios (sin los de 0 puntos, que no tienen nivel)"""
+    posicion_de = _posiciones()
+    perfiles = UsuarioMuseo.objects.select_related('usuario').filter(
+        puntos__gt=0
+    ).order_by(*ORDEN_RANKING)[:cantidad]
+    return [(posicion_de(perfil.puntos), perfil) for perfil in perfiles]
+
+
+def vecinos(perfil, cantidad=2):
+    """[(posición, perfil)] con `cantidad` usuarios antes y después de `perfil`, incluido él"""
+    posicion_de = _posiciones()
+    base = UsuarioMuseo.objects.select_related('usuario')
+    arriba = base.filter(
+        Q(puntos__gt=perfil.puntos) | Q(puntos=perfil.puntos, usuario_id__lt=perfil.usuario_id)
+    ).order_by('puntos', '-usuario_id')[:cantidad]
+    abajo = base.filter(
+        Q(puntos__lt=perfil.puntos) | Q(puntos=perfil.puntos, usuario_id__gt=perfil.usuario_id)
+    ).order_by(*ORDEN_RANKING)[:cantidad]
+    filas = [*reversed(list(arriba)), perfil, *abajo]
+    return [(posicion_de(fila.puntos), fila) for fila in filas]
+
+
+def qrs_populares(cantidad=10):
+    """QR más visitados según el contador materializado"""
+    return QRCode.objects.filter(total_escaneos__gt=0).order_by('-total_escaneos', 'numero_secuencial')[:cantidad]
+
+
+@transaction.atomic
+def reconstruir_ranking():
+    """Rehacer el histograma y los contadores de escaneos desde cero; devuelve (niveles, qrs)"""
+    NivelRanking.objects.all().delete()
+    niveles = NivelRanking.objects.bulk_create([
+        NivelRanking(puntos=fila['puntos'], usuarios=fila['total'])
+        for fila in UsuarioMuseo.objects.filter(puntos__gt=0).order_by().values('puntos').annotate(total=Count('id'))
+    ])
+    escaneos = ProgresoUsuario.objects.filter(qr_visitado=OuterRef('pk')).order_by().values('qr_visitado')
+    qrs = QRCode.objects.update(total_escaneos=Coalesce(
+        Subquery(escaneos.annotate(total=Count('id')).values('total')), Value(0)
+    ))
+    return len(niveles), qrs
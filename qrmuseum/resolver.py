@@ -0,0 +1,71 @@
+"""
+Índice en memoria de códigos QR por UUID
+
+Cada proceso guarda un diccionario id_unico -> (pk, activo, numero_secuencial,
+titulo) con todos los QR. Se reconstruye cuando cambia la versión guardada en la caché,
+que se renueva al guardar o eliminar un QRCode (ver signals.py). Así un UUID
+desconocido o inactivo se responde sin consultar la base de datos.
+"""
+import threading
+import uuid
+from collections import namedtuple
+
+from django.core.cache import cache
+
+from qrmuseum.models import QRCode
+
+EntradaQR = namedtuple('EntradaQR', ['pk', 'activo', 'numero_secuencial', 'titulo'])
+
+CLAVE_VERSION = 'qrmuseum:resolver_qr:version'
+
+
+class ResolvedorQR:
+    """Resuelve id_unico -> EntradaQR usando un índice por proceso"""
+
+    def __init__(self):
+        self._indice = {}
+        self._version = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _consulta():
+        return QRCode.objects.order_by().values_list('id_unico', 'id', 'activo', 'numero_secuencial', 'titulo')
+
+    @staticmethod
+    def _armar(filas):
+        return {id_unico: EntradaQR(pk, activo, numero, titulo) for id_unico, pk, activo, numero, titulo in filas}
+
+    def _version_vigente(self, version):
+        if version is None:
+            cache.add(CLAVE_VERSION, uuid.uuid4().hex, timeout=None)
+            version = cache.get(CLAVE_VERSION)
+        return version
+
+    def resolver(self, id_unico):
+        """Entrada del QR o None si el UUID no existe"""
+        version = self._version_vigente(cache.get(CLAVE_VERSION))
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._indice = self._armar(self._consulta())
+                    self._version = version
+        return self._indice.get(id_unico)
+
+    async def aresolver(self, id_unico):
+        """Versión async de resolver"""
+        version = await cache.aget(CLAVE_VERSION)
+        if version is None:
+            await cache.aadd(CLAVE_VERSION, uuid.uuid4().hex, timeout=None)
+            version = await cache.aget(CLAVE_VERSION)
+        if version != self._version:
+            filas = [fila async for fila in self._consulta()]
+            self._indice = self._armar(filas)
+            self._version = version
+        return self._indice.get(id_unico)
+
+    def invalidar(self):
+        """Forzar la reconstrucción del índice en todos los procesos"""
+        cache.set(CLAVE_VERSION, uuid.uuid4().hex, timeout=None)
+
+
+resolvedor_qr = ResolvedorQR()
@@ -0,0 +1,120 @@
+"""
+Señales de qrmuseum: mantienen al día los índices y cachés derivados
+"""
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from qrmuseum.analitica import registrar_en_resumenes
+from qrmuseum.cache_imagenes_qr import cache_imagenes_qr
+from qrmuseum.comentarios import estado_comentario, estado_guardado, mover_comentario
+from qrmuseum.configuracion import configuracion_museo
+from qrmuseum.derivadas import CAMPOS_CON_DERIVADAS, encolar_derivadas
+from qrmuseum.metricas import invalidar_metricas
+from qrmuseum.models import Comentario, ContenidoQR, MuseoConfig, ProgresoUsuario, QRCode, UsuarioMuseo
+from qrmuseum.ranking import mover_en_ranking
+from qrmuseum.resolver import resolvedor_qr
+from qrmuseum.videos import encolar_video
+
+
+@receiver([post_save, post_delete], sender=QRCode)
+def invalidar_resolvedor_qr(sender, **kwargs):
+    """Cualquier alta, cambio o baja de un QR reconstruye el índice de UUID.
+
+    Recién al confirmarse: si no, otro proceso podría reconstruirlo con las filas
+    de antes del commit y dejarlo guardado bajo la versión nueva.
+    """
+    transaction.on_commit(resolvedor_qr.invalidar)
+
+
+@receiver(post_delete, sender=QRCode)
+def borrar_imagenes_qr(sender, instance, **kwargs):
+    """Las variantes renderizadas de un QR eliminado ya no se van a pedir"""
+    cache_imagenes_qr.eliminar(instance.id_unico)
+
+
+@receiver([post_save, post_delete], sender=MuseoConfig)
+def invalidar_configuracion_museo(sender, **kwargs):
+    """Guardar la configuración (admin_configuracion o admin de Django) la refresca en todos los procesos.
+
+    Al confirmarse, como el resolver: antes otro proceso podría cachear la fila vieja bajo la versión nueva.
+    """
+    transaction.on_commit(configuracion_museo.invalidar)
+
+
+@receiver(post_save, sender=ContenidoQR)
+@receiver(post_save, sender=UsuarioMuseo)
+@receiver(post_save, sender=MuseoConfig)
+def generar_derivadas_imagenes(sender, instance, update_fields=None, **kwargs):
+    """Cada imagen subida se redimensiona una sola vez, en segundo plano (ver derivadas.py)"""
+    for campo in CAMPOS_CON_DERIVADAS[sender.__name__]:
+        archivo = getattr(instance, campo)
+        if archivo and (update_fields is None or campo in update_fields):
+            encolar_derivadas(archivo.name, instance.qr_id if sender is ContenidoQR else None)
+
+
+@receiver(post_save, sender=ContenidoQR)
+def optimizar_video(sender, instance, update_fields=None, **kwargs):
+    """Cada video subido se reordena (faststart) y se mide en segundo plano (ver videos.py)"""
+    if update_fields is not None and 'video' not in update_fields:
+        return
+    if instance.video and instance.video.name != instance.video_procesado:
+        encolar_video(instance.pk)
+
+
+@receiver(post_save, sender=ProgresoUsuario)
+def sumar_escaneo_qr(sender, instance, created, **kwargs):
+    """Contador materializado de visitas por QR y tablas resumen por hora/día"""
+    if created:
+        QRCode.objects.filter(pk=instance.qr_visitado_id).update(total_escaneos=F('total_escaneos') + 1)
+        registrar_en_resumenes(instance.qr_visitado_id, instance.fecha_visita)
+
+
+@receiver(post_delete, sender=ProgresoUsuario)
+def restar_escaneo_qr(sender, instance, **kwargs):
+    QRCode.objects.filter(pk=instance.qr_visitado_id).update(total_escaneos=F('total_escaneos') - 1)
+
+
+@receiver(pre_save, sender=Comentario)
+def recordar_estado_comentario(sender, instance, **kwargs):
+    """Estado en la base antes de guardar (un alta nueva no tiene), para ajustar los contadores"""
+    nuevo = instance._state.adding and instance.pk is None
+    instance._estado_anterior = None if nuevo else estado_guardado(instance.pk)
+
+
+@receiver(post_save, sender=Comentario)
+def contar_comentario(sender, instance, **kwargs):
+    """Contadores de comentarios y calificaciones de ContenidoQR (ver comentarios.py)"""
+    mover_comentario(instance.__dict__.pop('_estado_anterior', None), estado_comentario(instance))
+
+
+@receiver(post_delete, sender=Comentario)
+def descontar_comentario(sender, instance, **kwargs):
+    mover_comentario(estado_comentario(instance), None)
+
+
+@receiver([post_save, post_delete], sender=QRCode)
+@receiver([post_save, post_delete], sender=Comentario)
+def invalidar_metricas_dashboard(sender, **kwargs):
+    """
+    Los totales del panel cambian con QR (activo) y comentarios (moderado)
+
+    Al confirmarse, como el resolver: antes otro proceso podría recalcular los
+    totales sin la fila nueva y cachearlos.
+    """
+    transaction.on_commit(invalidar_metricas)
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidar_metricas_usuarios(sender, created=True, **kwargs):
+    # Cada login guarda last_login: solo importan altas y bajas
+    if created:
+        transaction.on_commit(invalidar_metricas)
+
+
+@receiver(post_delete, sender=UsuarioMuseo)
+def sacar_del_ranking(sender, instance, **kwargs):
+    """Un perfil borrado (o el usuario) deja su nivel del ranking"""
+    mover_en_ranking(instance.puntos, None)
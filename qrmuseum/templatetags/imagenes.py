@@ -0,0 +1,60 @@
+"""
+Etiquetas para mostrar las imágenes subidas en el tamaño adecuado (ver derivadas.py)
+"""
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from qrmuseum.derivadas import indice_derivadas, url_derivada
+
+register = template.Library()
+
+TIPOS = {'webp': 'image/webp', 'jpg': 'image/jpeg', 'png': 'image/png'}
+
+
+def _srcset(nombre, indice, formato):
+    return ', '.join(f'{url_derivada(nombre, ancho, formato)} {ancho}w' for ancho in indice['anchos'])
+
+
+def _ancho_para(indice, ancho):
+    """Ancho generado más chico que cubre `ancho` (o el mayor disponible)"""
+    return next((generado for generado in indice['anchos'] if generado >= ancho), indice['anchos'][-1])
+
+
+@register.simple_tag
+def imagen_responsiva(archivo, sizes, **atributos):
+    """<picture> con WebP y formato de respaldo en varios anchos; sin derivadas, <img> del original.
+
+    Uso: {% imagen_responsiva contenido.imagen sizes="200px" alt=contenido.titulo class="rounded" %}
+    """
+    if not archivo:
+        return ''
+    extra = format_html_join('', ' {}="{}"', atributos.items())
+    indice = indice_derivadas(archivo.name)
+    if not indice:
+        return format_html('<img src="{}"{}>', archivo.url, extra)
+    formato = indice['formato']
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" loading="lazy"{}></picture>',
+        _srcset(archivo.name, indice, 'webp'), sizes,
+        url_derivada(archivo.name, _ancho_para(indice, 640), formato), _srcset(archivo.name, indice, formato), sizes,
+        extra,
+    )
+
+
+@register.simple_tag
+def fondo_responsivo(archivo, ancho=1920):
+    """Declaraciones CSS background-image con la derivada de `ancho` en WebP y en el formato de respaldo"""
+    if not archivo:
+        return ''
+    indice = indice_derivadas(archivo.name)
+    if not indice:
+        return format_html("background-image: url('{}');", archivo.url)
+    ancho = _ancho_para(indice, ancho)
+    formato = indice['formato']
+    respaldo = url_derivada(archivo.name, ancho, formato)
+    return format_html(
+        "background-image: url('{}'); "
+        "background-image: image-set(url('{}') type('image/webp'), url('{}') type('{}'));",
+        respaldo, url_derivada(archivo.name, ancho, 'webp'), respaldo, TIPOS[formato],
+    )
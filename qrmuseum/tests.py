@@ -1,3 +1,1602 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import io
+import json
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import warnings
+import zipfile
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from PIL import Image
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.template import Context, Template
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.paginator import UnorderedObjectListWarning
+from django.db import connection, connections
+from django.http import Http404
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from qrmuseum.models import (
+    MuseoConfig, QRCode, ContenidoQR, Comentario, EscaneosPorDia, EscaneosPorHora, NivelRanking, ProgresoUsuario,
+    UsuarioMuseo
+)
+from qrmuseum.puntuacion import PUNTOS_POR_QR, registrar_escaneo
+from qrmuseum.cache_contenido import invalidar_contenido_qr, version_contenido_qr
+from qrmuseum.resolver import resolvedor_qr
+from qrmuseum.configuracion import configuracion_museo
+from qrmuseum.ranking import posicion, qrs_populares, reconstruir_ranking, top_usuarios, vecinos
+from qrmuseum.analitica import reconstruir_resumenes, series_escaneos
+from qrmuseum.eventos import PublicadorEventos, publicador_eventos
+from qrmuseum.metricas import metricas_dashboard
+from qrmuseum.cache_imagenes_qr import cache_imagenes_qr
+from qrmuseum.imagenes_qr import generar_imagen_qr
+from qrmuseum.exportacion import flujo_asincrono, zip_qrs
+from qrmuseum.derivadas import directorio_derivadas, eliminar_derivadas, indice_derivadas, url_derivada
+from qrmuseum.views import servir_medio
+from qrmuseum import derivadas, mp4, videos
+from qrmuseum.almacenamiento import CACHE_CONTROL_INMUTABLE, LARGO_HUELLA, es_direccionado
+from qrmuseum.proveedores_video import normalizar_url_video
+from qrmuseum.comentarios import CAMPOS_CONTADORES, contadores_esperados
+
+MEDIA_PRUEBAS = tempfile.mkdtemp(prefix='qrmuseum-tests-')
+CACHE_QR_PRUEBAS = os.path.join(MEDIA_PRUEBAS, 'cache_qr')
+# Fuera de MEDIA_PRUEBAS para que limpiar_media no la vea como media huérfana
+CACHE_PRUEBAS = tempfile.mkdtemp(prefix='qrmuseum-cache-')
+CACHES_PRUEBAS = {
+    'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': CACHE_PRUEBAS},
+}
+
+
+def tearDownModule():
+    shutil.rmtree(MEDIA_PRUEBAS, ignore_errors=True)
+    shutil.rmtree(CACHE_PRUEBAS, ignore_errors=True)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_PRUEBAS, QR_CACHE_DIR=CACHE_QR_PRUEBAS, CACHES=CACHES_PRUEBAS)
+class PruebaMuseo(TestCase):
+    """Base de las pruebas: media temporal y caché vacía en cada prueba"""
+
+    def setUp(self):
+        cache.clear()
+
+
+def crear_usuario(username, **extra):
+    usuario = User.objects.create_user(username=username, password='clave-segura-123', **extra)
+    UsuarioMuseo.objects.create(usuario=usuario)
+    return usuario
+
+
+class RegistrarEscaneoTests(PruebaMuseo):
+    """Puntaje de procesar_qr: una transacción, incrementos en la base de datos"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = crear_usuario('visitante')
+        cls.qr = QRCode.objects.create(titulo='Quíbar', numero_secuencial=1)
+
+    def test_primera_visita_suma_puntos(self):
+        self.assertTrue(registrar_escaneo(self.usuario, self.qr))
+        perfil = UsuarioMuseo.objects.get(usuario=self.usuario)
+        self.assertEqual(perfil.puntos, PUNTOS_POR_QR)
+        self.assertEqual(perfil.total_qrs_escaneados, 1)
+
+    def test_visita_repetida_no_suma(self):
+        registrar_escaneo(self.usuario, self.qr)
+        self.assertFalse(registrar_escaneo(self.usuario, self.qr))
+        perfil = UsuarioMuseo.objects.get(usuario=self.usuario)
+        self.assertEqual(perfil.puntos, PUNTOS_POR_QR)
+        self.assertEqual(ProgresoUsuario.objects.filter(usuario=self.usuario).count(), 1)
+
+    def test_presupuesto_de_consultas(self):
+        # Otro visitante ya creó el nivel del ranking y las filas resumen de esta hora: el caso normal
+        registrar_escaneo(crear_usuario('otro'), self.qr)
+        # SAVEPOINT + INSERT progreso + UPDATE qr + UPDATE resumen hora/día + SELECT FOR UPDATE puntos
+        # + UPDATE perfil + UPDATE nivel del ranking + RELEASE
+        with self.assertNumQueries(9):
+            registrar_escaneo(self.usuario, self.qr)
+        # SAVEPOINT + INSERT rechazado + ROLLBACK TO / RELEASE SAVEPOINT
+        with self.assertNumQueries(4):
+            registrar_escaneo(self.usuario, self.qr)
+
+    def test_usuario_sin_perfil(self):
+        sin_perfil = User.objects.create_user(username='sinperfil', password='clave-segura-123')
+        self.assertTrue(registrar_escaneo(sin_perfil, self.qr))
+        self.assertFalse(UsuarioMuseo.objects.filter(usuario=sin_perfil).exists())
+
+    def test_procesar_qr_registra_visita(self):
+        self.client.force_login(self.usuario)
+        respuesta = self.client.get(f'/qr/{self.qr.id_unico}/')
+        self.assertEqual(respuesta.status_code, 200)
+        self.client.get(f'/qr/{self.qr.id_unico}/')
+        self.assertEqual(UsuarioMuseo.objects.get(usuario=self.usuario).puntos, PUNTOS_POR_QR)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_PRUEBAS, QR_CACHE_DIR=CACHE_QR_PRUEBAS, CACHES=CACHES_PRUEBAS)
+class RegistrarEscaneoConcurrenteTests(TransactionTestCase):
+    """Un grupo escolar escaneando el mismo QR a la vez no pierde puntos"""
+
+    USUARIOS = 6
+    HILOS_POR_USUARIO = 3
+    ESCANEOS_POR_HILO = 4
+
+    def test_escaneos_simultaneos_totales_exactos(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('Requiere una base de pruebas que admita varias conexiones')
+        qrs = [QRCode.objects.create(titulo=f'QR {i}', numero_secuencial=i) for i in range(1, 3)]
+        usuarios = [crear_usuario(f'alumno{i}') for i in range(self.USUARIOS)]
+        # Varios hilos por usuario: dobles toques y escaneos de distintos QR a la vez
+        tareas = [u for u in usuarios for _ in range(self.HILOS_POR_USUARIO)]
+        barrera = threading.Barrier(len(tareas))
+        errores = []
+
+        def escanear(usuario):
+            try:
+                barrera.wait()
+                for _ in range(self.ESCANEOS_POR_HILO):
+                    for qr in qrs:
+                        registrar_escaneo(usuario, qr)
+            except Exception as exc:
+                errores.append(exc)
+            finally:
+                connections.close_all()
+
+        hilos = [threading.Thread(target=escanear, args=(u,)) for u in tareas]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        self.assertEqual(ProgresoUsuario.objects.count(), self.USUARIOS * len(qrs))
+        for perfil in UsuarioMuseo.objects.all():
+            self.assertEqual(perfil.total_qrs_escaneados, len(qrs))
+            self.assertEqual(perfil.puntos, len(qrs) * PUNTOS_POR_QR)
+
+
+class VistasAsyncTests(PruebaMuseo):
+    """inicio, procesar_qr y mi_progreso corren como vistas async (AsyncClient = ruta ASGI)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = crear_usuario('visitante')
+        cls.qr = QRCode.objects.create(titulo='Peumo', numero_secuencial=1)
+        cls.contenido = ContenidoQR.objects.create(qr=cls.qr, titulo='El peumo', descripcion_detallada='Árbol nativo')
+        Comentario.objects.create(usuario=cls.usuario, contenido_qr=cls.contenido, texto='Muy bueno', moderado=True)
+
+    async def test_inicio_anonimo_y_autenticado(self):
+        respuesta = await self.async_client.get('/')
+        self.assertEqual(respuesta.status_code, 200)
+        await self.async_client.aforce_login(self.usuario)
+        respuesta = await self.async_client.get('/')
+        self.assertContains(respuesta, 'Bienvenido de vuelta')
+
+    async def test_procesar_qr_registra_y_muestra_comentarios(self):
+        await self.async_client.aforce_login(self.usuario)
+        respuesta = await self.async_client.get(f'/qr/{self.qr.id_unico}/')
+        self.assertContains(respuesta, 'Muy bueno')
+        self.assertTrue(await ProgresoUsuario.objects.filter(usuario=self.usuario, qr_visitado=self.qr).aexists())
+
+    async def test_procesar_qr_inactivo_404(self):
+        self.qr.activo = False
+        await self.qr.asave()
+        respuesta = await self.async_client.get(f'/qr/{self.qr.id_unico}/')
+        self.assertEqual(respuesta.status_code, 404)
+
+    async def test_mi_progreso_requiere_login(self):
+        respuesta = await self.async_client.get('/mi-progreso/')
+        self.assertEqual(respuesta.status_code, 302)
+        await ProgresoUsuario.objects.acreate(usuario=self.usuario, qr_visitado=self.qr)
+        await self.async_client.aforce_login(self.usuario)
+        respuesta = await self.async_client.get('/mi-progreso/')
+        self.assertContains(respuesta, '1. Peumo')
+
+
+class CacheContenidoQRTests(PruebaMuseo):
+    """Los fragmentos de contenido_qr.html se renderizan una vez por versión"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = crear_usuario('curador', is_staff=True)
+        cls.usuario = crear_usuario('visitante')
+        cls.qr = QRCode.objects.create(titulo='Choroy', numero_secuencial=1)
+        cls.contenido = ContenidoQR.objects.create(qr=cls.qr, titulo='El choroy', descripcion_detallada='Loro nativo')
+        cls.comentario = Comentario.objects.create(usuario=cls.usuario, contenido_qr=cls.contenido, texto='Precioso')
+
+    def setUp(self):
+        super().setUp()
+        self.url = f'/qr/{self.qr.id_unico}/'
+
+    def test_segunda_visita_no_consulta_comentarios(self):
+        self.client.force_login(self.usuario)
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(self.url)
+        # Solo la consulta agregada de los validadores toca la tabla; las filas no se leen
+        self.assertFalse(any('"qrmuseum_comentario"."texto"' in c['sql'] for c in consultas.captured_queries))
+
+    def test_aprobar_comentario_invalida(self):
+        self.client.force_login(self.usuario)
+        self.assertNotContains(self.client.get(self.url), 'Precioso')
+        version = version_contenido_qr(self.qr.id)
+        self.client.force_login(self.admin)
+        self.client.post(f'/app/comentario/{self.comentario.id}/moderar/', {'accion': 'aprobar'})
+        self.assertNotEqual(version_contenido_qr(self.qr.id), version)
+        self.client.force_login(self.usuario)
+        self.assertContains(self.client.get(self.url), 'Precioso')
+
+    def test_invalidaciones_llegan_a_otro_proceso(self):
+        """Lo que invalida otro worker de gunicorn se ve en este"""
+        version = version_contenido_qr(self.qr.id)
+        resolvedor_qr.resolver(self.qr.id_unico)
+        configuracion_museo.obtener()
+        codigo = (
+            'import django; django.setup()\n'
+            'from qrmuseum.cache_contenido import invalidar_contenido_qr\n'
+            'from qrmuseum.configuracion import configuracion_museo\n'
+            'from qrmuseum.resolver import resolvedor_qr\n'
+            f'invalidar_contenido_qr({self.qr.id})\n'
+            'resolvedor_qr.invalidar()\n'
+            'configuracion_museo.invalidar()\n'
+        )
+        entorno = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'parkscanner.settings', 'CACHE_DIR': CACHE_PRUEBAS}
+        subprocess.run([sys.executable, '-c', codigo], env=entorno, cwd=settings.BASE_DIR, check=True)
+
+        self.assertNotEqual(version_contenido_qr(self.qr.id), version)
+        # El índice del resolver y la configuración se releen de la base de datos
+        with self.assertNumQueries(2):
+            resolvedor_qr.resolver(self.qr.id_unico)
+            configuracion_museo.obtener()
+
+    def test_editar_contenido_invalida(self):
+        self.client.get(self.url)
+        self.client.force_login(self.admin)
+        datos = {'tipo_contenido': 'texto', 'titulo': 'Choroy actualizado', 'descripcion_detallada': 'Loro nativo', 'activo': 'on'}
+        self.client.post(f'/app/qr/{self.qr.id}/contenido/', datos)
+        self.assertContains(self.client.get(self.url), 'Choroy actualizado')
+
+
+class ResolvedorQRTests(PruebaMuseo):
+    """Índice en memoria id_unico -> QR, reconstruido al cambiar QRCode"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.qr = QRCode.objects.create(titulo='Quíbar', numero_secuencial=3)
+
+    def test_resuelve_sin_consultas_tras_cargar(self):
+        self.assertEqual(resolvedor_qr.resolver(self.qr.id_unico), (self.qr.pk, True, 3, 'Quíbar'))
+        with self.assertNumQueries(0):
+            self.assertIsNone(resolvedor_qr.resolver(uuid.uuid4()))
+            self.assertIsNotNone(resolvedor_qr.resolver(self.qr.id_unico))
+
+    def test_uuid_desconocido_404_sin_base_de_datos(self):
+        resolvedor_qr.resolver(self.qr.id_unico)
+        with self.assertNumQueries(0):
+            respuesta = self.client.get(f'/qr/{uuid.uuid4()}/')
+        self.assertEqual(respuesta.status_code, 404)
+
+    def test_se_reconstruye_al_guardar(self):
+        resolvedor_qr.resolver(self.qr.id_unico)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.qr.activo = False
+            self.qr.save()
+            # Antes del commit otro proceso vería las filas viejas: la versión no cambia todavía
+            with self.assertNumQueries(0):
+                self.assertTrue(resolvedor_qr.resolver(self.qr.id_unico).activo)
+        self.assertFalse(resolvedor_qr.resolver(self.qr.id_unico).activo)
+        with self.captureOnCommitCallbacks(execute=True):
+            nuevo = QRCode.objects.create(titulo='Peumo', numero_secuencial=4)
+        self.assertEqual(resolvedor_qr.resolver(nuevo.id_unico).numero_secuencial, 4)
+        with self.captureOnCommitCallbacks(execute=True):
+            nuevo.delete()
+        self.assertIsNone(resolvedor_qr.resolver(nuevo.id_unico))
+
+
+class ApiEscanearQRTests(PruebaMuseo):
+    """API JSON del escáner: registra el escaneo y devuelve solo el contenido"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = crear_usuario('visitante')
+        cls.qr = QRCode.objects.create(titulo='Peumo', numero_secuencial=2, ubicacion='Sala 1')
+        ContenidoQR.objects.create(
+            qr=cls.qr, titulo='El peumo', descripcion_detallada='Árbol nativo',
+            datos_historicos='Usado por los mapuches', datos_cientificos='Cryptocarya alba',
+            mostrar_cientifico=False,
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.url = f'/api/qr/{self.qr.id_unico}/escanear/'
+
+    def test_registra_y_devuelve_contenido(self):
+        self.client.force_login(self.usuario)
+        datos = self.client.post(self.url).json()
+        self.assertEqual(datos['qr']['titulo'], 'Peumo')
+        self.assertEqual(datos['contenido']['historico'], 'Usado por los mapuches')
+        self.assertEqual(datos['contenido']['cientifico'], '')
+        self.assertEqual(datos['progreso'], {
+            'nuevo': True, 'puntos_ganados': PUNTOS_POR_QR, 'puntos': PUNTOS_POR_QR, 'total_qrs_escaneados': 1,
+        })
+        self.assertEqual(self.client.post(self.url).json()['progreso']['puntos_ganados'], 0)
+
+    def test_anonimo_sin_progreso(self):
+        datos = self.client.post(self.url).json()
+        self.assertIsNone(datos['progreso'])
+        self.assertFalse(ProgresoUsuario.objects.exists())
+
+    def test_solo_post_y_404_json(self):
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+        respuesta = self.client.post(f'/api/qr/{uuid.uuid4()}/escanear/')
+        self.assertEqual(respuesta.status_code, 404)
+        self.assertIn('error', respuesta.json())
+
+
+class ContenidoOfflineTests(PruebaMuseo):
+    """Manifiesto versionado y contenido JSON para el service worker"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.qr = QRCode.objects.create(titulo='Quíbar', numero_secuencial=1)
+        cls.contenido = ContenidoQR.objects.create(qr=cls.qr, titulo='El quíbar', descripcion_detallada='Cerro')
+        QRCode.objects.create(titulo='Oculto', numero_secuencial=2, activo=False)
+
+    def test_manifiesto_lista_activos_con_hash(self):
+        datos = self.client.get('/api/manifiesto/').json()
+        self.assertEqual([e['uuid'] for e in datos['entradas']], [str(self.qr.id_unico)])
+        entrada = datos['entradas'][0]
+        self.assertEqual(entrada['datos'], f'/api/qr/{self.qr.id_unico}/')
+        self.assertEqual(len(entrada['hash']), 16)
+
+    def test_manifiesto_304_y_cambia_con_el_contenido(self):
+        respuesta = self.client.get('/api/manifiesto/')
+        etag = respuesta['ETag']
+        self.assertEqual(self.client.get('/api/manifiesto/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        hash_anterior = respuesta.json()['entradas'][0]['hash']
+        self.contenido.descripcion_detallada = 'Cerro isla'
+        self.contenido.save()
+        respuesta = self.client.get('/api/manifiesto/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta.json()['entradas'][0]['hash'], hash_anterior)
+
+    def test_contenido_no_registra_escaneo(self):
+        usuario = crear_usuario('visitante')
+        self.client.force_login(usuario)
+        datos = self.client.get(f'/api/qr/{self.qr.id_unico}/').json()
+        self.assertEqual(datos['contenido']['titulo'], 'El quíbar')
+        self.assertFalse(ProgresoUsuario.objects.exists())
+
+    def test_service_worker_en_la_raiz(self):
+        respuesta = self.client.get('/sw.js')
+        self.assertEqual(respuesta['Content-Type'], 'application/javascript')
+        self.assertContains(respuesta, 'museoqr-contenido-v1')
+        self.assertEqual(self.client.get('/offline/qr/').status_code, 200)
+
+
+class RespuestasCondicionalesTests(PruebaMuseo):
+    """ETag / Last-Modified en inicio y procesar_qr"""
+
+    @classmethod
+    def setUpTestData(cls):
+        MuseoConfig.objects.create(id=1, nombre='Museo de prueba')
+        cls.usuario = crear_usuario('visitante')
+        cls.otro = crear_usuario('otro')
+        cls.qr = QRCode.objects.create(titulo='Quíbar', numero_secuencial=1)
+        cls.contenido = ContenidoQR.objects.create(qr=cls.qr, titulo='El quíbar', descripcion_detallada='Cerro')
+
+    def setUp(self):
+        super().setUp()
+        self.url = f'/qr/{self.qr.id_unico}/'
+
+    def revalidar(self, url, respuesta):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=respuesta['ETag'])
+
+    def test_contenido_304_en_visita_repetida(self):
+        self.client.force_login(self.usuario)
+        self.client.get(self.url)  # fija la cookie CSRF
+        respuesta = self.client.get(self.url)
+        self.assertIn('Last-Modified', respuesta)
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.revalidar(self.url, respuesta).status_code, 304)
+        # El 304 sale de las marcas: ni el QR ni su contenido se cargan
+        self.assertFalse([c for c in consultas if '"qrmuseum_contenidoqr"."descripcion_detallada"' in c['sql']])
+
+    def test_contenido_cambia_con_comentario_aprobado(self):
+        self.client.force_login(self.usuario)
+        self.client.get(self.url)
+        respuesta = self.client.get(self.url)
+        Comentario.objects.create(usuario=self.otro, contenido_qr=self.contenido, texto='Hola', moderado=True)
+        self.assertEqual(self.revalidar(self.url, respuesta).status_code, 200)
+
+    def test_etag_depende_del_usuario(self):
+        self.client.force_login(self.usuario)
+        self.client.get(self.url)
+        respuesta = self.client.get(self.url)
+        self.client.force_login(self.otro)
+        self.assertEqual(self.revalidar(self.url, respuesta).status_code, 200)
+
+    def test_inicio_304_hasta_que_cambian_los_puntos(self):
+        self.client.force_login(self.usuario)
+        self.client.get('/')
+        respuesta = self.client.get('/')
+        self.assertEqual(self.revalidar('/', respuesta).status_code, 304)
+        registrar_escaneo(self.usuario, self.qr)
+        self.assertEqual(self.revalidar('/', respuesta).status_code, 200)
+
+    def test_cambios_sin_fechas_invalidan_por_version(self):
+        """update() que no toca fecha_actualizacion pero invalida la caché (videos, derivadas, media)"""
+        self.client.force_login(self.usuario)
+        self.client.get(self.url)
+        respuesta = self.client.get(self.url)
+        invalidar_contenido_qr(self.qr.id)
+        self.assertEqual(self.revalidar(self.url, respuesta).status_code, 200)
+
+        respuesta = self.client.get('/')
+        configuracion_museo.invalidar()
+        self.assertEqual(self.revalidar('/', respuesta).status_code, 200)
+
+
+class PresupuestoConsultasTests(PruebaMuseo):
+    """Tope de consultas y de tiempo por ruta; las listas no deben crecer en consultas con los datos (N+1)"""
+
+    SEGUNDOS_MAXIMOS = 1.0
+
+    # (nombre de la ruta, método, quién la pide, tope de consultas con las cachés vacías)
+    RUTAS = [
+        ('inicio', 'get', 'visitante', 7),
+        ('registro', 'get', None, 1),
+        ('login', 'get', None, 1),
+        ('logout', 'get', 'visitante', 4),
+        ('escanear_qr', 'get', 'visitante', 3),
+        ('contenido_qr', 'get', 'visitante', 12),
+        ('agregar_comentario', 'post', 'visitante', 6),
+        ('api_escanear_qr', 'post', 'visitante', 9),
+        ('service_worker', 'get', None, 0),
+        ('offline_qr', 'get', None, 1),
+        ('api_manifiesto', 'get', None, 1),
+        ('api_contenido_qr', 'get', None, 2),
+        ('mi_progreso', 'get', 'visitante', 7),
+        ('editar_perfil', 'get', 'visitante', 4),
+        ('ranking', 'get', 'visitante', 9),
+        ('admin_dashboard', 'get', 'curador', 6),
+        ('admin_qrs_list', 'get', 'curador', 5),
+        ('admin_crear_qr', 'get', 'curador', 3),
+        ('admin_editar_qr', 'get', 'curador', 4),
+        ('admin_eliminar_qr', 'get', 'curador', 4),
+        ('admin_contenido_qr', 'get', 'curador', 4),
+        ('admin_comentarios', 'get', 'curador', 5),
+        ('admin_moderar_comentario', 'get', 'curador', 4),
+        ('admin_configuracion', 'get', 'curador', 4),
+        ('admin_usuarios', 'get', 'curador', 5),
+        ('admin_editar_usuario', 'get', 'curador', 4),
+        ('admin_eliminar_usuario', 'get', 'curador', 6),
+        ('admin_estadisticas', 'get', 'curador', 9),
+        ('admin_analitica', 'get', 'curador', 7),
+        ('admin_pantalla', 'get', 'curador', 3),
+        ('imagen_qr', 'get', None, 1),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        MuseoConfig.objects.create(id=1, nombre='Museo de prueba')
+        cls.curador = crear_usuario('curador', is_staff=True)
+        cls.visitante = crear_usuario('visitante')
+        cls.sembrar(3)
+        cls.qr = QRCode.objects.order_by('numero_secuencial').first()
+        cls.comentario = Comentario.objects.order_by('pk').first()
+
+    @classmethod
+    def sembrar(cls, cantidad):
+        """Agregar QR con contenido, usuarios con progreso y comentarios aprobados y pendientes"""
+        inicio = QRCode.objects.count()
+        for i in range(inicio + 1, inicio + cantidad + 1):
+            qr = QRCode.objects.create(titulo=f'Sala {i}', numero_secuencial=i)
+            contenido = ContenidoQR.objects.create(qr=qr, titulo=f'Pieza {i}', descripcion_detallada='Texto')
+            usuario = crear_usuario(f'alumno{i}')
+            registrar_escaneo(usuario, qr)
+            registrar_escaneo(cls.visitante, qr)
+            Comentario.objects.create(usuario=usuario, contenido_qr=contenido, texto='Bien', moderado=True)
+            Comentario.objects.create(usuario=cls.visitante, contenido_qr=contenido, texto='Pendiente')
+
+    def url(self, nombre):
+        argumentos = {
+            'contenido_qr': [self.qr.id_unico],
+            'api_escanear_qr': [self.qr.id_unico],
+            'api_contenido_qr': [self.qr.id_unico],
+            'imagen_qr': [self.qr.id_unico, 'normal', 'png'],
+            'agregar_comentario': [self.qr.id],
+            'admin_editar_qr': [self.qr.id],
+            'admin_eliminar_qr': [self.qr.id],
+            'admin_contenido_qr': [self.qr.id],
+            'admin_moderar_comentario': [self.comentario.id],
+            'admin_editar_usuario': [self.visitante.id],
+            'admin_eliminar_usuario': [self.visitante.id],
+        }
+        return reverse(nombre, args=argumentos.get(nombre, []))
+
+    def medir(self, nombre, metodo, quien):
+        """(respuesta, consultas, segundos) de una petición con las cachés frías"""
+        self.client.logout()
+        if quien:
+            self.client.force_login(getattr(self, quien))
+        cache.clear()
+        datos = {'texto': 'Nuevo', 'calificacion': 5} if nombre == 'agregar_comentario' else None
+        # Paginar sin orden da páginas inestables entre peticiones
+        with warnings.catch_warnings(), CaptureQueriesContext(connection) as consultas:
+            warnings.simplefilter('error', UnorderedObjectListWarning)
+            inicio = time.perf_counter()
+            respuesta = getattr(self.client, metodo)(self.url(nombre), datos)
+            segundos = time.perf_counter() - inicio
+        return respuesta, consultas.captured_queries, segundos
+
+    def detalle(self, consultas):
+        return '\n'.join(f"  {i}. {c['sql']}" for i, c in enumerate(consultas, 1))
+
+    def test_presupuesto_por_ruta(self):
+        for nombre, metodo, quien, tope in self.RUTAS:
+            with self.subTest(ruta=nombre):
+                respuesta, consultas, segundos = self.medir(nombre, metodo, quien)
+                self.assertLess(respuesta.status_code, 400)
+                self.assertLessEqual(
+                    len(consultas), tope,
+                    f'{nombre}: {len(consultas)} consultas (tope {tope})\n{self.detalle(consultas)}'
+                )
+                self.assertLess(segundos, self.SEGUNDOS_MAXIMOS, f'{nombre}: {segundos:.3f} s')
+
+    def test_consultas_no_crecen_con_los_datos(self):
+        rutas = [(nombre, quien) for nombre, metodo, quien, _ in self.RUTAS if metodo == 'get']
+        antes = {nombre: self.medir(nombre, 'get', quien)[1] for nombre, quien in rutas}
+        self.sembrar(3)
+        for nombre, quien in rutas:
+            with self.subTest(ruta=nombre):
+                despues = self.medir(nombre, 'get', quien)[1]
+                self.assertEqual(
+                    len(despues), len(antes[nombre]),
+                    f'{nombre}: {len(antes[nombre])} -> {len(despues)} consultas al agregar datos\n{self.detalle(despues)}'
+                )
+
+
+class ConfiguracionMuseoTests(PruebaMuseo):
+    """MuseoConfig se lee una vez por proceso y se refresca al guardarla"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = crear_usuario('curador', is_staff=True)
+
+    def test_crea_configuracion_por_defecto(self):
+        self.assertEqual(configuracion_museo.obtener().pk, 1)
+        self.assertTrue(MuseoConfig.objects.filter(pk=1).exists())
+
+    def test_pagina_sin_datos_no_consulta_configuracion(self):
+        self.client.get('/login/')
+        with self.assertNumQueries(0):
+            self.client.get('/login/')
+
+    def test_guardar_configuracion_la_refresca(self):
+        self.assertEqual(configuracion_museo.obtener().nombre, 'Mi Museo')
+        self.client.force_login(self.admin)
+        with self.captureOnCommitCallbacks() as al_confirmar:
+            self.client.post('/app/configuracion/', {'nombre': 'Museo del Bosque'})
+        # Hasta el commit sigue vigente la versión anterior
+        self.assertEqual(configuracion_museo.obtener().nombre, 'Mi Museo')
+        for funcion in al_confirmar:
+            funcion()
+        self.assertEqual(configuracion_museo.obtener().nombre, 'Museo del Bosque')
+
+
+class RankingTests(PruebaMuseo):
+    """Ranking materializado: histograma de puntajes, top N y vecinos"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.qrs = [QRCode.objects.create(titulo=f'Sala {i}', numero_secuencial=i) for i in range(1, 4)]
+        # ana 30, beto 20, carla 20, dani 10, eva 0
+        cls.usuarios = {}
+        for nombre, escaneos in [('ana', 3), ('beto', 2), ('carla', 2), ('dani', 1), ('eva', 0)]:
+            cls.usuarios[nombre] = crear_usuario(nombre)
+            for qr in cls.qrs[:escaneos]:
+                registrar_escaneo(cls.usuarios[nombre], qr)
+
+    def perfil(self, nombre):
+        return UsuarioMuseo.objects.get(usuario=self.usuarios[nombre])
+
+    def nombres(self, filas):
+        return [(pos, perfil.usuario.username) for pos, perfil in filas]
+
+    def test_posiciones_con_empates(self):
+        self.assertEqual(
+            self.nombres(top_usuarios(4)),
+            [(1, 'ana'), (2, 'beto'), (2, 'carla'), (4, 'dani')]
+        )
+        self.assertEqual(posicion(0), 5)
+
+    def test_top_sin_usuarios_en_cero(self):
+        self.assertEqual(len(top_usuarios(10)), 4)
+        self.assertNotIn('eva', [nombre for _, nombre in self.nombres(top_usuarios(10))])
+
+    def test_vecinos(self):
+        self.assertEqual(
+            self.nombres(vecinos(self.perfil('carla'), cantidad=1)),
+            [(2, 'beto'), (2, 'carla'), (4, 'dani')]
+        )
+
+    def test_qrs_populares(self):
+        self.assertEqual([qr.total_escaneos for qr in qrs_populares()], [4, 3, 1])
+
+    def test_reconstruir_coincide_con_incremental(self):
+        incremental = list(NivelRanking.objects.filter(usuarios__gt=0).values_list('puntos', 'usuarios'))
+        QRCode.objects.update(total_escaneos=0)
+        reconstruir_ranking()
+        self.assertEqual(list(NivelRanking.objects.values_list('puntos', 'usuarios')), incremental)
+        self.assertEqual([qr.total_escaneos for qr in qrs_populares()], [4, 3, 1])
+
+    def test_borrar_usuario_lo_saca_del_ranking(self):
+        self.usuarios['ana'].delete()
+        self.assertEqual(self.nombres(top_usuarios(1)), [(1, 'beto')])
+        self.assertEqual(QRCode.objects.get(pk=self.qrs[2].pk).total_escaneos, 0)
+
+    def test_pagina_publica(self):
+        self.client.force_login(self.usuarios['dani'])
+        respuesta = self.client.get('/ranking/')
+        self.assertEqual(respuesta.context['mi_posicion'], 4)
+        self.assertContains(respuesta, '#1')
+
+
+class ResumenesEscaneosTests(PruebaMuseo):
+    """Tablas resumen por hora/día: incrementales y reconstruibles"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = crear_usuario('curador', is_staff=True)
+        cls.qrs = [QRCode.objects.create(titulo=f'Sala {i}', numero_secuencial=i) for i in range(1, 3)]
+        for i in range(3):
+            usuario = crear_usuario(f'alumno{i}')
+            registrar_escaneo(usuario, cls.qrs[0])
+            if i == 0:
+                registrar_escaneo(usuario, cls.qrs[1])
+
+    def filas(self, modelo):
+        return sorted(modelo.objects.values_list('qr_id', 'escaneos'))
+
+    def test_incremental(self):
+        esperado = [(self.qrs[0].id, 3), (self.qrs[1].id, 1)]
+        self.assertEqual(self.filas(EscaneosPorHora), esperado)
+        self.assertEqual(self.filas(EscaneosPorDia), esperado)
+
+    def test_reconstruir_coincide_con_incremental(self):
+        antes = list(EscaneosPorHora.objects.order_by('hora', 'qr').values_list('hora', 'qr', 'escaneos'))
+        EscaneosPorHora.objects.update(escaneos=0)
+        reconstruir_resumenes()
+        self.assertEqual(list(EscaneosPorHora.objects.order_by('hora', 'qr').values_list('hora', 'qr', 'escaneos')), antes)
+        self.assertEqual(self.filas(EscaneosPorDia), [(self.qrs[0].id, 3), (self.qrs[1].id, 1)])
+
+    def test_series(self):
+        series = series_escaneos(7)
+        self.assertEqual(len(series['por_hora']), 24)
+        self.assertEqual(sum(fila['total'] for fila in series['por_dia_semana']), 4)
+        self.assertEqual([fila['total'] for fila in series['por_qr']], [3, 1])
+        self.assertEqual(series['por_qr'][0]['porcentaje'], 100)
+
+    def test_vista_solo_lee_resumenes(self):
+        self.client.force_login(self.admin)
+        self.client.get('/app/analitica/')
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get('/app/analitica/?dias=90')
+        self.assertEqual(respuesta.context['dias'], 90)
+        self.assertFalse(any('qrmuseum_progresousuario' in c['sql'] for c in consultas.captured_queries))
+
+
+class EventosEnVivoTests(PruebaMuseo):
+    """Publicador SSE: reparto a todos los clientes y descarte de los lentos"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = crear_usuario('curador', is_staff=True)
+        cls.visitante = crear_usuario('visitante', first_name='Vale')
+        cls.qr = QRCode.objects.create(titulo='Quíbar', numero_secuencial=1)
+
+    async def test_cliente_lento_se_descarta_sin_frenar_a_los_demas(self):
+        publicador = PublicadorEventos(tamano_buffer=2)
+        rapido = publicador.suscribir()
+        lento = publicador.suscribir()
+        recibidos = []
+        for i in range(3):
+            publicador.publicar('escaneo', {'n': i})
+            await asyncio.sleep(0)
+            recibidos.append(await rapido.siguiente(1))
+        self.assertEqual([json.loads(datos)['n'] for _, datos in recibidos], [0, 1, 2])
+        self.assertTrue(lento.descartada)
+        self.assertIsNone(await lento.siguiente(1))
+
+    def test_registrar_escaneo_publica_al_confirmar(self):
+        with mock.patch.object(publicador_eventos, 'publicar') as publicar:
+            with self.captureOnCommitCallbacks(execute=True):
+                registrar_escaneo(self.visitante, self.qr)
+        publicar.assert_called_once()
+        tipo, evento = publicar.call_args.args
+        self.assertEqual(tipo, 'escaneo')
+        self.assertEqual((evento['nombre'], evento['puntos']), ('Vale', PUNTOS_POR_QR))
+
+    def test_solo_admin_y_solo_asgi(self):
+        self.client.force_login(self.visitante)
+        self.assertEqual(self.client.get('/api/eventos/').status_code, 403)
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get('/api/eventos/').status_code, 501)
+
+    async def test_stream_envia_ranking_y_escaneos(self):
+        await self.async_client.aforce_login(self.admin)
+        respuesta = await self.async_client.get('/api/eventos/')
+        self.assertEqual(respuesta['Content-Type'], 'text/event-stream')
+        flujo = aiter(respuesta.streaming_content)
+        self.assertIn(b'event: ranking', await anext(flujo))
+        publicador_eventos.publicar('escaneo', {'nombre': 'Vale'})
+        self.assertIn(b'"nombre": "Vale"', await anext(flujo))
+        await flujo.aclose()
+
+    async def test_cliente_que_se_va_antes_del_flujo_no_deja_suscripcion(self):
+        await self.async_client.aforce_login(self.admin)
+        respuesta = await self.async_client.get('/api/eventos/')
+        self.assertEqual(respuesta.status_code, 200)
+        # Hasta que el servidor empieza a enviar el flujo nadie queda suscrito
+        self.assertEqual(publicador_eventos.conectados, 0)
+
+
+class MetricasDashboardTests(PruebaMuseo):
+    """Totales del panel: agregación condicional, caché corta e invalidación por señales"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = crear_usuario('curador', is_staff=True)
+        cls.visitante = crear_usuario('visitante')
+        qr = QRCode.objects.create(titulo='Quíbar', numero_secuencial=1)
+        QRCode.objects.create(titulo='Bodega', numero_secuencial=2, activo=False)
+        contenido = ContenidoQR.objects.create(qr=qr, titulo='El quíbar', descripcion_detallada='Cerro')
+        Comentario.objects.create(usuario=cls.visitante, contenido_qr=contenido, texto='Bien', moderado=True)
+        Comentario.objects.create(usuario=cls.visitante, contenido_qr=contenido, texto='Pendiente')
+        registrar_escaneo(cls.visitante, qr)
+
+    def test_totales_en_tres_consultas(self):
+        with self.assertNumQueries(3):
+            metricas = metricas_dashboard()
+        self.assertEqual(metricas, {
+            'total_qrs': 2, 'qrs_activos': 1, 'total_escaneos': 1,
+            'total_comentarios': 2, 'comentarios_pendientes': 1, 'total_usuarios': 2,
+        })
+        with self.assertNumQueries(0):
+            metricas_dashboard()
+
+    def test_guardar_modelos_invalida(self):
+        metricas_dashboard()
+        with self.captureOnCommitCallbacks() as al_confirmar:
+            QRCode.objects.create(titulo='Nuevo', numero_secuencial=3)
+        # Hasta el commit siguen los totales cacheados
+        self.assertEqual(metricas_dashboard()['total_qrs'], 2)
+        for funcion in al_confirmar:
+            funcion()
+        self.assertEqual(metricas_dashboard()['total_qrs'], 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            crear_usuario('nuevo')
+        self.assertEqual(metricas_dashboard()['total_usuarios'], 3)
+
+    def test_login_no_invalida(self):
+        metricas_dashboard()
+        self.client.login(username='visitante', password='clave-segura-123')
+        with self.assertNumQueries(0):
+            metricas_dashboard()
+
+    def test_paginas_admin_usan_las_metricas(self):
+        self.client.force_login(self.admin)
+        for url in ['/app/dashboard/', '/app/estadisticas/']:
+            self.assertEqual(self.client.get(url).context['comentarios_pendientes'], 1)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_PRUEBAS, QR_CACHE_DIR=CACHE_QR_PRUEBAS)
+class ProvisionarQRsTests(PruebaMuseo):
+    """Comando provisionar_qrs: alta en bloque, imágenes en paralelo y re-ejecución idempotente"""
+
+    def archivo(self, nombre, texto):
+        ruta = os.path.join(MEDIA_PRUEBAS, nombre)
+        with open(ruta, 'w', encoding='utf-8') as archivo:
+            archivo.write(texto)
+        return ruta
+
+    def provisionar(self, ruta, procesos=1):
+        salida = io.StringIO()
+        call_command('provisionar_qrs', ruta, procesos=procesos, stdout=salida)
+        return salida.getvalue()
+
+    def test_csv_crea_qrs_y_contenido(self):
+        QRCode.objects.create(titulo='Existente', numero_secuencial=1)
+        metricas_dashboard()
+        ruta = self.archivo('puntos.csv', (
+            'titulo,numero_secuencial,ubicacion,contenido_titulo,contenido_descripcion_detallada\n'
+            'Repetido,1,,,\n'
+            'Telar,2,Sala 1,El telar,Tejido aymara\n'
+            'Cántaro,3,Sala 2,,\n'
+        ))
+        salida = self.provisionar(ruta)
+        self.assertIn('2 QR creados (1 con contenido), 1 omitidos', salida)
+
+        telar = QRCode.objects.select_related('contenido').get(numero_secuencial=2)
+        self.assertEqual(telar.url, f'qr://{telar.id_unico}')
+        self.assertEqual(telar.contenido.descripcion_detallada, 'Tejido aymara')
+        self.assertTrue(cache_imagenes_qr.ruta(telar.id_unico, 'normal', 'png').exists())
+        self.assertFalse(ContenidoQR.objects.filter(qr__numero_secuencial=3).exists())
+        # Sin señales: el comando invalida el índice de UUID y las métricas
+        self.assertEqual(resolvedor_qr.resolver(telar.id_unico).pk, telar.pk)
+        self.assertEqual(metricas_dashboard()['total_qrs'], 3)
+
+        self.assertIn('No hay QR nuevos', self.provisionar(ruta))
+        self.assertEqual(QRCode.objects.count(), 3)
+
+    def test_json_con_pool_de_procesos(self):
+        puntos = [
+            {'titulo': f'Punto {n}', 'numero_secuencial': n, 'contenido': {'tipo_contenido': 'texto'}}
+            for n in range(1, 5)
+        ]
+        self.provisionar(self.archivo('puntos.json', json.dumps(puntos)), procesos=2)
+        qrs = QRCode.objects.select_related('contenido')
+        self.assertEqual(len(qrs), 4)
+        for qr in qrs:
+            self.assertEqual(qr.contenido.titulo, qr.titulo)
+            with open(cache_imagenes_qr.ruta(qr.id_unico, 'mini', 'png'), 'rb') as imagen:
+                self.assertEqual(imagen.read(8), b'\x89PNG\r\n\x1a\n')
+
+    def test_punto_invalido_no_crea_nada(self):
+        ruta = self.archivo('malos.json', json.dumps([
+            {'titulo': 'Bien', 'numero_secuencial': 1}, {'titulo': 'Mal', 'numero_secuencial': 'dos'},
+        ]))
+        with self.assertRaisesMessage(CommandError, 'Punto 2'):
+            self.provisionar(ruta)
+        self.assertFalse(QRCode.objects.exists())
+
+
+class ImagenQRTests(PruebaMuseo):
+    """Vista imagen_qr: render a pedido, caché en disco con LRU y cabeceras de caché"""
+
+    def setUp(self):
+        super().setUp()
+        shutil.rmtree(CACHE_QR_PRUEBAS, ignore_errors=True)
+        cache_imagenes_qr._ocupado.clear()
+        self.qr = QRCode.objects.create(titulo='Momia', numero_secuencial=1)
+
+    def test_guardar_no_genera_imagen(self):
+        self.assertFalse(self.qr.qr_code_image)
+        self.assertFalse(os.path.exists(CACHE_QR_PRUEBAS))
+
+    def test_formatos_y_tamanos(self):
+        mini = self.client.get(self.qr.get_imagen_url('mini'))
+        self.assertEqual(mini['Content-Type'], 'image/png')
+        self.assertEqual(mini['Cache-Control'], 'public, max-age=31536000, immutable')
+        grande = self.client.get(self.qr.get_imagen_url('impresion'))
+        self.assertGreater(len(b''.join(grande.streaming_content)), len(b''.join(mini.streaming_content)))
+        svg = self.client.get(self.qr.get_imagen_url('normal', 'svg'))
+        self.assertEqual(svg['Content-Type'], 'image/svg+xml')
+        self.assertIn(b'<svg', b''.join(svg.streaming_content))
+
+        self.assertEqual(self.client.get(self.qr.get_imagen_url('gigante')).status_code, 404)
+        self.assertEqual(self.client.get(self.qr.get_imagen_url('normal', 'gif')).status_code, 404)
+        self.assertEqual(self.client.get(reverse('imagen_qr', args=[uuid.uuid4(), 'normal', 'png'])).status_code, 404)
+
+    def test_cada_variante_se_renderiza_una_vez(self):
+        url = self.qr.get_imagen_url()
+        with mock.patch('qrmuseum.cache_imagenes_qr.generar_imagen_qr', wraps=generar_imagen_qr) as generar:
+            primera = b''.join(self.client.get(url).streaming_content)
+            segunda = b''.join(self.client.get(url).streaming_content)
+        self.assertEqual(generar.call_count, 1)
+        self.assertEqual(primera, segunda)
+
+        respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=f'"{self.qr.id_unico}-normal.png"')
+        self.assertEqual(respuesta.status_code, 304)
+
+    def test_variante_recortada_por_otro_hilo_al_guardarla(self):
+        guardar = cache_imagenes_qr.guardar
+
+        def guardar_y_recortar(id_unico, tamano, formato, contenido):
+            guardar(id_unico, tamano, formato, contenido)
+            cache_imagenes_qr.ruta(id_unico, tamano, formato).unlink()  # el LRU de otro pedido
+
+        with mock.patch.object(cache_imagenes_qr, 'guardar', guardar_y_recortar):
+            with cache_imagenes_qr.abrir(self.qr.id_unico, 'mini', 'png') as imagen:
+                self.assertEqual(imagen.read(8), b'\x89PNG\r\n\x1a\n')
+
+    def test_recorte_lru(self):
+        otros = [QRCode.objects.create(titulo=f'Sala {n}', numero_secuencial=n) for n in range(2, 5)]
+        tamano = len(generar_imagen_qr(self.qr.id_unico))
+        with self.settings(QR_CACHE_MAX_BYTES=int(tamano * 3.5)):
+            self.client.get(self.qr.get_imagen_url())
+            self.client.get(otros[0].get_imagen_url())
+            self.client.get(otros[1].get_imagen_url())
+            for antiguedad, qr in enumerate([self.qr, otros[0], otros[1]]):
+                os.utime(cache_imagenes_qr.ruta(qr.id_unico, 'normal', 'png'), (antiguedad, antiguedad))
+            # El primero se vuelve a pedir: los menos usados pasan a ser otros[0] y otros[1]
+            self.client.get(self.qr.get_imagen_url())
+            self.assertGreater(cache_imagenes_qr.ruta(self.qr.id_unico, 'normal', 'png').stat().st_mtime, 2)
+            self.client.get(otros[2].get_imagen_url())
+        existe = [cache_imagenes_qr.ruta(qr.id_unico, 'normal', 'png').exists() for qr in [self.qr, *otros]]
+        self.assertEqual(existe, [True, False, False, True])
+
+    def test_eliminar_qr_borra_sus_variantes(self):
+        self.client.get(self.qr.get_imagen_url('mini'))
+        self.client.get(self.qr.get_imagen_url('normal', 'svg'))
+        id_unico = self.qr.id_unico
+        self.qr.delete()
+        self.assertFalse(list(Path(CACHE_QR_PRUEBAS).glob(f'{id_unico}-*')))
+
+
+class ExportarQRsTests(PruebaMuseo):
+    """ZIP imprimible: imágenes de los QR activos y hoja paginada, generado por partes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.curador = crear_usuario('curador', is_staff=True)
+        for n in range(1, 9):
+            QRCode.objects.create(titulo=f'Sala {n}', numero_secuencial=n, ubicacion=f'Piso {n % 2 + 1}')
+        QRCode.objects.create(titulo='Bodega', numero_secuencial=9, activo=False)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.curador)
+
+    def test_zip_con_imagenes_y_hoja(self):
+        respuesta = self.client.get(reverse('admin_exportar_qrs'))
+        self.assertEqual(respuesta['Content-Type'], 'application/zip')
+        self.assertIn('attachment;', respuesta['Content-Disposition'])
+        partes = list(respuesta.streaming_content)
+        # Una parte por imagen, una por página (8 QR = 2 páginas) y el cierre
+        self.assertEqual(len(partes), 8 + 2 + 1)
+
+        with zipfile.ZipFile(io.BytesIO(b''.join(partes))) as archivo:
+            self.assertIsNone(archivo.testzip())
+            imagenes = [nombre for nombre in archivo.namelist() if nombre.startswith('qr/')]
+            self.assertEqual(len(imagenes), 8)
+            self.assertTrue(imagenes[0].startswith('qr/001_sala-1_'))
+            self.assertEqual(archivo.read(imagenes[0])[:4], b'\x89PNG')
+            hoja = archivo.read('hoja_impresion.html').decode()
+        self.assertEqual(hoja.count('class="pagina"'), 2)
+        self.assertIn('Piso 2', hoja)
+        self.assertIn(f'src="{imagenes[0]}"', hoja)
+        self.assertNotIn('Bodega', hoja)
+
+    def test_flujo_asincrono(self):
+        async def juntar():
+            return [parte async for parte in flujo_asincrono(zip_qrs(MuseoConfig(nombre='Museo')))]
+        partes = async_to_sync(juntar)()
+        with zipfile.ZipFile(io.BytesIO(b''.join(partes))) as archivo:
+            self.assertEqual(len(archivo.namelist()), 9)
+
+    def test_solo_admin(self):
+        self.client.force_login(crear_usuario('visitante'))
+        self.assertEqual(self.client.get(reverse('admin_exportar_qrs')).status_code, 302)
+
+
+class RecomprimirQRsTests(PruebaMuseo):
+    """PNG de 1 bit optimizados al generar y comando recomprimir_qrs para los ya guardados"""
+
+    def setUp(self):
+        super().setUp()
+        shutil.rmtree(CACHE_QR_PRUEBAS, ignore_errors=True)
+
+    def guardar_antiguo(self, qr, imagen):
+        buffer = io.BytesIO()
+        imagen.save(buffer, format='PNG', compress_level=0)
+        qr.qr_code_image.save(f'qr_{qr.id_unico}.png', ContentFile(buffer.getvalue()))
+        return qr.qr_code_image.path
+
+    def test_generar_png_de_un_bit(self):
+        with Image.open(io.BytesIO(generar_imagen_qr(uuid.uuid4()))) as imagen:
+            self.assertEqual(imagen.mode, '1')
+
+    def test_recomprime_y_reporta_ahorro(self):
+        qr = QRCode.objects.create(titulo='Antiguo', numero_secuencial=1)
+        original = Image.open(io.BytesIO(generar_imagen_qr(qr.id_unico))).convert('RGB')
+        ruta = self.guardar_antiguo(qr, original)
+        color = QRCode.objects.create(titulo='Color', numero_secuencial=2)
+        logo = Image.new('RGB', (50, 50), (200, 30, 30))
+        logo.paste((255, 255, 255), (0, 0, 25, 25))
+        ruta_color = self.guardar_antiguo(color, logo)
+        antes, antes_color = os.path.getsize(ruta), os.path.getsize(ruta_color)
+
+        cache_imagenes_qr.abrir(qr.id_unico, 'normal', 'png').close()
+        variante = cache_imagenes_qr.ruta(qr.id_unico, 'normal', 'png')
+        with open(variante, 'wb') as archivo:
+            original.save(archivo, format='PNG', compress_level=0)
+        antes_variante = os.path.getsize(variante)
+
+        salida = io.StringIO()
+        call_command('recomprimir_qrs', procesos=1, stdout=salida)
+        self.assertIn('2 de 3 imágenes recomprimidas', salida.getvalue())
+        # La de media es un archivo nuevo con su huella; la original no cambia de bytes
+        self.assertEqual(os.path.getsize(ruta), antes)
+        qr.refresh_from_db()
+        self.assertNotEqual(qr.qr_code_image.path, ruta)
+        self.assertTrue(es_direccionado(qr.qr_code_image.name))
+        ruta = qr.qr_code_image.path
+        self.assertLess(os.path.getsize(ruta), antes)
+        self.assertEqual(os.stat(ruta).st_mode & 0o777, 0o644)
+        self.assertEqual(os.path.getsize(ruta_color), antes_color)
+        # Las variantes de la caché se reescriben en el lugar
+        self.assertLess(os.path.getsize(variante), antes_variante)
+        self.assertEqual(os.stat(variante).st_mode & 0o777, 0o644)
+        with Image.open(ruta) as imagen:
+            self.assertEqual(imagen.mode, '1')
+            self.assertEqual(list(imagen.convert('RGB').getdata()), list(original.getdata()))
+
+        salida = io.StringIO()
+        call_command('recomprimir_qrs', procesos=2, stdout=salida)
+        self.assertIn('0 de 3 imágenes recomprimidas', salida.getvalue())
+
+
+class DerivadasImagenesTests(PruebaMuseo):
+    """Miniaturas y WebP de las imágenes subidas, srcset en las plantillas y backfill"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.qr = QRCode.objects.create(titulo='Quíbar', numero_secuencial=1)
+
+    def setUp(self):
+        super().setUp()
+        # Los nombres son la huella del contenido: misma imagen, mismas derivadas de otra prueba
+        shutil.rmtree(directorio_derivadas(''), ignore_errors=True)
+
+    def imagen(self, nombre, tamano=(1000, 800), modo='RGB', color=(120, 80, 40)):
+        buffer = io.BytesIO()
+        Image.new(modo, tamano, color).save(buffer, format='PNG' if nombre.endswith('.png') else 'JPEG')
+        return ContentFile(buffer.getvalue(), name=nombre)
+
+    def subir(self, campo, nombre, contenido):
+        """Guardar la imagen y ejecutar acá las tareas que la señal encola para el hilo de derivadas"""
+        with mock.patch('qrmuseum.derivadas._ejecutor') as ejecutor, self.captureOnCommitCallbacks(execute=True):
+            campo.save(nombre, contenido)
+        for tarea in ejecutor.submit.call_args_list:
+            tarea.args[0](*tarea.args[1:])
+
+    def test_subida_genera_derivadas_en_segundo_plano(self):
+        contenido = ContenidoQR(qr=self.qr, titulo='El quíbar', descripcion_detallada='Cerro')
+        with mock.patch('qrmuseum.derivadas._ejecutor') as ejecutor:
+            with self.captureOnCommitCallbacks() as al_confirmar:
+                contenido.imagen.save('quibar.jpg', self.imagen('quibar.jpg'))
+            # Nada se redimensiona dentro de la petición ni antes de confirmar
+            ejecutor.submit.assert_not_called()
+            self.assertEqual(indice_derivadas(contenido.imagen.name), {})
+            for funcion in al_confirmar:
+                funcion()
+        ejecutor.submit.assert_called_once_with(derivadas._en_segundo_plano, contenido.imagen.name, self.qr.id)
+
+        self.client.force_login(crear_usuario('visitante'))
+        url = reverse('contenido_qr', args=[self.qr.id_unico])
+        self.assertNotIn('<picture>', self.client.get(url).content.decode())
+        derivadas._en_segundo_plano(contenido.imagen.name, self.qr.id)
+        # La tarea renueva el fragmento cacheado que se armó con el original
+        self.assertIn('<picture><source type="image/webp"', self.client.get(url).content.decode())
+
+    def test_subida_genera_derivadas_y_srcset(self):
+        contenido = ContenidoQR(qr=self.qr, titulo='El quíbar', descripcion_detallada='Cerro')
+        self.subir(contenido.imagen, 'quibar.jpg', self.imagen('quibar.jpg'))
+        indice = indice_derivadas(contenido.imagen.name)
+        self.assertEqual(indice['anchos'], [160, 320, 640, 1000])
+        self.assertEqual(indice['formato'], 'jpg')
+        directorio = Path(directorio_derivadas(contenido.imagen.name))
+        with Image.open(directorio / '320w.webp') as webp:
+            self.assertEqual(webp.size, (320, 256))
+        self.assertTrue((directorio / '160w.jpg').exists())
+
+        self.client.force_login(crear_usuario('visitante'))
+        html = self.client.get(reverse('contenido_qr', args=[self.qr.id_unico])).content.decode()
+        self.assertIn('<picture><source type="image/webp"', html)
+        self.assertIn(url_derivada(contenido.imagen.name, 320, 'webp') + ' 320w', html)
+
+    def test_manifiesto_usa_la_derivada_mas_chica(self):
+        contenido = ContenidoQR(qr=self.qr, titulo='El quíbar', descripcion_detallada='Cerro')
+        self.subir(contenido.imagen, 'quibar.jpg', self.imagen('quibar.jpg'))
+        entrada = self.client.get(reverse('api_manifiesto')).json()['entradas'][0]
+        self.assertEqual(entrada['miniatura'], url_derivada(contenido.imagen.name, 160, 'jpg'))
+
+        eliminar_derivadas(contenido.imagen.name)
+        entrada = self.client.get(reverse('api_manifiesto')).json()['entradas'][0]
+        self.assertEqual(entrada['miniatura'], contenido.imagen.url)
+
+    def test_png_transparente_y_chico(self):
+        config = MuseoConfig.objects.create(id=1, nombre='Museo')
+        self.subir(config.imagen_fondo, 'fondo.png', self.imagen('fondo.png', (100, 50), 'RGBA', (0, 0, 0, 0)))
+        indice = indice_derivadas(config.imagen_fondo.name)
+        self.assertEqual((indice['anchos'], indice['formato']), ([100], 'png'))
+        html = self.client.get(reverse('login')).content.decode()
+        self.assertIn(f"image-set(url('{url_derivada(config.imagen_fondo.name, 100, 'webp')}') type('image/webp')", html)
+
+    def test_sin_derivadas_usa_el_original(self):
+        perfil = UsuarioMuseo.objects.get(usuario=crear_usuario('visitante'))
+        nombre = default_storage.save('avatares/roto.jpg', ContentFile(b'no es una imagen'))
+        UsuarioMuseo.objects.filter(pk=perfil.pk).update(avatar=nombre)
+        perfil.refresh_from_db()
+        html = Template('{% load imagenes %}{% imagen_responsiva avatar sizes="100px" alt="A" %}').render(
+            Context({'avatar': perfil.avatar})
+        )
+        self.assertEqual(html, f'<img src="{perfil.avatar.url}" alt="A">')
+
+    def test_backfill(self):
+        nombre = default_storage.save('contenido/imagenes/antigua.jpg', self.imagen('antigua.jpg'))
+        contenido = ContenidoQR.objects.create(qr=self.qr, titulo='Antigua', descripcion_detallada='Foto')
+        ContenidoQR.objects.filter(pk=contenido.pk).update(imagen=nombre)  # sin señales
+        version = version_contenido_qr(self.qr.id)
+        self.assertEqual(indice_derivadas(nombre), {})
+
+        salida = io.StringIO()
+        call_command('procesar_imagenes', procesos=2, stdout=salida)
+        self.assertIn('1 de 1 imágenes procesadas', salida.getvalue())
+        self.assertEqual(indice_derivadas(nombre)['anchos'], [160, 320, 640, 1000])
+        self.assertNotEqual(version_contenido_qr(self.qr.id), version)
+
+        salida = io.StringIO()
+        call_command('procesar_imagenes', procesos=1, stdout=salida)
+        self.assertIn('ya tienen derivadas', salida.getvalue())
+
+
+class ServirMediosTests(PruebaMuseo):
+    """Vista servir_medio: Range, If-Range, 304, HEAD y X-Accel-Redirect"""
+
+    DATOS = bytes(range(256)) * 4
+
+    def setUp(self):
+        super().setUp()
+        self.nombre = default_storage.save('contenido/audios/guia.mp3', ContentFile(self.DATOS))
+        self.url = default_storage.url(self.nombre)
+
+    def cuerpo(self, respuesta):
+        return b''.join(respuesta.streaming_content) if respuesta.streaming else respuesta.content
+
+    def test_archivo_completo(self):
+        respuesta = self.client.get(self.url)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta['Content-Type'], 'audio/mpeg')
+        self.assertEqual(respuesta['Accept-Ranges'], 'bytes')
+        self.assertEqual(self.cuerpo(respuesta), self.DATOS)
+
+    def test_rangos(self):
+        for cabecera, inicio, fin in [('bytes=10-19', 10, 19), ('bytes=1000-', 1000, 1023),
+                                      ('bytes=-5', 1019, 1023), ('bytes=1020-5000', 1020, 1023)]:
+            with self.subTest(rango=cabecera):
+                respuesta = self.client.get(self.url, HTTP_RANGE=cabecera)
+                self.assertEqual(respuesta.status_code, 206)
+                self.assertEqual(respuesta['Content-Range'], f'bytes {inicio}-{fin}/1024')
+                self.assertEqual(respuesta['Content-Length'], str(fin - inicio + 1))
+                self.assertEqual(self.cuerpo(respuesta), self.DATOS[inicio:fin + 1])
+
+        respuesta = self.client.get(self.url, HTTP_RANGE='bytes=2000-')
+        self.assertEqual(respuesta.status_code, 416)
+        self.assertEqual(respuesta['Content-Range'], 'bytes */1024')
+        # Varias franjas: archivo completo
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=0-1,5-6').status_code, 200)
+
+    def test_condicionales(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag).status_code, 206)
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"otro"').status_code, 200)
+
+        respuesta = self.client.head(self.url, HTTP_RANGE='bytes=0-9')
+        self.assertEqual((respuesta.status_code, respuesta['Content-Length'], respuesta.content), (206, '10', b''))
+
+    def test_rutas_fuera_de_media_y_ausentes(self):
+        peticion = RequestFactory().get('/media/x')
+        with self.assertRaises(Http404):
+            servir_medio(peticion, '../settings.py')
+        self.assertEqual(self.client.get(default_storage.url('no/existe.mp3')).status_code, 404)
+        self.assertEqual(self.client.get(default_storage.url('contenido')).status_code, 404)
+
+    @override_settings(MEDIA_ACCEL_REDIRECT='/media-interno/')
+    def test_x_accel_redirect(self):
+        respuesta = self.client.get(self.url, HTTP_RANGE='bytes=0-9')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta['X-Accel-Redirect'], '/media-interno/' + self.nombre)
+        self.assertEqual(respuesta.content, b'')
+
+    async def test_rango_bajo_asgi(self):
+        respuesta = await self.async_client.get(self.url, headers={'Range': 'bytes=100-299'})
+        self.assertEqual(respuesta.status_code, 206)
+        cuerpo = b''.join([parte async for parte in respuesta.streaming_content])
+        self.assertEqual(cuerpo, self.DATOS[100:300])
+
+
+def caja_mp4(tipo, *partes):
+    cuerpo = b''.join(partes)
+    return struct.pack('>I4s', len(cuerpo) + 8, tipo) + cuerpo
+
+
+def mp4_moov_al_final(trozos, segundos=75, ancho=1280, alto=720):
+    """MP4 mínimo (ftyp, mdat, moov) con una pista de audio y una de video que apuntan a `trozos`"""
+    ftyp = caja_mp4(b'ftyp', b'isom', struct.pack('>I', 512), b'isomiso2mp41')
+    offsets, posicion = [], len(ftyp) + 8
+    for trozo in trozos:
+        offsets.append(posicion)
+        posicion += len(trozo)
+
+    def pista(handler, ancho_pista, alto_pista, offsets_pista):
+        tkhd = caja_mp4(b'tkhd', bytes(24), bytes(52), struct.pack('>II', ancho_pista << 16, alto_pista << 16))
+        hdlr = caja_mp4(b'hdlr', bytes(8), handler, bytes(12), b'Pista\0')
+        stco = caja_mp4(b'stco', bytes(4), struct.pack(f'>I{len(offsets_pista)}I', len(offsets_pista), *offsets_pista))
+        return caja_mp4(b'trak', tkhd, caja_mp4(b'mdia', hdlr, caja_mp4(b'minf', caja_mp4(b'stbl', stco))))
+
+    mvhd = caja_mp4(b'mvhd', bytes(12), struct.pack('>II', 1000, segundos * 1000), bytes(80))
+    moov = caja_mp4(b'moov', mvhd, pista(b'soun', 0, 0, offsets[:1]), pista(b'vide', ancho, alto, offsets[1:]))
+    return ftyp + caja_mp4(b'mdat', *trozos) + moov
+
+
+class VideosMP4Tests(PruebaMuseo):
+    """Faststart y metadatos de los videos subidos"""
+
+    TROZOS = [b'audio' * 20, b'cuadro-1' * 30, b'cuadro-2' * 30]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.qr = QRCode.objects.create(titulo='Cascada', numero_secuencial=1)
+
+    def tipos_superiores(self, ruta):
+        with open(ruta, 'rb') as archivo:
+            return [tipo for tipo, _, _ in mp4._cajas_superiores(archivo)]
+
+    def trozos_apuntados(self, ruta):
+        with open(ruta, 'rb') as archivo:
+            datos = archivo.read()
+            moov = mp4._leer_moov(archivo, mp4._cajas_superiores(archivo))
+        trozos = []
+        for tipo, cuerpo in mp4._buscar(moov, {b'stco', b'co64'}):
+            cantidad = struct.unpack_from('>I', cuerpo, 4)[0]
+            for offset in struct.unpack_from(f'>{cantidad}I', cuerpo, 8):
+                trozos.append(datos[offset:offset + len(self.TROZOS[len(trozos)])])
+        return trozos
+
+    def test_faststart_y_metadatos(self):
+        ruta = os.path.join(MEDIA_PRUEBAS, 'lento.mp4')
+        with open(ruta, 'wb') as archivo:
+            archivo.write(mp4_moov_al_final(self.TROZOS))
+        self.assertEqual(self.trozos_apuntados(ruta), self.TROZOS)
+
+        rapido = os.path.join(MEDIA_PRUEBAS, 'rapido.mp4')
+        with open(rapido, 'wb') as destino:
+            self.assertTrue(mp4.faststart(ruta, destino))
+        self.assertEqual(self.tipos_superiores(ruta), [b'ftyp', b'mdat', b'moov'])
+        self.assertEqual(self.tipos_superiores(rapido), [b'ftyp', b'moov', b'mdat'])
+        self.assertEqual(self.trozos_apuntados(rapido), self.TROZOS)
+        destino = io.BytesIO()
+        self.assertFalse(mp4.faststart(rapido, destino))
+        self.assertEqual(destino.getvalue(), b'')
+        self.assertEqual(mp4.metadatos(rapido), {'duracion': 75.0, 'ancho': 1280, 'alto': 720})
+
+    def test_stco_que_se_desborda_pasa_a_co64(self):
+        cajas = mp4._parsear(mp4_moov_al_final(self.TROZOS))
+        stco = next(mp4._buscar(cajas, {b'stco'}))
+        mp4._desplazar_offsets(cajas, 2 ** 32)
+        self.assertEqual(stco[0], b'co64')
+        self.assertGreater(struct.unpack_from('>Q', stco[1], 8)[0], 2 ** 32)
+
+    def test_subida_se_procesa_en_segundo_plano(self):
+        contenido = ContenidoQR(qr=self.qr, titulo='La cascada', descripcion_detallada='Video', tipo_contenido='video')
+        with mock.patch('qrmuseum.videos._ejecutor') as ejecutor, self.captureOnCommitCallbacks(execute=True):
+            contenido.video.save('cascada.mp4', ContentFile(mp4_moov_al_final(self.TROZOS)))
+        ejecutor.submit.assert_called_once_with(videos._en_segundo_plano, contenido.pk)
+        original, fecha = contenido.video.name, contenido.fecha_actualizacion
+        with open(contenido.video.path, 'rb') as archivo:
+            bytes_originales = archivo.read()
+
+        self.assertTrue(videos.procesar_video(contenido.pk))
+        contenido.refresh_from_db()
+        # La copia reordenada es otro archivo; el original queda intacto para limpiar_media
+        self.assertNotEqual(contenido.video.name, original)
+        self.assertGreater(contenido.fecha_actualizacion, fecha)
+        self.assertEqual(contenido.video_procesado, contenido.video.name)
+        with default_storage.open(original) as archivo:
+            self.assertEqual(archivo.read(), bytes_originales)
+        self.assertEqual((contenido.video_duracion, contenido.video_ancho, contenido.video_alto), (75.0, 1280, 720))
+        self.assertEqual(self.tipos_superiores(contenido.video.path)[:2], [b'ftyp', b'moov'])
+        self.assertFalse(videos.procesar_video(contenido.pk))
+
+        self.client.force_login(crear_usuario('visitante'))
+        html = self.client.get(reverse('contenido_qr', args=[self.qr.id_unico])).content.decode()
+        self.assertIn('(1:15)', html)
+        self.assertIn('aspect-ratio: 1280 / 720;', html)
+
+    def test_video_no_mp4_y_backfill(self):
+        nombre = default_storage.save('contenido/videos/clip.webm', ContentFile(b'\x1aE\xdf\xa3' + bytes(100)))
+        contenido = ContenidoQR.objects.create(qr=self.qr, titulo='Clip', descripcion_detallada='WebM')
+        ContenidoQR.objects.filter(pk=contenido.pk).update(video=nombre)  # sin señales
+
+        salida = io.StringIO()
+        with self.assertLogs('qrmuseum.videos', 'WARNING'):
+            call_command('procesar_videos', stdout=salida)
+        self.assertIn('1 de 1 videos procesados', salida.getvalue())
+        contenido.refresh_from_db()
+        self.assertEqual((contenido.video_procesado, contenido.video_duracion), (nombre, None))
+
+
+class AlmacenamientoDireccionadoTests(PruebaMuseo):
+    """Media con nombre por contenido, caché inmutable y consolidación de la media vieja"""
+
+    def escribir(self, nombre, contenido):
+        """Archivo de media creado sin pasar por el almacenamiento (como los subidos antes)"""
+        ruta = Path(default_storage.path(nombre))
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        ruta.write_bytes(contenido)
+        return nombre
+
+    def assertNombreEsHuella(self, nombre):
+        """El nombre sigue siendo el sha256 de los bytes que hay en disco"""
+        digest = hashlib.sha256(Path(default_storage.path(nombre)).read_bytes()).hexdigest()[:LARGO_HUELLA]
+        self.assertEqual(Path(nombre).stem, digest)
+
+    def test_faststart_no_cambia_los_bytes_de_un_nombre(self):
+        qr = QRCode.objects.create(titulo='Cascada', numero_secuencial=1)
+        contenido = ContenidoQR(qr=qr, titulo='La cascada', descripcion_detallada='Video', tipo_contenido='video')
+        with mock.patch('qrmuseum.videos._ejecutor'), self.captureOnCommitCallbacks(execute=True):
+            contenido.video.save('cascada.mp4', ContentFile(mp4_moov_al_final(VideosMP4Tests.TROZOS)))
+        original = contenido.video.name
+        self.assertNombreEsHuella(original)
+
+        self.assertTrue(videos.procesar_video(contenido.pk))
+        contenido.refresh_from_db()
+        self.assertNotEqual(contenido.video.name, original)
+        self.assertNombreEsHuella(contenido.video.name)
+        self.assertNombreEsHuella(original)
+
+    def test_subidas_iguales_se_guardan_una_vez(self):
+        datos = uuid.uuid4().bytes * 100
+        primero = default_storage.save('backgrounds/fondo.JPEG', ContentFile(datos))
+        segundo = default_storage.save('backgrounds/fondo_copia.jpeg', ContentFile(datos))
+        self.assertEqual(primero, segundo)
+        self.assertRegex(primero, r'^backgrounds/[0-9a-f]{32}\.jpeg$')
+        self.assertNotEqual(default_storage.save('backgrounds/otro.jpeg', ContentFile(datos + b'!')), primero)
+
+        # Reusar un archivo viejo renueva su fecha para que limpiar_media no lo borre
+        ruta = default_storage.path(primero)
+        os.utime(ruta, (0, 0))
+        default_storage.save('backgrounds/fondo_otra_vez.jpeg', ContentFile(datos))
+        self.assertGreater(os.path.getmtime(ruta), time.time() - 60)
+
+        self.assertEqual(self.client.get(default_storage.url(primero))['Cache-Control'], CACHE_CONTROL_INMUTABLE)
+        viejo = self.escribir('backgrounds/viejo.jpeg', datos)
+        self.assertEqual(self.client.get(default_storage.url(viejo))['Cache-Control'], 'public, max-age=3600')
+
+    def test_consolidar_media(self):
+        fondo, pdf = uuid.uuid4().bytes * 50, uuid.uuid4().bytes * 20
+        config = MuseoConfig.objects.create(id=1, nombre='Museo')
+        qr = QRCode.objects.create(titulo='Choroy', numero_secuencial=1)
+        contenido = ContenidoQR.objects.create(qr=qr, titulo='El choroy', descripcion_detallada='Loro')
+        MuseoConfig.objects.filter(pk=config.pk).update(imagen_fondo=self.escribir('backgrounds/fondo_A1b2.jpeg', fondo))
+        ContenidoQR.objects.filter(pk=contenido.pk).update(
+            archivo_descarga=self.escribir('contenido/archivos/Choroy.pdf', pdf)
+        )
+        copia = self.escribir('backgrounds/fondo.jpeg', fondo)
+        derivada = Path(directorio_derivadas('backgrounds/fondo_A1b2.jpeg')) / 'indice.json'
+        derivada.parent.mkdir(parents=True, exist_ok=True)
+        derivada.write_text('{}')
+        config.refresh_from_db()
+        contenido.refresh_from_db()
+        fechas = (config.fecha_actualizacion, contenido.fecha_actualizacion)
+
+        salida = io.StringIO()
+        call_command('consolidar_media', simular=True, stdout=salida)
+        self.assertIn('3 archivos se consolidarían (1 duplicados', salida.getvalue())
+        self.assertTrue(default_storage.exists(copia))
+
+        call_command('consolidar_media', stdout=io.StringIO())
+        config.refresh_from_db()
+        contenido.refresh_from_db()
+        self.assertTrue(es_direccionado(config.imagen_fondo.name))
+        # Las páginas que mostraban el nombre viejo dejan de validar con 304
+        self.assertGreater(config.fecha_actualizacion, fechas[0])
+        self.assertGreater(contenido.fecha_actualizacion, fechas[1])
+        self.assertEqual(config.imagen_fondo.read(), fondo)
+        self.assertEqual(Path(contenido.archivo_descarga.path).read_bytes(), pdf)
+        self.assertEqual(contenido.get_nombre_descarga(), 'el-choroy.pdf')
+        self.assertFalse(default_storage.exists(copia))
+        self.assertFalse(default_storage.exists('contenido/archivos/Choroy.pdf'))
+        self.assertTrue((Path(directorio_derivadas(config.imagen_fondo.name)) / 'indice.json').exists())
+
+        salida = io.StringIO()
+        call_command('consolidar_media', stdout=salida)
+        self.assertIn('0 archivos consolidados', salida.getvalue())
+
+
+class LimpiarMediaTests(PruebaMuseo):
+    """Recolección de archivos de media que ninguna fila referencia"""
+
+    def setUp(self):
+        super().setUp()
+        shutil.rmtree(MEDIA_PRUEBAS, ignore_errors=True)
+        os.makedirs(MEDIA_PRUEBAS)
+
+    def archivo(self, nombre, tamano=1024, antiguo=True):
+        ruta = Path(default_storage.path(nombre))
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        ruta.write_bytes(b'x' * tamano)
+        if antiguo:
+            os.utime(ruta, (time.time() - 7200, time.time() - 7200))
+        return nombre
+
+    def test_borra_huerfanos_y_sus_derivadas(self):
+        qr = QRCode.objects.create(titulo='Quíbar', numero_secuencial=1)
+        contenido = ContenidoQR.objects.create(qr=qr, titulo='Quíbar', descripcion_detallada='Cerro')
+        ContenidoQR.objects.filter(pk=contenido.pk).update(
+            imagen=self.archivo('contenido/imagenes/vigente.jpg'), audio='contenido/audios/perdido.mp3'
+        )
+        self.archivo('derivadas/contenido/imagenes/vigente.jpg/320w.webp')
+        viejo = self.archivo('contenido/imagenes/reemplazada.jpg', 4096)
+        self.archivo('derivadas/contenido/imagenes/reemplazada.jpg/320w.webp')
+        reciente = self.archivo('avatares/recien_subido.jpg', antiguo=False)
+        cache_imagenes_qr.abrir(qr.id_unico, 'mini', 'png').close()
+
+        salida = io.StringIO()
+        call_command('limpiar_media', simular=True, stdout=salida)
+        self.assertIn('2 huérfanos se borrarían', salida.getvalue())
+        self.assertIn('1 recientes conservados, 1 referencias a archivos que faltan', salida.getvalue())
+        self.assertTrue(default_storage.exists(viejo))
+
+        call_command('limpiar_media', stdout=io.StringIO())
+        self.assertFalse(default_storage.exists(viejo))
+        self.assertFalse(default_storage.exists('derivadas/contenido/imagenes/reemplazada.jpg'))
+        self.assertTrue(default_storage.exists('contenido/imagenes/vigente.jpg'))
+        self.assertTrue(default_storage.exists('derivadas/contenido/imagenes/vigente.jpg/320w.webp'))
+        self.assertTrue(default_storage.exists(reciente))
+        self.assertTrue(cache_imagenes_qr.ruta(qr.id_unico, 'mini', 'png').exists())
+
+    def test_archivo_compartido_por_varias_filas(self):
+        comun = self.archivo('avatares/comun.jpg')
+        for nombre in ('ana', 'beto'):
+            UsuarioMuseo.objects.filter(usuario=crear_usuario(nombre)).update(avatar=comun)
+        UsuarioMuseo.objects.filter(usuario__username='ana').update(avatar='')
+
+        salida = io.StringIO()
+        call_command('limpiar_media', stdout=salida)
+        self.assertIn('0 huérfanos borrados', salida.getvalue())
+        self.assertTrue(default_storage.exists(comun))
+
+
+class VideoExternoTests(PruebaMuseo):
+    """Proveedor, id, embed y miniatura de video_url_externa calculados al guardar"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.qr = QRCode.objects.create(titulo='Choroy', numero_secuencial=1)
+
+    def test_proveedores(self):
+        casos = [
+            ('https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=10', 'youtube', 'dQw4w9WgXcQ',
+             'https://www.youtube.com/embed/dQw4w9WgXcQ?modestbranding=1&rel=0'),
+            ('youtu.be/dQw4w9WgXcQ?si=abc', 'youtube', 'dQw4w9WgXcQ',
+             'https://www.youtube.com/embed/dQw4w9WgXcQ?modestbranding=1&rel=0'),
+            ('https://vimeo.com/channels/staffpicks/76979871', 'vimeo', '76979871',
+             'https://player.vimeo.com/video/76979871'),
+            ('https://drive.google.com/file/d/1AbCdEfGhIjKlMn/view?usp=sharing', 'drive', '1AbCdEfGhIjKlMn',
+             'https://drive.google.com/file/d/1AbCdEfGhIjKlMn/preview'),
+            ('https://www.youtube.com/channel/UCabc', 'youtube', '', 'https://www.youtube.com/channel/UCabc'),
+            ('https://videos.example.com/clip', '', '', 'https://videos.example.com/clip'),
+        ]
+        for url, proveedor, video_id, embed in casos:
+            with self.subTest(url=url):
+                datos = normalizar_url_video(url)
+                self.assertEqual(
+                    (datos['video_proveedor'], datos['video_id_externo'], datos['video_url_embed']),
+                    (proveedor, video_id, embed)
+                )
+                self.assertTrue(datos['video_url_original'].startswith('https://'))
+
+    def test_se_guarda_y_se_muestra_sin_parsear(self):
+        contenido = ContenidoQR.objects.create(
+            qr=self.qr, titulo='El choroy', descripcion_detallada='Loro', tipo_contenido='video',
+            video_url_externa='https://youtu.be/dQw4w9WgXcQ'
+        )
+        self.assertEqual(contenido.video_url_miniatura, 'https://img.youtube.com/vi/dQw4w9WgXcQ/hqdefault.jpg')
+
+        self.client.force_login(crear_usuario('visitante'))
+        html = self.client.get(reverse('contenido_qr', args=[self.qr.id_unico])).content.decode()
+        self.assertIn('src="https://img.youtube.com/vi/dQw4w9WgXcQ/hqdefault.jpg"', html)
+        self.assertIn('href="https://youtu.be/dQw4w9WgXcQ"', html)
+
+        contenido.video_url_externa = 'https://vimeo.com/76979871'
+        contenido.save(update_fields=['video_url_externa'])
+        contenido.refresh_from_db()
+        self.assertEqual((contenido.video_proveedor, contenido.video_url_embed),
+                         ('vimeo', 'https://player.vimeo.com/video/76979871'))
+
+    def test_normalizar_videos(self):
+        contenido = ContenidoQR.objects.create(qr=self.qr, titulo='Choroy', descripcion_detallada='Loro')
+        ContenidoQR.objects.filter(pk=contenido.pk).update(  # sin pasar por save()
+            video_url_externa='https://drive.google.com/open?id=1AbCdEfGhIjKlMn'
+        )
+        fecha = contenido.fecha_actualizacion
+        salida = io.StringIO()
+        call_command('normalizar_videos', stdout=salida)
+        self.assertIn('1 de 1 contenidos actualizados', salida.getvalue())
+        contenido.refresh_from_db()
+        self.assertGreater(contenido.fecha_actualizacion, fecha)
+        self.assertEqual(contenido.video_url_embed, 'https://drive.google.com/file/d/1AbCdEfGhIjKlMn/preview')
+
+        salida = io.StringIO()
+        call_command('normalizar_videos', stdout=salida)
+        self.assertIn('0 de 1 contenidos actualizados', salida.getvalue())
+
+
+class ContadoresComentariosTests(PruebaMuseo):
+    """Contadores de comentarios y calificaciones en ContenidoQR"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.curador = crear_usuario('curador', is_staff=True)
+        cls.visitante = crear_usuario('visitante')
+        cls.qr = QRCode.objects.create(titulo='Copihue', numero_secuencial=1)
+        cls.contenido = ContenidoQR.objects.create(qr=cls.qr, titulo='El copihue', descripcion_detallada='Flor')
+
+    def contadores(self):
+        self.contenido.refresh_from_db()
+        return {campo: getattr(self.contenido, campo) for campo in CAMPOS_CONTADORES}
+
+    def assertCuadra(self):
+        esperados = contadores_esperados().get(self.contenido.pk, dict.fromkeys(CAMPOS_CONTADORES, 0))
+        self.assertEqual(self.contadores(), esperados)
+
+    def test_alta_moderacion_edicion_y_baja(self):
+        self.client.force_login(self.visitante)
+        self.client.post(reverse('agregar_comentario', args=[self.qr.id]), {'texto': 'Lindo', 'calificacion': 4})
+        self.client.post(reverse('agregar_comentario', args=[self.qr.id]), {'texto': 'Raro', 'calificacion': 1})
+        self.assertCuadra()
+        self.assertEqual(self.contenido.total_pendientes, 2)
+
+        lindo, raro = Comentario.objects.order_by('pk')
+        self.client.force_login(self.curador)
+        self.client.post(reverse('admin_moderar_comentario', args=[lindo.id]), {'accion': 'aprobar'})
+        self.client.post(reverse('admin_moderar_comentario', args=[lindo.id]), {'accion': 'aprobar'})  # ya aprobado
+        self.assertCuadra()
+        self.assertEqual((self.contenido.total_aprobados, self.contenido.calificaciones_4), (1, 1))
+
+        Comentario.objects.create(usuario=self.curador, contenido_qr=self.contenido, texto='Bien', moderado=True)
+        lindo.refresh_from_db()
+        lindo.calificacion = 5
+        lindo.save(update_fields=['calificacion'])
+        self.assertCuadra()
+        self.assertEqual(self.contenido.promedio_calificacion, 5.0)
+
+        self.client.post(reverse('admin_moderar_comentario', args=[raro.id]), {'accion': 'rechazar'})
+        self.visitante.delete()  # borra en cascada el comentario aprobado que quedaba
+        self.assertCuadra()
+        self.assertEqual((self.contenido.total_comentarios, self.contenido.suma_calificaciones), (1, 5))
+
+    def test_pagina_muestra_totales_y_promedio(self):
+        for calificacion, moderado in [(5, True), (4, True), (1, False)]:
+            Comentario.objects.create(usuario=self.visitante, contenido_qr=self.contenido, texto='Hola',
+                                      calificacion=calificacion, moderado=moderado)
+        self.client.force_login(self.visitante)
+        html = self.client.get(reverse('contenido_qr', args=[self.qr.id_unico])).content.decode()
+        self.assertIn('Comentarios (3)', html)
+        self.assertIn('⭐ 4,5', html)
+
+    def test_reconciliar(self):
+        Comentario.objects.create(usuario=self.visitante, contenido_qr=self.contenido, texto='Hola')
+        Comentario.objects.filter(contenido_qr=self.contenido).update(moderado=True, calificacion=3)  # sin señales
+        version = version_contenido_qr(self.qr.id)
+
+        salida = io.StringIO()
+        call_command('reconciliar_comentarios', stdout=salida)
+        self.assertIn('1 de 1 contenidos tenían contadores desfasados', salida.getvalue())
+        self.assertCuadra()
+        self.assertEqual(self.contenido.calificaciones_3, 1)
+        self.assertNotEqual(version_contenido_qr(self.qr.id), version)
+
+        salida = io.StringIO()
+        call_command('reconciliar_comentarios', stdout=salida)
+        self.assertIn('0 de 1', salida.getvalue())
@@ -12,14 +12,27 @@ urlpatterns = [
     path('escanear/', views.escanear_qr, name='escanear_qr'),
     path('qr/<uuid:uuid_qr>/', views.procesar_qr, name='contenido_qr'),
     path('qr/<int:qr_id>/comentario/', views.agregar_comentario, name='agregar_comentario'),
+    path('api/qr/<uuid:uuid_qr>/escanear/', views.api_escanear_qr, name='api_escanear_qr'),
+    path('qr/<uuid:uuid_qr>/<slug:tamano>.<slug:formato>', views.imagen_qr, name='imagen_qr'),
+    
+    # Contenido offline (service worker)
+    path('sw.js', views.service_worker, name='service_worker'),
+    path('offline/qr/', views.offline_qr, name='offline_qr'),
+    path('api/manifiesto/', views.api_manifiesto, name='api_manifiesto'),
+    path('api/qr/<uuid:uuid_qr>/', views.api_contenido_qr, name='api_contenido_qr'),
+    
+    # Eventos en vivo (SSE, solo bajo ASGI)
+    path('api/eventos/', views.eventos_en_vivo, name='eventos_en_vivo'),
     
     # Mi cuenta
     path('mi-progreso/', views.mi_progreso, name='mi_progreso'),
+    path('ranking/', views.ranking, name='ranking'),
     path('editar-perfil/', views.editar_perfil, name='editar_perfil'),
     
     # Admin Museum (usando prefijo 'app' para evitar conflicto con admin de Django)
     path('app/dashboard/', views.admin_dashboard, name='admin_dashboard'),
     path('app/qrs/', views.admin_qrs_list, name='admin_qrs_list'),
+    path('app/qrs/exportar/', views.admin_exportar_qrs, name='admin_exportar_qrs'),
     path('app/qr/crear/', views.admin_crear_qr, name='admin_crear_qr'),
     path('app/qr/<int:qr_id>/editar/', views.admin_editar_qr, name='admin_editar_qr'),
     path('app/qr/<int:qr_id>/eliminar/', views.admin_eliminar_qr, name='admin_eliminar_qr'),
@@ -31,4 +44,6 @@ urlpatterns = [
     path('app/usuario/<int:user_id>/editar/', views.admin_editar_usuario, name='admin_editar_usuario'),
     path('app/usuario/<int:user_id>/eliminar/', views.admin_eliminar_usuario, name='admin_eliminar_usuario'),
     path('app/estadisticas/', views.admin_estadisticas, name='admin_estadisticas'),
+    path('app/analitica/', views.admin_analitica, name='admin_analitica'),
+    path('app/pantalla/', views.admin_pantalla, name='admin_pantalla'),
 ]
@@ -0,0 +1,78 @@
+"""
+Optimización de los videos subidos a ContenidoQR.video
+
+Cada archivo nuevo se copia con el índice (moov) al principio, para que el
+navegador empiece a reproducir con los primeros KB en vez de bajar el video
+entero, y se guardan su duración y dimensiones (el <video> reserva su lugar y
+muestra la duración sin pedir el archivo). La copia se guarda por el
+almacenamiento con su propia huella y el contenido pasa a apuntar a ella: un
+archivo direccionado nunca cambia de bytes (se sirve como inmutable) y el
+original queda para `manage.py limpiar_media`. Como copiar un video de cientos
+de MB tarda, la señal post_save lo encola en un hilo del proceso al confirmarse
+la transacción; video_procesado guarda el nombre del archivo ya tratado para
+no repetirlo. `manage.py procesar_videos` hace lo mismo con los existentes.
+"""
+import logging
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.db import connection, transaction
+from django.utils import timezone
+
+from qrmuseum.cache_contenido import invalidar_contenido_qr
+from qrmuseum.models import ContenidoQR
+from qrmuseum.mp4 import MP4Invalido, faststart, metadatos
+
+logger = logging.getLogger(__name__)
+
+# Un solo hilo: los videos se procesan de a uno y no compiten con las vistas por el disco
+_ejecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='videos')
+
+
+def procesar_video(contenido_id):
+    """Faststart y metadatos del video de un contenido; devuelve True si lo procesó"""
+    contenido = ContenidoQR.objects.filter(pk=contenido_id).only('qr_id', 'video', 'video_procesado').first()
+    if contenido is None or not contenido.video or contenido.video.name == contenido.video_procesado:
+        return False
+    nombre = procesado = contenido.video.name
+    try:
+        # Como una subida: el almacenamiento mueve el temporal al nombre de su huella
+        with TemporaryUploadedFile(os.path.basename(nombre), 'video/mp4', 0, None) as temporal:
+            if faststart(contenido.video.path, temporal.file):
+                temporal.file.flush()
+                procesado = default_storage.save(nombre, temporal)
+        datos = metadatos(default_storage.path(procesado))
+    except (OSError, struct.error, MP4Invalido) as error:
+        # WebM, archivo dañado o ausente: se sirve tal cual, sin metadatos
+        logger.warning('No se pudo optimizar el video %s: %s', nombre, error)
+        datos = {'duracion': None, 'ancho': None, 'alto': None}
+
+    # update() no dispara post_save; el filtro por video descarta el resultado si mientras tanto se subió otro
+    # fecha_actualizacion a mano (update() no aplica auto_now): cambia el ETag de la página
+    ContenidoQR.objects.filter(pk=contenido_id, video=nombre).update(
+        fecha_actualizacion=timezone.now(),
+        video=procesado,
+        video_procesado=procesado,
+        video_duracion=datos['duracion'],
+        video_ancho=datos['ancho'],
+        video_alto=datos['alto'],
+    )
+    invalidar_contenido_qr(contenido.qr_id)
+    return True
+
+
+def _en_segundo_plano(contenido_id):
+    try:
+        procesar_video(contenido_id)
+    except Exception:
+        logger.exception('Error procesando el video del contenido %s', contenido_id)
+    finally:
+        connection.close()
+
+
+def encolar_video(contenido_id):
+    """Procesar el video en el hilo de videos cuando se confirme la transacción actual"""
+    transaction.on_commit(lambda: _ejecutor.submit(_en_segundo_plano, contenido_id))
@@ -1,10 +1,26 @@
-from django.shortcuts import render, redirect, get_object_or_404
+import asyncio
+import hashlib
+import json
+
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.models import User
 from django.contrib import messages
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
 from django.core.paginator import Paginator
-from django.db.models import Count
+from django.urls import reverse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import require_POST, require_safe
+from django.db.models import F
 
 from qrmuseum.models import (
     QRCode, ContenidoQR, Comentario, ProgresoUsuario, 
@@ -14,6 +30,23 @@ from qrmuseum.forms import (
     RegistroUsuarioForm, QRCodeForm, ContenidoQRForm, 
     ComentarioForm, PerfilUsuarioMuseoForm, MuseoConfigForm
 )
+from qrmuseum.puntuacion import PUNTOS_POR_QR, registrar_escaneo
+from qrmuseum.cache_contenido import TTL_CONTENIDO_QR, aversion_contenido_qr, invalidar_contenido_qr
+from qrmuseum.resolver import resolvedor_qr
+from qrmuseum.cache_imagenes_qr import cache_imagenes_qr
+from qrmuseum.imagenes_qr import FORMATOS, TAMANOS
+from qrmuseum.exportacion import flujo_asincrono, zip_qrs
+from qrmuseum.medios import CACHE_CONTROL_MEDIOS, respuesta_archivo
+from qrmuseum.almacenamiento import CACHE_CONTROL_INMUTABLE, es_direccionado
+from qrmuseum.derivadas import url_miniatura
+from qrmuseum.configuracion import configuracion_museo
+from qrmuseum.ranking import mover_en_ranking, qrs_populares, top_usuarios, vecinos
+from qrmuseum.analitica import series_escaneos
+from qrmuseum.eventos import formato_sse, publicador_eventos
+from qrmuseum.metricas import metricas_dashboard
+from qrmuseum.condicionales import (
+    amarcas_contenido_qr, amarcas_inicio, aplicar_validadores, respuesta_no_modificada, validadores
+)
 
 
 # ==================== UTILIDADES ====================
@@ -24,30 +57,98 @@ def es_admin(user):
 
 
 def obtener_museo_config():
-    """Obtener configuración del museo o crear una por defecto"""
-    config, _ = MuseoConfig.objects.get_or_create(id=1)
-    return config
+    """Configuración del museo (cacheada, solo lectura) o una por defecto"""
+    return configuracion_museo.obtener()
+
+
+async def aobtener_museo_config():
+    """Versión async de obtener_museo_config"""
+    return await configuracion_museo.aobtener()
+
+
+def datos_contenido_qr(qr, contenido):
+    """Contenido de un QR como diccionario JSON, respetando los flags mostrar_*"""
+    datos = {
+        'qr': {
+            'id': qr.id,
+            'uuid': str(qr.id_unico),
+            'titulo': qr.titulo,
+            'numero_secuencial': qr.numero_secuencial,
+            'ubicacion': qr.ubicacion,
+            'descripcion': qr.descripcion,
+        },
+        'url': reverse('contenido_qr', args=[qr.id_unico]),
+        'contenido': None,
+    }
+    if contenido is None:
+        return datos
+    
+    video = None
+    if contenido.mostrar_video:
+        if contenido.video_url_externa:
+            video = {
+                'tipo': 'externo',
+                'proveedor': contenido.video_proveedor,
+                'embed': contenido.video_url_embed,
+                'original': contenido.video_url_original,
+                'miniatura': contenido.video_url_miniatura,
+            }
+        elif contenido.video:
+            video = {'tipo': 'local', 'url': contenido.video.url}
+    
+    datos['contenido'] = {
+        'tipo': contenido.tipo_contenido,
+        'titulo': contenido.titulo,
+        'descripcion': contenido.descripcion_detallada,
+        'imagen': contenido.imagen.url if contenido.imagen and contenido.mostrar_imagen else None,
+        'video': video,
+        'audio': contenido.audio.url if contenido.audio and contenido.mostrar_audio else None,
+        'archivo': contenido.archivo_descarga.url if contenido.archivo_descarga and contenido.mostrar_archivo else None,
+        'historico': contenido.datos_historicos if contenido.mostrar_historico else '',
+        'cientifico': contenido.datos_cientificos if contenido.mostrar_cientifico else '',
+        'curiosidades': contenido.curiosidades if contenido.mostrar_curiosidades else '',
+    }
+    return datos
+
+
+# render() ejecuta los context processors, que consultan la base de datos de
+# forma síncrona; las vistas async lo llaman en un hilo aparte
+_render_sync = sync_to_async(render)
+
+
+async def arender(request, *args, **kwargs):
+    """render() para vistas async, reutilizando el usuario ya cargado por request.auser()"""
+    request.user = await request.auser()
+    return await _render_sync(request, *args, **kwargs)
 
 
 # ==================== VISTAS PÚBLICAS ====================
 
-def inicio(request):
+async def inicio(request):
     """Página de inicio - Con opción de empezar escaneo QR o login/registro"""
-    museo = obtener_museo_config()
-    total_qrs = QRCode.objects.filter(activo=True).count()
+    usuario = await request.auser()
+    
+    # Si el navegador ya tiene esta versión de la página, 304 sin más consultas
+    etag = ultima_modificacion = None
+    marcas = await amarcas_inicio(usuario)
+    if marcas is not None:
+        etag, ultima_modificacion = validadores(request, usuario, marcas)
+        no_modificada = await sync_to_async(respuesta_no_modificada)(request, etag, ultima_modificacion)
+        if no_modificada is not None:
+            return no_modificada
+    
+    museo = await aobtener_museo_config()
+    total_qrs = await QRCode.objects.filter(activo=True).acount()
     
     # Si el usuario está autenticado, mostrar su progreso
     progreso = None
     usuario_museo = None
     porcentaje_completado = 0
     
-    if request.user.is_authenticated:
-        try:
-            usuario_museo = request.user.perfil_museo
-        except UsuarioMuseo.DoesNotExist:
-            usuario_museo = UsuarioMuseo.objects.create(usuario=request.user)
+    if usuario.is_authenticated:
+        usuario_museo, _ = await UsuarioMuseo.objects.aget_or_create(usuario=usuario)
         
-        progreso = ProgresoUsuario.objects.filter(usuario=request.user).count()
+        progreso = await ProgresoUsuario.objects.filter(usuario=usuario).acount()
         if total_qrs > 0:
             porcentaje_completado = (progreso / total_qrs) * 100
     
@@ -57,10 +158,13 @@ def inicio(request):
         'progreso': progreso,
         'usuario_museo': usuario_museo,
         'porcentaje_completado': int(porcentaje_completado),
-        'es_usuario': request.user.is_authenticated
+        'es_usuario': usuario.is_authenticated
     }
     
-    return render(request, 'inicio.html', data)
+    respuesta = await arender(request, 'inicio.html', data)
+    if etag is not None:
+        aplicar_validadores(respuesta, etag, ultima_modificacion)
+    return respuesta
 
 
 def registro(request):
@@ -111,6 +215,7 @@ def logout_view(request):
 
 # ==================== VISTAS DE ESCANEO QR ====================
 
+@ensure_csrf_cookie
 def escanear_qr(request):
     """Página para escanear un código QR"""
     data = {
@@ -119,33 +224,38 @@ def escanear_qr(request):
     return render(request, 'escanear_qr.html', data)
 
 
-def procesar_qr(request, uuid_qr):
+async def procesar_qr(request, uuid_qr):
     """Procesar el escaneo de un QR"""
-    qr = get_object_or_404(QRCode, id_unico=uuid_qr, activo=True)
-    
-    # Registrar visita si el usuario está autenticado
-    if request.user.is_authenticated:
-        progreso, creado = ProgresoUsuario.objects.get_or_create(
-            usuario=request.user,
-            qr_visitado=qr
-        )
-        
-        #AQUI SE DICTA EL PUNTAJE (LÍNEA 145-147)
-        # Actualizar estadísticas del usuario
-        try:
-            usuario_museo = request.user.perfil_museo
-            if creado:  # Solo si es PRIMERA VEZ que escanea este QR
-                usuario_museo.total_qrs_escaneados += 1
-                usuario_museo.puntos += 10  # ← SUMA 10 PUNTOS POR CADA QR NUEVO
-                usuario_museo.save()  # ← Se guarda en la base de datos
-        except UsuarioMuseo.DoesNotExist:
-            pass
-    
-    # Obtener comentarios aprobados
+    # UUID desconocido o inactivo: 404 sin consultar la base de datos
+    entrada = await resolvedor_qr.aresolver(uuid_qr)
+    if entrada is None or not entrada.activo:
+        raise Http404('Código QR no encontrado')
+    usuario = await request.auser()
+    
+    # Registrar visita si el usuario está autenticado; la entrada del resolver
+    # trae pk y título, no hace falta cargar el QR
+    # AQUI SE DICTA EL PUNTAJE: suma PUNTOS_POR_QR solo la primera vez (ver qrmuseum/puntuacion.py)
+    if usuario.is_authenticated:
+        await sync_to_async(registrar_escaneo)(usuario, entrada)
+    
+    # Si el navegador ya tiene esta versión de la página, 304 sin cargar ni renderizar nada
+    marcas = await amarcas_contenido_qr(entrada.pk)
+    if marcas is None:
+        raise Http404('Código QR no encontrado')
+    etag, ultima_modificacion = validadores(request, usuario, marcas)
+    no_modificada = await sync_to_async(respuesta_no_modificada)(request, etag, ultima_modificacion)
+    if no_modificada is not None:
+        return no_modificada
+    
+    qr = await aget_object_or_404(QRCode.objects.select_related('contenido'), pk=entrada.pk, activo=True)
+    
+    # Comentarios aprobados: el queryset solo se evalúa si el fragmento
+    # cacheado del template no está vigente (ver cache_contenido.py)
     comentarios_aprobados = []
     if hasattr(qr, 'contenido'):
         contenido = qr.contenido
-        comentarios_aprobados = contenido.comentarios.filter(moderado=True).order_by('-fecha_creacion')
+        comentarios_aprobados = contenido.comentarios.filter(moderado=True) \
+            .select_related('usuario').order_by('-fecha_creacion')
     else:
         contenido = None
     
@@ -153,16 +263,139 @@ def procesar_qr(request, uuid_qr):
         'qr': qr,
         'contenido': contenido,
         'comentarios_aprobados': comentarios_aprobados,
-        'usuario_autenticado': request.user.is_authenticated
+        'usuario_autenticado': usuario.is_authenticated,
+        'version_contenido': await aversion_contenido_qr(qr.id),
+        'ttl_contenido': TTL_CONTENIDO_QR
     }
     
-    return render(request, 'contenido_qr.html', data)
+    respuesta = await arender(request, 'contenido_qr.html', data)
+    return aplicar_validadores(respuesta, etag, ultima_modificacion)
+
+
+@require_POST
+async def api_escanear_qr(request, uuid_qr):
+    """Registrar un escaneo y devolver solo el contenido en JSON (para el escáner)"""
+    entrada = await resolvedor_qr.aresolver(uuid_qr)
+    if entrada is None or not entrada.activo:
+        return JsonResponse({'error': 'Código QR no encontrado'}, status=404)
+    qr = await QRCode.objects.select_related('contenido').filter(pk=entrada.pk, activo=True).afirst()
+    if qr is None:
+        return JsonResponse({'error': 'Código QR no encontrado'}, status=404)
+    usuario = await request.auser()
+    
+    datos = datos_contenido_qr(qr, getattr(qr, 'contenido', None))
+    datos['progreso'] = None
+    if usuario.is_authenticated:
+        nuevo = await sync_to_async(registrar_escaneo)(usuario, qr)
+        perfil = await UsuarioMuseo.objects.filter(usuario=usuario) \
+            .values('puntos', 'total_qrs_escaneados').afirst()
+        datos['progreso'] = {
+            'nuevo': nuevo,
+            'puntos_ganados': PUNTOS_POR_QR if nuevo else 0,
+            'puntos': perfil['puntos'] if perfil else None,
+            'total_qrs_escaneados': perfil['total_qrs_escaneados'] if perfil else None,
+        }
+    
+    return JsonResponse(datos)
+
+
+async def api_contenido_qr(request, uuid_qr):
+    """Contenido de un QR en JSON sin registrar escaneo (lo guarda el service worker)"""
+    entrada = await resolvedor_qr.aresolver(uuid_qr)
+    if entrada is None or not entrada.activo:
+        return JsonResponse({'error': 'Código QR no encontrado'}, status=404)
+    qr = await QRCode.objects.select_related('contenido').filter(pk=entrada.pk, activo=True).afirst()
+    if qr is None:
+        return JsonResponse({'error': 'Código QR no encontrado'}, status=404)
+    return JsonResponse(datos_contenido_qr(qr, getattr(qr, 'contenido', None)))
+
+
+def imagen_qr(request, uuid_qr, tamano, formato):
+    """Imagen del código QR en el tamaño y formato pedidos.
+
+    Se renderiza la primera vez que se pide y después se sirve desde la caché
+    en disco; la imagen de un UUID no cambia nunca, así que el navegador y
+    los proxies la pueden guardar indefinidamente.
+    """
+    if tamano not in TAMANOS or formato not in FORMATOS or resolvedor_qr.resolver(uuid_qr) is None:
+        raise Http404('Código QR no encontrado')
+    etag = f'"{uuid_qr}-{tamano}.{formato}"'
+    respuesta = get_conditional_response(request, etag=etag)
+    if respuesta is None:
+        respuesta = FileResponse(cache_imagenes_qr.abrir(uuid_qr, tamano, formato), content_type=FORMATOS[formato])
+        if 'descargar' in request.GET:
+            respuesta['Content-Disposition'] = f'attachment; filename="qr_{uuid_qr}_{tamano}.{formato}"'
+    respuesta['ETag'] = etag
+    respuesta['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return respuesta
+
+
+@require_safe
+def servir_medio(request, ruta):
+    """Archivos subidos (MEDIA_URL) con rangos para adelantar audio y video; ver medios.py"""
+    try:
+        completa = safe_join(settings.MEDIA_ROOT, ruta)
+    except SuspiciousFileOperation:
+        raise Http404('Archivo no encontrado')
+    ruta_accel = settings.MEDIA_ACCEL_REDIRECT + ruta if settings.MEDIA_ACCEL_REDIRECT else None
+    # Un nombre por contenido no cambia nunca de bytes
+    cache_control = CACHE_CONTROL_INMUTABLE if es_direccionado(ruta) else CACHE_CONTROL_MEDIOS
+    return respuesta_archivo(request, completa, ruta_accel, cache_control)
+
+
+async def api_manifiesto(request):
+    """Manifiesto versionado del contenido offline: una entrada por QR activo con su hash.
+
+    El service worker compara los hashes con su copia y descarga solo las
+    entradas que cambiaron; si la versión no cambió responde 304.
+    """
+    entradas = []
+    qrs = QRCode.objects.filter(activo=True).select_related('contenido').order_by('numero_secuencial')
+    async for qr in qrs:
+        contenido = getattr(qr, 'contenido', None)
+        datos = datos_contenido_qr(qr, contenido)
+        miniatura = None
+        if contenido and datos['contenido']['imagen']:
+            # La más chica de las derivadas alcanza para el listado offline
+            miniatura = await sync_to_async(url_miniatura)(contenido.imagen.name) or datos['contenido']['imagen']
+        actualizado = max(qr.fecha_actualizacion, contenido.fecha_actualizacion) if contenido else qr.fecha_actualizacion
+        entradas.append({
+            'uuid': str(qr.id_unico),
+            'numero_secuencial': qr.numero_secuencial,
+            'titulo': qr.titulo,
+            'actualizado': actualizado.isoformat(),
+            'hash': hashlib.sha256(json.dumps(datos, sort_keys=True).encode()).hexdigest()[:16],
+            'datos': reverse('api_contenido_qr', args=[qr.id_unico]),
+            'miniatura': miniatura,
+        })
+    version = hashlib.sha256(''.join(e['uuid'] + e['hash'] for e in entradas).encode()).hexdigest()[:16]
+    
+    etag = f'"{version}"'
+    no_modificado = get_conditional_response(request, etag=etag)
+    if no_modificado is not None:
+        return no_modificado
+    respuesta = JsonResponse({'version': version, 'entradas': entradas})
+    respuesta['ETag'] = etag
+    respuesta['Cache-Control'] = 'no-cache'
+    return respuesta
+
+
+def service_worker(request):
+    """Service worker servido desde la raíz para que controle todo el sitio"""
+    respuesta = HttpResponse(render_to_string('sw.js'), content_type='application/javascript')
+    respuesta['Cache-Control'] = 'no-cache'
+    return respuesta
+
+
+def offline_qr(request):
+    """Página que el service worker muestra para /qr/<uuid>/ cuando no hay señal"""
+    return render(request, 'offline_qr.html')
 
 
 @login_required(login_url='login')
 def agregar_comentario(request, qr_id):
     """Agregar comentario a un contenido QR"""
-    qr = get_object_or_404(QRCode, id=qr_id)
+    qr = get_object_or_404(QRCode.objects.select_related('contenido'), id=qr_id)
     contenido = qr.contenido
     
     if request.method == 'POST':
@@ -172,14 +405,10 @@ def agregar_comentario(request, qr_id):
             comentario.usuario = request.user
             comentario.contenido_qr = contenido
             comentario.save()
+            invalidar_contenido_qr(qr.id)
             
             # Actualizar contador de comentarios
-            try:
-                usuario_museo = request.user.perfil_museo
-                usuario_museo.total_comentarios += 1
-                usuario_museo.save()
-            except UsuarioMuseo.DoesNotExist:
-                pass
+            UsuarioMuseo.objects.filter(usuario=request.user).update(total_comentarios=F('total_comentarios') + 1)
             
             messages.success(request, 'Comentario agregado correctamente')
             return redirect('contenido_qr', uuid_qr=qr.id_unico)
@@ -188,15 +417,21 @@ def agregar_comentario(request, qr_id):
 
 
 @login_required(login_url='login')
-def mi_progreso(request):
+async def mi_progreso(request):
     """Ver progreso del usuario"""
-    usuario_museo = request.user.perfil_museo if hasattr(request.user, 'perfil_museo') else None
-    
-    progreso_qrs = ProgresoUsuario.objects.filter(usuario=request.user).select_related('qr_visitado')
-    comentarios = Comentario.objects.filter(usuario=request.user).select_related('contenido_qr')
-    
-    total_qrs = QRCode.objects.filter(activo=True).count()
-    escaneados = progreso_qrs.count()
+    usuario = await request.auser()
+    usuario_museo = await UsuarioMuseo.objects.filter(usuario=usuario).afirst()
+    
+    progreso_qrs = [
+        item async for item in ProgresoUsuario.objects.filter(usuario=usuario).select_related('qr_visitado')
+    ]
+    comentarios = [
+        comentario async for comentario in Comentario.objects.filter(usuario=usuario)
+        .select_related('contenido_qr__qr')
+    ]
+    
+    total_qrs = await QRCode.objects.filter(activo=True).acount()
+    escaneados = len(progreso_qrs)
     porcentaje = (escaneados / total_qrs * 100) if total_qrs > 0 else 0
     
     data = {
@@ -208,7 +443,26 @@ def mi_progreso(request):
         'porcentaje': int(porcentaje)
     }
     
-    return render(request, 'mi_progreso.html', data)
+    return await arender(request, 'mi_progreso.html', data)
+
+
+def ranking(request):
+    """Ranking público: top 10 y, si hay sesión, la posición del usuario y sus vecinos"""
+    mi_posicion = None
+    alrededor = []
+    if request.user.is_authenticated:
+        perfil = UsuarioMuseo.objects.select_related('usuario').filter(usuario=request.user).first()
+        if perfil and perfil.puntos > 0:
+            alrededor = vecinos(perfil)
+            mi_posicion = next(posicion for posicion, fila in alrededor if fila.pk == perfil.pk)
+    
+    data = {
+        'top': top_usuarios(10),
+        'alrededor': alrededor,
+        'mi_posicion': mi_posicion,
+    }
+    
+    return render(request, 'ranking.html', data)
 
 
 @login_required(login_url='login')
@@ -236,34 +490,77 @@ def editar_perfil(request):
     return render(request, 'editar_perfil.html', data)
 
 
+# ==================== EVENTOS EN VIVO ====================
+
+def ranking_en_vivo():
+    """Top 10 para el estado inicial de la pantalla en vivo"""
+    return [
+        {
+            'usuario_id': perfil.usuario_id,
+            'nombre': perfil.usuario.first_name or perfil.usuario.username,
+            'puntos': perfil.puntos,
+        }
+        for _, perfil in top_usuarios(10)
+    ]
+
+
+async def eventos_en_vivo(request):
+    """Stream SSE de escaneos para la pantalla del museo (solo admin, requiere ASGI)"""
+    usuario = await request.auser()
+    if not (usuario.is_authenticated and es_admin(usuario)):
+        return HttpResponseForbidden()
+    if not isinstance(request, ASGIRequest):
+        # Bajo WSGI la respuesta infinita ocuparía un worker para siempre
+        return HttpResponse('Los eventos en vivo requieren el servidor ASGI', status=501)
+    
+    async def flujo():
+        # Suscribirse dentro del generador: si el cliente se va antes de empezar
+        # el flujo no queda ninguna suscripción colgada. Se suscribe antes de
+        # leer el ranking para no perder escaneos intermedios.
+        suscripcion = publicador_eventos.suscribir()
+        try:
+            ranking_inicial = json.dumps(await sync_to_async(ranking_en_vivo)())
+            yield 'retry: 3000\n' + formato_sse('ranking', ranking_inicial)
+            while True:
+                try:
+                    evento = await suscripcion.siguiente()
+                except asyncio.TimeoutError:
+                    yield ': latido\n\n'
+                    continue
+                if evento is None:
+                    return  # cliente lento descartado: el navegador se reconecta
+                yield formato_sse(*evento)
+        finally:
+            publicador_eventos.desuscribir(suscripcion)
+    
+    respuesta = StreamingHttpResponse(flujo(), content_type='text/event-stream')
+    respuesta['Cache-Control'] = 'no-cache'
+    respuesta['X-Accel-Buffering'] = 'no'
+    return respuesta
+
+
+@login_required(login_url='login')
+@user_passes_test(es_admin, login_url='inicio')
+def admin_pantalla(request):
+    """Pantalla grande con escaneos y ranking en vivo"""
+    return render(request, 'admin/pantalla.html', {'titulo': 'Pantalla en Vivo'})
+
+
 # ==================== VISTAS DE ADMINISTRACIÓN ====================
 
 @login_required(login_url='login')
 @user_passes_test(es_admin, login_url='inicio')
 def admin_dashboard(request):
     """Panel de administración principal"""
-    total_qrs = QRCode.objects.count()
-    qrs_activos = QRCode.objects.filter(activo=True).count()
-    total_usuarios = User.objects.count()
-    total_comentarios = Comentario.objects.count()
-    comentarios_pendientes = Comentario.objects.filter(moderado=False).count()
-    
-    data = {
-        'total_qrs': total_qrs,
-        'qrs_activos': qrs_activos,
-        'total_usuarios': total_usuarios,
-        'total_comentarios': total_comentarios,
-        'comentarios_pendientes': comentarios_pendientes
-    }
-    
-    return render(request, 'admin/dashboard.html', data)
+    return render(request, 'admin/dashboard.html', metricas_dashboard())
 
 
 @login_required(login_url='login')
 @user_passes_test(es_admin, login_url='inicio')
 def admin_qrs_list(request):
     """Lista de códigos QR para administración"""
-    qrs = QRCode.objects.all().order_by('numero_secuencial')
+    # El contenido trae los contadores de comentarios de cada QR
+    qrs = QRCode.objects.select_related('contenido').order_by('numero_secuencial')
     
     # Paginación
     paginator = Paginator(qrs, 10)
@@ -278,6 +575,19 @@ def admin_qrs_list(request):
     return render(request, 'admin/qrs_list.html', data)
 
 
+@login_required(login_url='login')
+@user_passes_test(es_admin, login_url='inicio')
+def admin_exportar_qrs(request):
+    """ZIP con las imágenes de impresión de los QR activos y la hoja para imprimir, enviado por partes"""
+    partes = zip_qrs(obtener_museo_config())
+    if isinstance(request, ASGIRequest):
+        # Bajo ASGI un iterador síncrono se leería completo antes de enviarlo
+        partes = flujo_asincrono(partes)
+    respuesta = StreamingHttpResponse(partes, content_type='application/zip')
+    respuesta['Content-Disposition'] = f'attachment; filename="codigos_qr_{timezone.localdate():%Y%m%d}.zip"'
+    return respuesta
+
+
 @login_required(login_url='login')
 @user_passes_test(es_admin, login_url='inicio')
 def admin_crear_qr(request):
@@ -304,12 +614,13 @@ def admin_crear_qr(request):
 @user_passes_test(es_admin, login_url='inicio')
 def admin_editar_qr(request, qr_id):
     """Editar código QR existente"""
-    qr = get_object_or_404(QRCode, id=qr_id)
+    qr = get_object_or_404(QRCode.objects.select_related('contenido'), id=qr_id)
     
     if request.method == 'POST':
         form = QRCodeForm(request.POST, instance=qr)
         if form.is_valid():
             form.save()
+            invalidar_contenido_qr(qr.id)
             messages.success(request, f'Código QR "{qr.titulo}" actualizado')
             return redirect('admin_qrs_list')
     else:
@@ -353,7 +664,7 @@ def admin_eliminar_qr(request, qr_id):
 @user_passes_test(es_admin, login_url='inicio')
 def admin_contenido_qr(request, qr_id):
     """Crear/editar contenido de un QR"""
-    qr = get_object_or_404(QRCode, id=qr_id)
+    qr = get_object_or_404(QRCode.objects.select_related('contenido'), id=qr_id)
     contenido = qr.contenido if hasattr(qr, 'contenido') else None
     
     if request.method == 'POST':
@@ -362,6 +673,7 @@ def admin_contenido_qr(request, qr_id):
             contenido = form.save(commit=False)
             contenido.qr = qr
             contenido.save()
+            invalidar_contenido_qr(qr.id)
             messages.success(request, 'Contenido actualizado correctamente')
             return redirect('admin_editar_qr', qr_id=qr.id)
     else:
@@ -390,7 +702,7 @@ def admin_comentarios(request):
     else:
         comentarios = Comentario.objects.all()
     
-    comentarios = comentarios.select_related('usuario', 'contenido_qr')
+    comentarios = comentarios.select_related('usuario', 'contenido_qr__qr')
     
     # Paginación
     paginator = Paginator(comentarios, 20)
@@ -410,7 +722,7 @@ def admin_comentarios(request):
 @user_passes_test(es_admin, login_url='inicio')
 def admin_moderar_comentario(request, comentario_id):
     """Moderar un comentario (aprobar/rechazar)"""
-    comentario = get_object_or_404(Comentario, id=comentario_id)
+    comentario = get_object_or_404(Comentario.objects.select_related('usuario', 'contenido_qr__qr'), id=comentario_id)
     
     if request.method == 'POST':
         accion = request.POST.get('accion')
@@ -418,9 +730,11 @@ def admin_moderar_comentario(request, comentario_id):
         if accion == 'aprobar':
             comentario.moderado = True
             comentario.save()
+            invalidar_contenido_qr(comentario.contenido_qr.qr_id)
             messages.success(request, 'Comentario aprobado')
         elif accion == 'rechazar':
             comentario.delete()
+            invalidar_contenido_qr(comentario.contenido_qr.qr_id)
             messages.success(request, 'Comentario eliminado')
         
         return redirect('admin_comentarios')
@@ -461,7 +775,7 @@ def admin_configuracion(request):
 @user_passes_test(es_admin, login_url='inicio')
 def admin_usuarios(request):
     """Gestionar usuarios del sistema"""
-    usuarios = User.objects.all().select_related('perfil_museo')
+    usuarios = User.objects.all().select_related('perfil_museo').order_by('username')
     
     # Paginación
     paginator = Paginator(usuarios, 20)
@@ -480,7 +794,7 @@ def admin_usuarios(request):
 @user_passes_test(es_admin, login_url='inicio')
 def admin_editar_usuario(request, user_id):
     """Editar privilegios y estado de un usuario"""
-    usuario = get_object_or_404(User, id=user_id)
+    usuario = get_object_or_404(User.objects.select_related('perfil_museo'), id=user_id)
     
     if request.method == 'POST':
         accion = request.POST.get('accion')
@@ -509,9 +823,11 @@ def admin_editar_usuario(request, user_id):
             # Actualizar estadísticas
             try:
                 usuario_museo = usuario.perfil_museo
+                puntos_antes = usuario_museo.puntos
                 usuario_museo.total_qrs_escaneados = qrs.count()
-                usuario_museo.puntos = qrs.count() * 10
+                usuario_museo.puntos = qrs.count() * PUNTOS_POR_QR
                 usuario_museo.save()
+                mover_en_ranking(puntos_antes, usuario_museo.puntos)
             except UsuarioMuseo.DoesNotExist:
                 pass
             messages.success(request, f'Contenido desbloqueado para {usuario.username}')
@@ -568,29 +884,36 @@ def admin_eliminar_usuario(request, user_id):
 @user_passes_test(es_admin, login_url='inicio')
 def admin_estadisticas(request):
     """Ver estadísticas del museo"""
-    total_usuarios = User.objects.count()
-    total_qrs = QRCode.objects.count()
-    total_escaneos = ProgresoUsuario.objects.count()
-    total_comentarios = Comentario.objects.count()
-    
-    # Top usuarios por escaneos
-    top_usuarios = ProgresoUsuario.objects.values('usuario__username', 'usuario__first_name') \
-        .annotate(count=Count('id')) \
-        .order_by('-count')[:10]
-    
-    # QRs más visitados
-    qrs_populares = ProgresoUsuario.objects.values('qr_visitado__titulo') \
-        .annotate(count=Count('id')) \
-        .order_by('-count')[:10]
-    
     data = {
-        'total_usuarios': total_usuarios,
-        'total_qrs': total_qrs,
-        'total_escaneos': total_escaneos,
-        'total_comentarios': total_comentarios,
-        'top_usuarios': top_usuarios,
-        'qrs_populares': qrs_populares,
+        **metricas_dashboard(),
+        # Ranking materializado (ver ranking.py)
+        'top_usuarios': top_usuarios(10),
+        'qrs_populares': qrs_populares(10),
         'titulo': 'Estadísticas del Museo'
     }
     
     return render(request, 'admin/estadisticas.html', data)
+
+
+PERIODOS_ANALITICA = [7, 30, 90, 365]
+
+
+@login_required(login_url='login')
+@user_passes_test(es_admin, login_url='inicio')
+def admin_analitica(request):
+    """Escaneos por hora, día de la semana, QR y fecha (desde las tablas resumen)"""
+    try:
+        dias = int(request.GET.get('dias', 30))
+    except ValueError:
+        dias = 30
+    if dias not in PERIODOS_ANALITICA:
+        dias = 30
+    
+    data = {
+        'dias': dias,
+        'periodos': PERIODOS_ANALITICA,
+        'series': series_escaneos(dias),
+        'titulo': 'Analítica de Escaneos'
+    }
+    
+    return render(request, 'admin/analitica.html', data)
@@ -0,0 +1,153 @@
+/*
+ * Service worker de MuseoQR: contenido offline para salas sin señal.
+ *
+ * - Precarga la página offline y los assets de CDN al instalarse.
+ * - Sincroniza el contenido con /api/manifiesto/: compara los hashes con la
+ *   copia guardada y descarga solo las entradas nuevas o modificadas.
+ * - Sin red, /qr/<uuid>/ se responde con la página offline, que dibuja el
+ *   contenido desde la caché y deja el escaneo pendiente.
+ */
+const CACHE_APP = 'museoqr-app-v1';
+const CACHE_CONTENIDO = 'museoqr-contenido-v1';
+const URL_MANIFIESTO = '/api/manifiesto/';
+const URL_OFFLINE = '/offline/qr/';
+const PRECARGA_LOCAL = [URL_OFFLINE, '/escanear/'];
+const PRECARGA_CDN = [
+    'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css',
+    'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js',
+    'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css',
+    'https://cdn.jsdelivr.net/npm/jsqr@1.4.0/dist/jsQR.js'
+];
+const RUTA_QR = /^\/qr\/[0-9a-f-]{36}\/$/i;
+const RUTA_API_QR = /^\/api\/qr\/[0-9a-f-]{36}\/$/i;
+
+self.addEventListener('install', event => {
+    event.waitUntil((async () => {
+        const cache = await caches.open(CACHE_APP);
+        await cache.addAll(PRECARGA_LOCAL);
+        await Promise.all(PRECARGA_CDN.map(url =>
+            fetch(url, { mode: 'no-cors' }).then(r => cache.put(url, r)).catch(() => null)
+        ));
+        await self.skipWaiting();
+    })());
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil((async () => {
+        const vigentes = [CACHE_APP, CACHE_CONTENIDO];
+        for (const nombre of await caches.keys()) {
+            if (!vigentes.includes(nombre)) {
+                await caches.delete(nombre);
+            }
+        }
+        await self.clients.claim();
+        await sincronizar();
+    })());
+});
+
+self.addEventListener('message', event => {
+    if (event.data === 'sincronizar') {
+        event.waitUntil(sincronizar());
+    }
+});
+
+async function sincronizar() {
+    const cache = await caches.open(CACHE_CONTENIDO);
+    const guardado = await cache.match(URL_MANIFIESTO);
+    const anterior = guardado ? await guardado.json() : { version: null, entradas: [] };
+
+    let respuesta;
+    try {
+        const cabeceras = anterior.version ? { 'If-None-Match': `"${anterior.version}"` } : {};
+        respuesta = await fetch(URL_MANIFIESTO, { headers: cabeceras, credentials: 'same-origin', cache: 'no-store' });
+    } catch (err) {
+        return;  // Sin red: se mantiene la copia actual
+    }
+    if (respuesta.status === 304 || !respuesta.ok) {
+        return;
+    }
+    const nuevo = await respuesta.clone().json();
+
+    // Diferencia incremental contra el manifiesto guardado
+    const previas = new Map(anterior.entradas.map(e => [e.uuid, e]));
+    for (const entrada of nuevo.entradas) {
+        const previa = previas.get(entrada.uuid);
+        previas.delete(entrada.uuid);
+        if (previa && previa.hash === entrada.hash) {
+            continue;
+        }
+        try {
+            await cache.add(entrada.datos);
+            if (entrada.miniatura) {
+                await cache.add(entrada.miniatura);
+            }
+        } catch (err) {
+            return;  // Sincronización incompleta: no se guarda el manifiesto nuevo
+        }
+        if (previa && previa.miniatura && previa.miniatura !== entrada.miniatura) {
+            await cache.delete(previa.miniatura);
+        }
+    }
+    // Lo que queda en "previas" ya no está activo
+    for (const previa of previas.values()) {
+        await cache.delete(previa.datos);
+        if (previa.miniatura) {
+            await cache.delete(previa.miniatura);
+        }
+    }
+    await cache.put(URL_MANIFIESTO, respuesta);
+}
+
+async function redPrimero(request, cacheNombre) {
+    const cache = await caches.open(cacheNombre);
+    try {
+        const respuesta = await fetch(request);
+        if (respuesta.ok) {
+            cache.put(request, respuesta.clone());
+        }
+        return respuesta;
+    } catch (err) {
+        const guardada = await cache.match(request);
+        if (guardada) {
+            return guardada;
+        }
+        throw err;
+    }
+}
+
+async function cachePrimero(request) {
+    const guardada = await caches.match(request);
+    return guardada || fetch(request);
+}
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET') {
+        return;
+    }
+    const url = new URL(request.url);
+
+    if (PRECARGA_CDN.includes(request.url)) {
+        event.respondWith(cachePrimero(request));
+        return;
+    }
+    if (url.origin !== self.location.origin) {
+        return;
+    }
+    if (request.mode === 'navigate' && RUTA_QR.test(url.pathname)) {
+        event.respondWith(fetch(request).catch(() => caches.match(URL_OFFLINE)));
+        return;
+    }
+    if (RUTA_API_QR.test(url.pathname)) {
+        event.respondWith(redPrimero(request, CACHE_CONTENIDO));
+        return;
+    }
+    // Los pedidos con Range (adelantar audio o video) van a la red: la caché guarda archivos completos
+    if (url.pathname.startsWith('/media/') && !request.headers.has('range')) {
+        event.respondWith(cachePrimero(request));
+        return;
+    }
+    if (PRECARGA_LOCAL.includes(url.pathname)) {
+        event.respondWith(redPrimero(request, CACHE_APP));
+    }
+});